@@ -0,0 +1,92 @@
+import os
+import time
+import requests
+
+SCRAPER_API_URL = os.getenv("SCRAPER_API_URL", "http://127.0.0.1:8000")
+
+class ApiError(Exception):
+    """The service answered with an error, or could not be reached"""
+
+class ApiClient:
+    """Client of the scraper service (service.py), used by the Streamlit app and other agents"""
+
+    def __init__(self, base_url=SCRAPER_API_URL, timeout=(5, 600)):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        # Trace of the last request, its per-stage breakdown is at /traces/{id}
+        self.last_trace_id = None
+
+    def _request(self, method, path, stream=False, **kwargs):
+        try:
+            response = self.session.request(method, f"{self.base_url}{path}", timeout=self.timeout, stream=stream, **kwargs)
+        except requests.RequestException as e:
+            raise ApiError(f"Scraper service unreachable at {self.base_url}: {e}") from e
+        self.last_trace_id = response.headers.get("X-Trace-Id")
+        if response.status_code >= 400:
+            try:
+                detail = response.json().get("detail", response.text)
+            except ValueError:
+                detail = response.text
+            raise ApiError(f"HTTP {response.status_code}: {detail}")
+        return response if stream else response.json()
+
+    def _stream(self, path, **kwargs):
+        """(response headers, iterator of decoded text as the service produces it)"""
+        response = self._request("POST", path, stream=True, **kwargs)
+        response.encoding = response.encoding or "utf-8"
+        return response.headers, response.iter_content(chunk_size=None, decode_unicode=True)
+
+    def health(self):
+        return self._request("GET", "/health")
+
+    def search(self, title):
+        return self._request("GET", "/search", params={"title": title})["movies"]
+
+    def ingest(self, movie_id, movie=None):
+        """Start (or join) the ingestion job of a movie, returns the job"""
+        return self._request("POST", f"/ingest/{movie_id}", json=movie)
+
+    def summary(self, movie_id, movie=None):
+        return self._request("POST", f"/summary/{movie_id}", json=movie)
+
+    def summary_stream(self, movie_id, movie=None):
+        return self._stream(f"/summary/{movie_id}", params={"stream": "true"}, json=movie)
+
+    def ask(self, query, filters=None, k=None):
+        return self._request("POST", "/ask", json={"query": query, "k": k, **(filters or {})})
+
+    def ask_stream(self, query, filters=None, k=None):
+        return self._stream("/ask", json={"query": query, "k": k, "stream": True, **(filters or {})})
+
+    def ask_many(self, queries, filters=None, k=None):
+        return self._request("POST", "/ask/batch", json={"queries": queries, "k": k, **(filters or {})})["answers"]
+
+    def job(self, job_id):
+        return self._request("GET", f"/jobs/{job_id}")
+
+    def wait(self, job_id, poll=0.5, timeout=None):
+        """Poll a job until it finishes, returns its final state"""
+        deadline = time.monotonic() + timeout if timeout else None
+        while True:
+            job = self.job(job_id)
+            if job["status"] in ("done", "failed"):
+                return job
+            if deadline and time.monotonic() > deadline:
+                raise ApiError(f"Job {job_id} still {job['status']} after {timeout}s")
+            time.sleep(poll)
+
+    def publish(self):
+        return self._request("POST", "/index/publish")
+
+    def load_index(self, cid, filename=None):
+        return self._request("POST", "/index/load", json={"cid": cid, **({"filename": filename} if filename else {})})
+
+    def trace(self, trace_id):
+        return self._request("GET", f"/traces/{trace_id}")
+
+    def stats(self):
+        return self._request("GET", "/stats")
+
+    def reload(self):
+        return self._request("POST", "/reload")
@@ -0,0 +1,88 @@
+import argparse
+import os
+import sys
+import time
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from index_factory import build_index, extract_vectors, set_search_params
+
+# Recall@k and latency of each ANN backend against the exact flat baseline
+def load_vectors(path, count, dimension, seed):
+    """Vectors from an existing index, or clustered synthetic ones that look like sentence embeddings"""
+    if path and os.path.exists(path):
+        index = faiss.read_index(path)
+        if index.ntotal:
+            return extract_vectors(index)[1].astype(np.float32)
+
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, count // 100), dimension)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), count)] + 0.3 * rng.normal(size=(count, dimension)).astype(np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+def recall_at_k(found, truth, k):
+    hits = sum(len(set(row[:k]) & set(expected[:k])) for row, expected in zip(found, truth))
+    return hits / (len(truth) * k)
+
+def run(kind, vectors, queries, truth, k, params, search_params):
+    start = time.perf_counter()
+    index = build_index(kind, vectors.shape[1], training_vectors=vectors, **params)
+    index.add_with_ids(vectors, np.arange(len(vectors), dtype=np.int64))
+    build_seconds = time.perf_counter() - start
+
+    rows = []
+    for knobs in search_params:
+        set_search_params(index, **knobs)
+        start = time.perf_counter()
+        _, found = index.search(queries, k)
+        elapsed = time.perf_counter() - start
+        rows.append({
+            "kind": kind,
+            "knobs": ", ".join(f"{key}={value}" for key, value in knobs.items()) or "-",
+            "recall": recall_at_k(found, truth, k),
+            "latency_ms": 1000 * elapsed / len(queries),
+            "build_s": build_seconds
+        })
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark FAISS index kinds against the flat baseline")
+    parser.add_argument("--index", help="Take vectors from an existing FAISS index instead of synthetic data")
+    parser.add_argument("--vectors", type=int, default=50000, help="Number of synthetic vectors")
+    parser.add_argument("--queries", type=int, default=500, help="Number of queries")
+    parser.add_argument("--dimension", type=int, default=384, help="Vector dimension")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours per query")
+    parser.add_argument("--nlist", type=int, default=256, help="IVF lists")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    vectors = load_vectors(args.index, args.vectors + args.queries, args.dimension, args.seed)
+    queries, vectors = vectors[:args.queries], vectors[args.queries:]
+
+    flat = faiss.IndexFlatL2(vectors.shape[1])
+    flat.add(vectors)
+    _, truth = flat.search(queries, args.k)
+
+    nlist = min(args.nlist, max(1, len(vectors) // 39))
+    benchmarks = [
+        ("flat", {}, [{}]),
+        ("ivf_flat", {"nlist": nlist}, [{"nprobe": n} for n in (1, 4, 16, 64)]),
+        ("ivf_pq", {"nlist": nlist, "pq_m": 48 if vectors.shape[1] % 48 == 0 else 8}, [{"nprobe": n} for n in (1, 4, 16, 64)]),
+        ("hnsw", {}, [{"ef_search": ef} for ef in (16, 32, 64, 128)]),
+    ]
+
+    print(f"{len(vectors)} vectors, {len(queries)} queries, recall@{args.k} against flat")
+    print(f"{'kind':<10}{'knobs':<16}{'recall':>8}{'ms/query':>10}{'build s':>9}")
+    for kind, params, search_params in benchmarks:
+        try:
+            rows = run(kind, vectors, queries, truth, args.k, params, search_params)
+        except ValueError as e:
+            print(f"{kind:<10}skipped: {e}")
+            continue
+        for row in rows:
+            print(f"{row['kind']:<10}{row['knobs']:<16}{row['recall']:>8.3f}{row['latency_ms']:>10.3f}{row['build_s']:>9.2f}")
+
+if __name__ == "__main__":
+    main()
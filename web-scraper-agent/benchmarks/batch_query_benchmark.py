@@ -0,0 +1,70 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ann_benchmark import load_vectors
+from faiss_store import FaissDocumentStore
+
+# Queries per second of one-at-a-time search vs the batch API
+def report(label, count, loop_seconds, batch_seconds):
+    print(f"{label:<26}{count / loop_seconds:>14.1f}{count / batch_seconds:>14.1f}{loop_seconds / batch_seconds:>10.1f}x")
+
+def synthetic_store(directory, count, dimension, kind):
+    """Store filled with clustered random vectors, for timing the search layer without the embedding model"""
+    store = FaissDocumentStore(os.path.join(directory, "bench.idx"), dimension=dimension, index_kind=kind, nprobe=16, ef_search=64)
+    vectors = load_vectors(None, count, dimension, seed=0)
+    for start in range(0, count, 10000):
+        batch = vectors[start:start + 10000]
+        store.add_chunks([
+            {"text": f"chunk {start + i}", "url": f"movie/{(start + i) // 50}", "movie_id": (start + i) // 50, "start": 0, "end": 1}
+            for i in range(len(batch))
+        ], batch)
+    return store
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batch retrieval against the single-query loop")
+    parser.add_argument("--queries", type=int, default=256)
+    parser.add_argument("--vectors", type=int, default=50000, help="Synthetic chunks when no --index is given")
+    parser.add_argument("--kind", default="flat", help="Index kind of the synthetic store")
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--index", help="Use this index and the embedding model, timing embedding + hybrid retrieval")
+    args = parser.parse_args()
+
+    print(f"{'stage':<26}{'loop q/s':>14}{'batch q/s':>14}{'speedup':>11}")
+
+    if args.index:
+        from resources import build_embeddings, build_retriever, build_store
+        store = build_store(args.index)
+        texts = [row[0] for row in store.conn.execute("SELECT text FROM chunks ORDER BY RANDOM() LIMIT ?", (args.queries,))]
+        questions = [" ".join(text.split()[:12]) for text in texts]
+        retriever = build_retriever(store, build_embeddings())
+        retriever.reranker = None
+
+        # Different phrasing per pass so the embedding cache does not hide the model cost
+        start = time.perf_counter()
+        for question in questions:
+            retriever.retrieve(question + " ?", k=args.k)
+        loop_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        retriever.retrieve_batch([question + " ??" for question in questions], k=args.k)
+        report("embed + hybrid retrieval", len(questions), loop_seconds, time.perf_counter() - start)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = synthetic_store(directory, args.vectors, 384, args.kind)
+        queries = load_vectors(None, args.queries, 384, seed=1)
+
+        for label, filters in [("faiss search", None), ("faiss search, one movie", {"movie_id": 7})]:
+            start = time.perf_counter()
+            for query in queries:
+                store.search(query, k=args.k, filters=filters)
+            loop_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            store.search_batch(queries, k=args.k, filters=filters)
+            report(label, len(queries), loop_seconds, time.perf_counter() - start)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import argparse
+import glob
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import car_utils
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures")
+
+# Known CIDs that do not depend on ipfs-car being installed
+KNOWN_CIDS = [
+    ("raw leaf 'hello world'", lambda: car_utils.make_cid(car_utils.RAW, b"hello world"),
+     "bafkreifzjut3te2nhyekklss27nh3k72ysco7y32koao5eei66wof36n5e"),
+    ("empty UnixFS directory", lambda: car_utils.make_cid(car_utils.DAG_PB, car_utils.encode_dag_pb([], car_utils.unixfs_directory())),
+     "bafybeiczsscdsbs7ffqz55asqdf3smv6klcw3gofszvwlyarci47bgf354"),
+]
+
+# Native CAR packing vs the ipfs-car CLI (pack + hash + roots), checking both produce the same bytes
+def ipfs_car(ipfs_car_path, data, name):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        subprocess.run([ipfs_car_path, "pack", path, "-o", f"{path}.car"], check=True, capture_output=True)
+        car_cid = subprocess.run([ipfs_car_path, "hash", f"{path}.car"], check=True, capture_output=True, text=True).stdout.strip()
+        root_cid = subprocess.run([ipfs_car_path, "roots", f"{path}.car"], check=True, capture_output=True, text=True).stdout.strip()
+        with open(f"{path}.car", "rb") as f:
+            return f.read(), root_cid, car_cid
+
+def timed(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return (time.perf_counter() - start) / repeat, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark and verify native CAR packing")
+    parser.add_argument("--fixtures", default=FIXTURES, help="Directory with files to pack")
+    parser.add_argument("--large-mb", type=int, default=8, help="Also pack a generated file of this size to exercise multi-block DAGs")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for label, compute, expected in KNOWN_CIDS:
+        cid = car_utils.cid_to_string(compute())
+        print(f"{'✅' if cid == expected else '❌'} {label}: {cid}")
+
+    samples = []
+    for path in sorted(glob.glob(os.path.join(args.fixtures, "*"))):
+        with open(path, "rb") as f:
+            samples.append((os.path.basename(path), f.read()))
+    if args.large_mb:
+        samples.append((f"large_{args.large_mb}mb.bin", os.urandom(args.large_mb * 1024 * 1024)))
+
+    ipfs_car_path = shutil.which("ipfs-car")
+    if not ipfs_car_path:
+        print("⚠️ ipfs-car not found, only the native path is timed (npm install -g ipfs-car to compare)")
+
+    print(f"{'file':<32}{'KiB':>10}{'native ms':>12}{'ipfs-car ms':>13}{'speedup':>10}  identical")
+    for name, data in samples:
+        native_seconds, (car, root_cid, car_cid) = timed(lambda: car_utils.pack(data, name), args.repeat)
+        row = f"{name[:31]:<32}{len(data) // 1024:>10}{1000 * native_seconds:>12.2f}"
+        if ipfs_car_path:
+            cli_seconds, (cli_car, cli_root, cli_car_cid) = timed(lambda: ipfs_car(ipfs_car_path, data, name), args.repeat)
+            identical = cli_car == car and cli_root == root_cid and cli_car_cid == car_cid
+            row += f"{1000 * cli_seconds:>13.2f}{cli_seconds / native_seconds:>9.1f}x  {'✅' if identical else '❌'}"
+        print(row)
+
+if __name__ == "__main__":
+    main()
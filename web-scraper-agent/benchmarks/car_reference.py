@@ -0,0 +1,218 @@
+import argparse
+import base64
+import ctypes
+import hashlib
+import importlib.util
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import car_utils
+from car_benchmark import ipfs_car
+
+# Checks of car_utils.pack against other IPFS implementations, also run by tests/test_car_reference.py:
+# - car_references.json holds CIDs made elsewhere: well-known raw-leaf CIDs, plus the CARs of the ipfs-car CLI once
+#   recorded with --record on a machine with ipfs-car (the CAR CID hashes every byte, so equal CAR CIDs mean
+#   identical files)
+# - with the ipfs_node package, its kubo library reads every packed DAG back from an offline repo
+# - with the kubo CLI (`ipfs`) on PATH, the file and directory CIDs are compared with `ipfs add`
+
+REFERENCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "car_references.json")
+
+MB = 1024 * 1024
+
+# Deterministic inputs: a single raw block, an empty file, exactly one chunk, one byte more, and a multi-MiB file
+SAMPLES = [
+    ("hello.txt", 11),
+    ("empty.bin", 0),
+    ("one_chunk.bin", car_utils.CHUNK_SIZE),
+    ("one_chunk_plus_one.bin", car_utils.CHUNK_SIZE + 1),
+    ("multi_chunk.bin", 5 * MB + 123),
+]
+
+def sample_data(name, size):
+    if name == "hello.txt":
+        return b"hello world"
+    return random.Random(name).randbytes(size)
+
+def load_references():
+    with open(REFERENCES, encoding="utf-8") as f:
+        return json.load(f)["samples"]
+
+def check_reference(reference):
+    """(matches, result) of car_utils.pack on a reference sample, only the fields the reference has are compared"""
+    car, root_cid, car_cid = car_utils.pack(sample_data(reference["name"], reference["size"]), reference["name"],
+                                            wrap=reference.get("wrap", True))
+    result = {"root_cid": root_cid, "car_cid": car_cid, "car_bytes": len(car)}
+    return all(result[key] == reference[key] for key in result if key in reference), result
+
+def record(ipfs_car_path):
+    """Replace the ipfs-car references with the CARs of the installed CLI, keeping the others"""
+    version = subprocess.run([ipfs_car_path, "--version"], capture_output=True, text=True).stdout.strip()
+    references = [reference for reference in load_references() if not reference["source"].startswith("ipfs-car")]
+    for name, size in SAMPLES:
+        car, root_cid, car_cid = ipfs_car(ipfs_car_path, sample_data(name, size), name)
+        references.append({"name": name, "size": size, "root_cid": root_cid, "car_cid": car_cid,
+                           "car_bytes": len(car), "source": f"ipfs-car {version}"})
+        print(f"📝 {name}: {root_cid}")
+    with open(REFERENCES, "w", encoding="utf-8") as f:
+        json.dump({"samples": references}, f, indent=2)
+        f.write("\n")
+    print(f"✅ References written to {REFERENCES}, commit them")
+
+def _read_varint(data, offset):
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if byte < 0x80:
+            return value, offset
+
+def read_car(car):
+    """Blocks of a CARv1 as {binary cid: bytes}, raises ValueError when a block does not hash to its CID"""
+    header_length, offset = _read_varint(car, 0)
+    offset += header_length
+    blocks = {}
+    while offset < len(car):
+        length, offset = _read_varint(car, offset)
+        frame = car[offset:offset + length]
+        offset += length
+        # CIDv1: version, codec, then a sha2-256 multihash (code 0x12, 32 bytes)
+        _, digest_start = _read_varint(frame, 1)
+        digest_start += 2
+        cid, block = frame[:digest_start + 32], frame[digest_start + 32:]
+        if frame[digest_start - 2:digest_start] != b"\x12\x20" or hashlib.sha256(block).digest() != cid[digest_start:]:
+            raise ValueError(f"block {car_utils.cid_to_string(cid)} does not match its CID")
+        blocks[cid] = block
+    return blocks
+
+def load_kubo():
+    """ctypes handle of the kubo library bundled with the ipfs_node package, None without it"""
+    spec = importlib.util.find_spec("libkubo")
+    machine = {"x86_64": "x86_64", "amd64": "x86_64", "aarch64": "arm64", "arm64": "arm64"}.get(platform.machine().lower())
+    if spec is None or platform.system() != "Linux" or machine is None:
+        return None
+    path = os.path.join(os.path.dirname(spec.origin), f"libkubo_linux_{machine}.so")
+    if not os.path.exists(path):
+        return None
+    kubo = ctypes.CDLL(path)
+    kubo.CreateRepo.argtypes = [ctypes.c_char_p]
+    kubo.Download.argtypes = [ctypes.c_char_p] * 3
+    return kubo
+
+def kubo_read_back(kubo, car, root_cid, name):
+    """Bytes kubo reads for the file of a packed CAR, its blocks written into the blockstore of a fresh offline repo"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        repo = os.path.join(temp_dir, "repo")
+        # kubo writes its kubo.log to the working directory
+        cwd = os.getcwd()
+        os.chdir(temp_dir)
+        try:
+            kubo.CreateRepo(repo.encode())
+        finally:
+            os.chdir(cwd)
+        config_path = os.path.join(repo, "config")
+        with open(config_path, encoding="utf-8") as f:
+            config = json.load(f)
+        config["Bootstrap"] = []
+        config["Addresses"].update({"Swarm": [], "API": [], "Gateway": []})
+        config["Routing"]["Type"] = "none"
+        config["Discovery"]["MDNS"]["Enabled"] = False
+        with open(config_path, "w", encoding="utf-8") as f:
+            json.dump(config, f)
+
+        # flatfs layout of kubo's default config: unpadded base32 multihash, sharded by its next-to-last two letters
+        os.makedirs(os.path.join(repo, "blocks"))
+        with open(os.path.join(repo, "blocks", "SHARDING"), "w", encoding="utf-8") as f:
+            f.write("/repo/flatfs/shard/v1/next-to-last/2\n")
+        for cid, block in read_car(car).items():
+            _, multihash_start = _read_varint(cid, 1)
+            key = base64.b32encode(cid[multihash_start:]).decode().rstrip("=")
+            os.makedirs(os.path.join(repo, "blocks", key[-3:-1]), exist_ok=True)
+            with open(os.path.join(repo, "blocks", key[-3:-1], f"{key}.data"), "wb") as f:
+                f.write(block)
+
+        output = os.path.join(temp_dir, "output")
+        os.chdir(temp_dir)
+        try:
+            kubo.Download(repo.encode(), root_cid.encode(), output.encode())
+        finally:
+            os.chdir(cwd)
+        path = os.path.join(output, name) if os.path.isdir(output) else output
+        if not os.path.isfile(path):
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+
+def kubo_cids(kubo_path, name, data):
+    """(file cid, wrapping directory cid) from `ipfs add` with the chunking ipfs-car uses"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        command = [kubo_path, "add", "--only-hash", "--quieter", "--cid-version=1", "--raw-leaves",
+                   f"--chunker=size-{car_utils.CHUNK_SIZE}", path]
+        file_cid = subprocess.run(command, check=True, capture_output=True, text=True).stdout.strip()
+        wrapped_cid = subprocess.run(command + ["--wrap-with-directory"], check=True, capture_output=True, text=True).stdout.strip()
+        return file_cid, wrapped_cid
+
+def main():
+    parser = argparse.ArgumentParser(description="Check native CAR packing against references from other IPFS implementations")
+    parser.add_argument("--record", action="store_true", help="Write the ipfs-car references with the ipfs-car CLI")
+    args = parser.parse_args()
+
+    ipfs_car_path = shutil.which("ipfs-car")
+    if args.record:
+        if not ipfs_car_path:
+            raise SystemExit("❌ --record needs ipfs-car (npm install -g ipfs-car)")
+        record(ipfs_car_path)
+        return
+
+    failures = checks = 0
+    print("References:")
+    for reference in load_references():
+        identical, result = check_reference(reference)
+        failures += not identical
+        checks += 1
+        print(f"  {'✅' if identical else '❌'} {reference['name']} ({reference['source']}): {result['root_cid']}"
+              + ("" if identical else f" (expected {reference['root_cid']})"))
+
+    kubo = load_kubo()
+    if kubo:
+        print("kubo read-back (ipfs_node):")
+        for name, size in SAMPLES:
+            data = sample_data(name, size)
+            car, root_cid, _ = car_utils.pack(data, name)
+            identical = kubo_read_back(kubo, car, root_cid, name) == data
+            failures += not identical
+            checks += 1
+            print(f"  {'✅' if identical else '❌'} {name}: {root_cid}")
+    else:
+        print("⚠️ Skipping the kubo read-back, it needs the ipfs_node package (pip install ipfs_node)")
+
+    kubo_path = shutil.which("ipfs")
+    if kubo_path:
+        print("kubo (ipfs add --cid-version=1 --raw-leaves):")
+        for name, size in SAMPLES:
+            data = sample_data(name, size)
+            root, dag_size, _ = car_utils.build_file_dag(data)
+            expected = (car_utils.cid_to_string(root), car_utils.cid_to_string(car_utils.wrap_in_directory(root, name, dag_size)[0]))
+            identical = kubo_cids(kubo_path, name, data) == expected
+            failures += not identical
+            checks += 1
+            print(f"  {'✅' if identical else '❌'} {name}: {expected[0]}")
+
+    if failures:
+        raise SystemExit(f"❌ {failures} of {checks} checks differ, set STORACHA_NATIVE_CAR=0 to pack with ipfs-car")
+    print(f"✅ {checks} checks passed")
+
+if __name__ == "__main__":
+    main()
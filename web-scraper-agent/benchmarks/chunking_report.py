@@ -0,0 +1,108 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import faiss
+import numpy as np
+from langchain.text_splitter import CharacterTextSplitter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chunking import CHUNK_MAX_TOKENS, TokenCounter, split_into_chunks
+from fixture_server import FIXTURES_DIR, render_reviews_page
+from review_parser import parse_reviews
+
+# Vectors, tokens per chunk and index size/search time of each chunking strategy over the fixture pages plus
+# more generated ones. All of them are generated from a handful of phrases, so they overstate deduplication
+
+# MiniLM silently drops everything past this many word pieces
+MODEL_MAX_TOKENS = 256
+DIMENSION = 384
+
+def character_chunks(text, url, separator):
+    """The splitter store_in_faiss used to run: 500 characters with 100 of overlap"""
+    splitter = CharacterTextSplitter(chunk_size=500, chunk_overlap=100, separator=separator)
+    return [{"text": chunk, "url": url} for chunk in splitter.split_text(text)]
+
+STRATEGIES = {
+    "character, space-joined": lambda reviews, url, max_tokens: character_chunks(" ".join(reviews), url, ""),
+    "character, newline-joined": lambda reviews, url, max_tokens: character_chunks("\n".join(reviews), url, "\n\n"),
+    "reviews": lambda reviews, url, max_tokens: split_into_chunks("\n".join(reviews), url, max_tokens=max_tokens, dedupe=False),
+    "reviews + dedupe": lambda reviews, url, max_tokens: split_into_chunks("\n".join(reviews), url, max_tokens=max_tokens)
+}
+
+def load_corpus(fixtures, generated):
+    """(url, review texts) of every pro-reviews page in fixtures, then of pages generated on the fly"""
+    pages = []
+    for path in sorted(glob.glob(os.path.join(fixtures, "pro-reviews_*.html"))):
+        with open(path, encoding="utf-8") as f:
+            pages.append((os.path.basename(path), f.read()))
+    pages += [(f"generated_{900000 + i}", render_reviews_page(900000 + i)) for i in range(generated)]
+    return [(url, [review["text"] for review in parse_reviews(html) if review["text"]]) for url, html in pages]
+
+def search_ms(vectors, queries, k):
+    """Milliseconds per query of an exact inner product search over vectors"""
+    index = faiss.IndexFlatIP(vectors.shape[1])
+    index.add(vectors)
+    start = time.perf_counter()
+    index.search(queries, k)
+    return 1000 * (time.perf_counter() - start) / len(queries)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare chunking strategies by vector count, tokens and index size")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help="Directory with pro-reviews_<id>.html pages")
+    parser.add_argument("--generated", type=int, default=50, help="Pages generated on the fly, added to the fixture ones")
+    parser.add_argument("--max-tokens", type=int, default=CHUNK_MAX_TOKENS, help="Token budget of the review chunks")
+    parser.add_argument("--copies", type=int, default=20, help="Times the corpus is repeated for the search timing")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--output", help="Write the report as JSON")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.fixtures, args.generated)
+    counter = TokenCounter()
+    counter.counts([""])
+    print(f"{len(corpus)} pages, {sum(len(reviews) for _, reviews in corpus)} reviews, "
+          f"tokens {'from the ' + counter.model_name + ' tokenizer' if counter.tokenizer else 'estimated'}, "
+          f"chunk budget {args.max_tokens}")
+
+    rng = np.random.default_rng(0)
+    queries = rng.standard_normal((args.queries, DIMENSION)).astype(np.float32)
+    faiss.normalize_L2(queries)
+
+    report = []
+    for name, strategy in STRATEGIES.items():
+        start = time.perf_counter()
+        chunks = [chunk for url, reviews in corpus for chunk in strategy(reviews, url, args.max_tokens)]
+        seconds = time.perf_counter() - start
+
+        tokens = np.array(counter.counts([chunk["text"] for chunk in chunks]))
+        # Search cost depends only on the vector count, so random vectors stand in for embeddings
+        vectors = rng.standard_normal((len(chunks) * args.copies, DIMENSION)).astype(np.float32)
+        faiss.normalize_L2(vectors)
+        report.append({
+            "strategy": name,
+            "vectors": len(chunks),
+            "chunk_seconds": seconds,
+            "tokens_mean": float(tokens.mean()),
+            "tokens_max": int(tokens.max()),
+            "truncated": float(np.mean(tokens + 2 > MODEL_MAX_TOKENS)),
+            "index_mb": len(chunks) * DIMENSION * 4 / (1024 * 1024),
+            "search_ms": search_ms(vectors, queries, args.k)
+        })
+
+    baseline = report[0]["vectors"]
+    print(f"\n{'strategy':<28}{'vectors':>9}{'vs base':>9}{'tokens':>8}{'max':>6}{'truncated':>11}"
+          f"{'index MB':>10}{f'search ×{args.copies}':>14}")
+    for row in report:
+        row["reduction"] = 1 - row["vectors"] / baseline
+        print(f"{row['strategy']:<28}{row['vectors']:>9}{-row['reduction']:>+9.1%}{row['tokens_mean']:>8.1f}"
+              f"{row['tokens_max']:>6}{row['truncated']:>11.1%}{row['index_mb']:>10.2f}{row['search_ms']:>11.3f} ms")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"pages": len(corpus), "max_tokens": args.max_tokens, "strategies": report}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import argparse
+import json
+import os
+import sys
+import time
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ann_benchmark import load_vectors, recall_at_k
+from index_factory import build_index, bytes_per_vector
+
+# Memory, file size and recall@k of the compact vector modes (scalar quantizers, optionally after PCA) against
+# the flat float32 index. Synthetic vectors compress worse under PCA than real MiniLM embeddings, use --index
+# on an existing faiss_index.idx for numbers that match your data
+
+MB = 1024 * 1024
+
+def modes(dimension):
+    yield "flat", {}
+    for kind in ("sq_fp16", "sq_int8", "sq_4bit"):
+        yield kind, {}
+    for pca_dim in (dimension // 2, dimension // 3, dimension // 6):
+        yield "sq_int8", {"pca_dim": pca_dim}
+        yield "sq_fp16", {"pca_dim": pca_dim}
+
+def measure(index, vectors, queries, truth, k, build_seconds):
+    start = time.perf_counter()
+    _, found = index.search(queries, k)
+    elapsed = time.perf_counter() - start
+    code_size = index.sa_code_size() if isinstance(index, faiss.IndexLSH) else bytes_per_vector(index)
+    return {
+        "bytes_per_vector": code_size,
+        "memory_mb": len(vectors) * code_size / MB,
+        "file_mb": len(faiss.serialize_index(index)) / MB,
+        "recall": recall_at_k(found, truth, k),
+        "latency_ms": 1000 * elapsed / len(queries),
+        "build_s": build_seconds
+    }
+
+def run(kind, params, vectors, queries, truth, k):
+    start = time.perf_counter()
+    index = build_index(kind, vectors.shape[1], training_vectors=vectors, **params)
+    index.add_with_ids(vectors, np.arange(len(vectors), dtype=np.int64))
+    return measure(index, vectors, queries, truth, k, time.perf_counter() - start)
+
+def run_binary(vectors, queries, truth, k):
+    """Sign bits after a random rotation, searched by Hamming distance. Not an index kind: IndexLSH supports
+    neither reconstruct() nor ID selectors, which the movie/year filters rely on"""
+    start = time.perf_counter()
+    index = faiss.IndexLSH(vectors.shape[1], vectors.shape[1], True, True)
+    index.train(vectors)
+    index.add(vectors)
+    return measure(index, vectors, queries, truth, k, time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare compact vector storage modes against the flat float32 index")
+    parser.add_argument("--index", help="Take vectors from an existing FAISS index instead of synthetic data")
+    parser.add_argument("--vectors", type=int, default=50000, help="Number of synthetic vectors")
+    parser.add_argument("--queries", type=int, default=500, help="Number of queries")
+    parser.add_argument("--dimension", type=int, default=384, help="Vector dimension")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours per query")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the report as JSON")
+    args = parser.parse_args()
+
+    vectors = load_vectors(args.index, args.vectors + args.queries, args.dimension, args.seed)
+    queries, vectors = vectors[:args.queries], vectors[args.queries:]
+
+    flat = faiss.IndexFlatL2(vectors.shape[1])
+    flat.add(vectors)
+    _, truth = flat.search(queries, args.k)
+
+    print(f"{len(vectors)} vectors of {vectors.shape[1]} dimensions, {len(queries)} queries, recall@{args.k} against flat")
+    print(f"{'mode':<20}{'bytes/vec':>10}{'memory MB':>11}{'file MB':>9}{'recall':>8}{'ms/query':>10}{'build s':>9}")
+    report = []
+    for kind, params in modes(vectors.shape[1]):
+        name = kind + (f" + pca {params['pca_dim']}" if params.get("pca_dim") else "")
+        try:
+            row = run(kind, params, vectors, queries, truth, args.k)
+        except ValueError as e:
+            print(f"{name:<20}skipped: {e}")
+            continue
+        report.append({"mode": name, "kind": kind, **params, **row})
+    report.append({"mode": "binary (reference)", "kind": None, **run_binary(vectors, queries, truth, args.k)})
+
+    for row in report:
+        print(f"{row['mode']:<20}{row['bytes_per_vector']:>10}{row['memory_mb']:>11.2f}{row['file_mb']:>9.2f}"
+              f"{row['recall']:>8.3f}{row['latency_ms']:>10.3f}{row['build_s']:>9.2f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"vectors": len(vectors), "k": args.k, "modes": report}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chunking import split_into_chunks
+from chunking_report import load_corpus
+from fixture_server import FIXTURES_DIR
+from onnx_embeddings import INT8_MIN_COSINE, ONNX_MAX_BATCH, ONNX_MODEL_DIR, OnnxEmbeddings
+from resources import EMBEDDING_MODEL
+
+# Throughput of the PyTorch (HuggingFaceEmbeddings) and ONNX Runtime embedding backends on review chunks, in bulk
+# and with many concurrent single-text callers, and how close the ONNX vectors are to the ones already indexed
+
+def backends(args):
+    """(name, factory) of every backend to compare, the PyTorch one first as the reference"""
+    def huggingface():
+        from langchain_huggingface import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(model_name=args.model, encode_kwargs={"batch_size": 32})
+
+    yield "pytorch", huggingface
+    for threads in args.threads:
+        yield f"onnx fp32, {threads or 'all'} threads", lambda threads=threads: OnnxEmbeddings(
+            args.model_dir, quantized=False, threads=threads, max_batch_size=args.max_batch)
+        yield f"onnx int8, {threads or 'all'} threads", lambda threads=threads: OnnxEmbeddings(
+            args.model_dir, quantized=True, threads=threads, max_batch_size=args.max_batch)
+
+def bulk(embeddings, texts):
+    """Texts per second of one embed_documents call over every text"""
+    start = time.perf_counter()
+    vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    return vectors, len(texts) / (time.perf_counter() - start)
+
+def concurrent(embeddings, texts, clients):
+    """Texts per second and per-call latency with clients threads each embedding one text at a time"""
+    def call(text):
+        start = time.perf_counter()
+        embeddings.embed_query(text)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as executor:
+        latencies = list(executor.map(call, texts))
+    seconds = time.perf_counter() - start
+    return len(texts) / seconds, 1000 * float(np.percentile(latencies, 50)), 1000 * float(np.percentile(latencies, 95))
+
+def compatibility(reference, vectors, k):
+    """Cosine similarity to the reference vectors, and recall@k of searching them in an index of reference vectors"""
+    cosine = (reference * vectors).sum(axis=1)
+    index = faiss.IndexFlatIP(reference.shape[1])
+    index.add(reference)
+    _, truth = index.search(reference, k + 1)
+    _, found = index.search(vectors, k + 1)
+    # The text itself is the first hit of both, the neighbours after it are compared
+    recall = np.mean([len(set(a[1:]) & set(b[1:])) / k for a, b in zip(truth, found)])
+    return float(cosine.mean()), float(cosine.min()), float(recall)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare embedding backends by throughput and vector compatibility")
+    parser.add_argument("--model", default=EMBEDDING_MODEL, help="Model name or local directory of the PyTorch reference")
+    parser.add_argument("--model-dir", default=ONNX_MODEL_DIR, help="Directory written by onnx_embeddings.py")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help="Directory with pro-reviews_<id>.html pages")
+    parser.add_argument("--generated", type=int, default=50, help="Pages generated on the fly, added to the fixture ones")
+    parser.add_argument("--texts", type=int, default=1000, help="Chunks embedded per backend")
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent single-text callers")
+    parser.add_argument("--threads", type=int, nargs="+", default=[0], help="ONNX intra-op threads to try, 0 for all cores")
+    parser.add_argument("--max-batch", type=int, default=ONNX_MAX_BATCH, help="Largest batch the ONNX batcher forms")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours compared for recall")
+    parser.add_argument("--output", help="Write the report as JSON")
+    args = parser.parse_args()
+
+    texts = [
+        chunk["text"]
+        for url, reviews in load_corpus(args.fixtures, args.generated)
+        for chunk in split_into_chunks("\n".join(reviews), url, dedupe=False)
+    ][:args.texts]
+    print(f"{len(texts)} chunks, {args.clients} concurrent clients, recall@{args.k} against the first backend (pytorch)")
+    print(f"{'backend':<26}{'bulk/s':>9}{'clients/s':>11}{'p50 ms':>9}{'p95 ms':>9}{'cosine':>9}{'min':>8}{'recall':>8}")
+
+    report, reference = [], None
+    for name, factory in backends(args):
+        try:
+            embeddings = factory()
+        except (ImportError, OSError, ValueError) as e:
+            # ValueError: an int8 model refused for straying from the fp32 one
+            print(f"{name:<26}skipped: {e}")
+            continue
+
+        # Warm up (model load, first allocations) outside the timings
+        embeddings.embed_documents(texts[:8])
+        vectors, bulk_rate = bulk(embeddings, texts)
+        client_rate, p50, p95 = concurrent(embeddings, texts, args.clients)
+        if reference is None:
+            reference = vectors
+        cosine, cosine_min, recall = compatibility(reference, vectors, args.k)
+
+        row = {"backend": name, "bulk_per_second": bulk_rate, "clients_per_second": client_rate, "p50_ms": p50,
+               "p95_ms": p95, "cosine_mean": cosine, "cosine_min": cosine_min, "recall": recall}
+        report.append(row)
+        print(f"{name:<26}{bulk_rate:>9.1f}{client_rate:>11.1f}{p50:>9.2f}{p95:>9.2f}{cosine:>9.4f}{cosine_min:>8.4f}{recall:>8.3f}")
+
+    # ONNX_QUANTIZED=1 mixes int8 vectors into an index of PyTorch ones, which needs every text to stay close
+    int8 = [row for row in report if "int8" in row["backend"]]
+    if reference is not None and int8:
+        worst = min(row["cosine_min"] for row in int8)
+        verdict = "can be used" if worst >= INT8_MIN_COSINE else "keep ONNX_QUANTIZED=0"
+        print(f"{'✅' if worst >= INT8_MIN_COSINE else '❌'} int8 minimum cosine {worst:.4f} "
+              f"(needs {INT8_MIN_COSINE}), {verdict}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"texts": len(texts), "clients": args.clients, "backends": report}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
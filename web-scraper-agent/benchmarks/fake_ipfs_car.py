@@ -0,0 +1,78 @@
+import argparse
+import os
+import stat
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import car_utils
+
+# Stand-in for the `ipfs-car` CLI (pack, hash, roots) built on car_utils, so the legacy
+# StorachaClient path (STORACHA_NATIVE_CAR=0) can be exercised offline with its process overhead
+
+def read_varint(data, offset):
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, offset
+        shift += 7
+
+def car_root(car):
+    """Root CID of a CAR written by car_utils.encode_car (dag-cbor header with a single root)"""
+    header_length, offset = read_varint(car, 0)
+    header = car[offset:offset + header_length]
+
+    # The root is a CBOR tag 42 holding bytes: 0x00 multibase prefix + binary CID
+    position = header.index(b"\xd8\x2a") + 2
+    head = header[position]
+    if head == 0x58:
+        length, position = header[position + 1], position + 2
+    elif head == 0x59:
+        length, position = int.from_bytes(header[position + 1:position + 3], "big"), position + 3
+    else:
+        length, position = head - 0x40, position + 1
+    return car_utils.cid_to_string(header[position + 1:position + length])
+
+def install(directory):
+    """Write an `ipfs-car` launcher into directory, prepend it to PATH and return its path"""
+    script = os.path.abspath(__file__)
+    if os.name == "nt":
+        path = os.path.join(directory, "ipfs-car.cmd")
+        with open(path, "w") as f:
+            f.write(f'@"{sys.executable}" "{script}" %*\n')
+    else:
+        path = os.path.join(directory, "ipfs-car")
+        with open(path, "w") as f:
+            f.write(f'#!/bin/sh\nexec "{sys.executable}" "{script}" "$@"\n')
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+    os.environ["PATH"] = directory + os.pathsep + os.environ.get("PATH", "")
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(prog="ipfs-car", description="Offline stand-in for the ipfs-car CLI")
+    commands = parser.add_subparsers(dest="command", required=True)
+    pack = commands.add_parser("pack")
+    pack.add_argument("file")
+    pack.add_argument("-o", "--output", required=True)
+    commands.add_parser("hash").add_argument("car")
+    commands.add_parser("roots").add_argument("car")
+    args = parser.parse_args()
+
+    if args.command == "pack":
+        with open(args.file, "rb") as f:
+            car, _, _ = car_utils.pack(f.read(), os.path.basename(args.file))
+        with open(args.output, "wb") as f:
+            f.write(car)
+        return
+
+    with open(args.car, "rb") as f:
+        car = f.read()
+    if args.command == "hash":
+        print(car_utils.cid_to_string(car_utils.make_cid(car_utils.CAR, car)))
+    else:
+        print(car_root(car))
+
+if __name__ == "__main__":
+    main()
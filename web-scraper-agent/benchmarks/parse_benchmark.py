@@ -0,0 +1,49 @@
+import argparse
+import glob
+import os
+import sys
+import time
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from review_parser import available_engines, parse_reviews
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures")
+
+# Review extraction speed of each parser engine over the fixture pages. They are generated in the FilmAffinity
+# markup (see fixture_server.render_reviews_page), real pages carry more markup around the reviews table
+def baseline(html):
+    """The original extraction: full html.parser tree, text only"""
+    soup = BeautifulSoup(html, "html.parser")
+    return [review.a.get_text(strip=True) for review in soup.find_all("td", class_="rev-text") if review.a]
+
+def timed(function, pages, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for html in pages:
+            function(html)
+    return (time.perf_counter() - start) / (repeat * len(pages))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark review extraction engines")
+    parser.add_argument("--fixtures", default=FIXTURES, help="Directory with pro-reviews_<id>.html pages")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    pages = []
+    for path in sorted(glob.glob(os.path.join(args.fixtures, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            pages.append(f.read())
+    if not pages:
+        raise SystemExit(f"❌ No fixture pages in {args.fixtures}")
+
+    reference = timed(baseline, pages, args.repeat)
+    print(f"{len(pages)} pages, {sum(len(page) for page in pages) // 1024} KiB")
+    print(f"{'engine':<22}{'ms/page':>10}{'speedup':>10}")
+    print(f"{'bs4 (original)':<22}{1000 * reference:>10.3f}{1.0:>10.1f}x")
+    for engine in available_engines():
+        seconds = timed(lambda html: parse_reviews(html, engine), pages, args.repeat)
+        print(f"{engine + ' + metadata':<22}{1000 * seconds:>10.3f}{reference / seconds:>10.1f}x")
+
+if __name__ == "__main__":
+    main()
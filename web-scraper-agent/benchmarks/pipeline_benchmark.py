@@ -0,0 +1,263 @@
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fake_ipfs_car
+from fixture_server import FIXTURES_DIR, start_fixture_server
+from mock_bridge import start_mock_bridge
+
+# Offline scrape → embed → index → retrieve → upload benchmark: the generated fixture pages (plus more generated ones)
+# from the fixture server, a stub LLM, the mock Storacha bridge and a fake ipfs-car. Results are written as
+# JSON so two commits can be compared with --compare
+
+MOCK_HEADERS = {"X-Auth-Secret": "mock", "Authorization": "mock"}
+MB = 1024 * 1024
+
+class StubLLM:
+    """Stands in for Ollama: fixed answers after a configurable delay, streamed word by word"""
+
+    model = "stub"
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    def _answer(self, prompt):
+        time.sleep(self.latency)
+        return f"Stub answer over {len(prompt)} characters of context."
+
+    def invoke(self, prompt):
+        return self._answer(prompt)
+
+    def stream(self, prompt):
+        for word in self._answer(prompt).split(" "):
+            yield word + " "
+
+class StubEmbeddings:
+    """Deterministic unit vectors derived from the text, in place of the MiniLM model"""
+
+    def __init__(self, dimension=384):
+        self.dimension = dimension
+
+    def _vector(self, text):
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dimension).astype(np.float32)
+        return vector / np.linalg.norm(vector)
+
+    def embed_documents(self, texts):
+        return [self._vector(text).tolist() for text in texts]
+
+    def embed_queries(self, texts):
+        return self.embed_documents(texts)
+
+    def embed_query(self, text):
+        return self._vector(text).tolist()
+
+def rss_high_water_mb():
+    """Peak resident set size of this process so far"""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / MB if sys.platform == "darwin" else peak / 1024
+
+def measure(calls):
+    """Run the calls one after the other, returns wall time, per-call latency and memory high-water marks"""
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+    latencies = []
+    start = time.perf_counter()
+    for call in calls:
+        call_start = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - call_start)
+    seconds = time.perf_counter() - start
+
+    result = {
+        "calls": len(latencies),
+        "seconds": seconds,
+        "per_second": len(latencies) / seconds if seconds else None,
+        "p50_ms": 1000 * float(np.percentile(latencies, 50)) if latencies else None,
+        "p95_ms": 1000 * float(np.percentile(latencies, 95)) if latencies else None,
+        "rss_high_water_mb": rss_high_water_mb()
+    }
+    if tracemalloc.is_tracing():
+        result["python_peak_mb"] = tracemalloc.get_traced_memory()[1] / MB
+    return result
+
+def fixture_movie_ids():
+    return sorted(name[len("pro-reviews_"):-len(".html")] for name in os.listdir(FIXTURES_DIR) if name.startswith("pro-reviews_"))
+
+def corpus(size):
+    """The ids of the fixture pages first, then made-up ids the fixture server generates pages for"""
+    ids = fixture_movie_ids()[:size]
+    return ids + [str(900000 + i) for i in range(size - len(ids))]
+
+def run_size(size, args, directory, bridge_url):
+    import metrics
+    import pipeline
+    from faiss_store import FaissDocumentStore
+    from http_client import get_http_client
+    from index_snapshots import SnapshotPublisher
+    from llm_cache import LLMCache
+    from resources import build_embeddings, provide, release_resources
+    from retrieval_eval import synthetic_queries
+    from storacha_utils import StorachaClient
+
+    # Fresh index, caches and counters for every corpus size, the HTTP cache starts cold. Dropping the
+    # resources also drops the retriever built over the previous size's store
+    release_resources()
+    metrics.REGISTRY.reset()
+    get_http_client().session.cache.clear()
+    store = FaissDocumentStore(os.path.join(directory, "faiss_index.idx"), dimension=384, index_kind=args.index_kind)
+    storacha = StorachaClient(api_url=bridge_url, auth_headers=MOCK_HEADERS, native_car=True,
+                              token_cache_path=os.path.join(directory, "tokens.json"))
+    provide("faiss_store", store)
+    provide("llm", StubLLM(args.llm_latency))
+    provide("embeddings", build_embeddings() if args.embeddings == "model" else StubEmbeddings())
+    provide("llm_cache", LLMCache(os.path.join(directory, "llm_cache.db")))
+    provide("storacha", storacha)
+    provide("publisher", SnapshotPublisher(store, storacha, manifest_path=os.path.join(directory, "manifest.json")))
+
+    movie_ids = corpus(size)
+    phases = {}
+
+    def scrape(movie_id):
+        try:
+            pipeline.scrape_reviews(movie_id)
+        except pipeline.NoReviews:
+            pass
+
+    print(f"🎬 {size} movies")
+    phases["scrape_reviews"] = measure([lambda movie_id=movie_id: scrape(movie_id) for movie_id in movie_ids])
+    # The pages are now in the HTTP cache, so this is chunking + embedding + FAISS writes
+    phases["store_in_faiss"] = measure([lambda movie_id=movie_id: pipeline.ingest(movie_id) for movie_id in movie_ids])
+
+    queries = [item["query"] for item in synthetic_queries(store, args.queries, seed=0)]
+    phases["retrieve_and_answer"] = measure([lambda query=query: pipeline.ask(query) for query in queries])
+
+    with open(store.index_path, "rb") as f:
+        index_bytes = f.read()
+    phases["upload_binary"] = measure([lambda: storacha.upload_binary(index_bytes, "faiss_index.idx")])
+    if args.ipfs_car:
+        legacy = StorachaClient(api_url=bridge_url, auth_headers=MOCK_HEADERS, native_car=False,
+                                token_cache_path=os.path.join(directory, "tokens.json"))
+        phases["upload_binary_ipfs_car"] = measure([lambda: legacy.upload_binary(index_bytes, "faiss_index.idx")])
+    phases["publish_snapshot"] = measure([pipeline.publish])
+
+    for name, phase in phases.items():
+        print(f"  {name:<24}{phase['seconds']:>9.3f}s{phase['p50_ms']:>11.2f} ms p50{phase['p95_ms']:>11.2f} ms p95"
+              f"{phase['rss_high_water_mb']:>10.1f} MB rss")
+
+    stages = {
+        row["labels"]["stage"]: {key: row[key] for key in ("count", "sum", "p50", "p95")}
+        for row in metrics.REGISTRY.snapshot()["latency"] if row["name"] == "stage_seconds"
+    }
+    return {
+        "movies": size,
+        "chunks": len(store),
+        "queries": len(queries),
+        "index_bytes": len(index_bytes),
+        "phases": phases,
+        "stages": stages
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(baseline_path, results, threshold):
+    """Print the change in wall time of every phase against an earlier results file"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {run["movies"]: run for run in json.load(f)["runs"]}
+
+    print(f"\nAgainst {baseline_path} (regressions over {threshold:.0%} are flagged)")
+    print(f"{'movies':>7}  {'phase':<24}{'before':>10}{'after':>10}{'change':>9}")
+    regressions = 0
+    for run in results["runs"]:
+        before = baseline.get(run["movies"])
+        if before is None:
+            continue
+        for name, phase in run["phases"].items():
+            if name not in before["phases"]:
+                continue
+            old, new = before["phases"][name]["seconds"], phase["seconds"]
+            change = new / old - 1 if old else 0.0
+            flag = " ⚠️" if change > threshold else ""
+            regressions += change > threshold
+            print(f"{run['movies']:>7}  {name:<24}{old:>9.3f}s{new:>9.3f}s{change:>+9.1%}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of scraping, indexing, answering and uploading")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 200], help="Corpus sizes, in movies")
+    parser.add_argument("--queries", type=int, default=50, help="Questions answered per corpus size")
+    parser.add_argument("--index-kind", default="flat")
+    parser.add_argument("--embeddings", choices=["stub", "model"], default="stub",
+                        help="Deterministic stub vectors, or the real MiniLM model (needs it downloaded)")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds the stub LLM waits per call")
+    parser.add_argument("--page-latency", type=float, default=0.0, help="Seconds the fixture server waits per page")
+    parser.add_argument("--bridge-latency", type=float, default=0.0, help="Seconds the mock bridge waits per call")
+    parser.add_argument("--no-ipfs-car", dest="ipfs_car", action="store_false", help="Skip the fake ipfs-car upload path")
+    parser.add_argument("--no-tracemalloc", dest="tracemalloc", action="store_false",
+                        help="Skip Python allocation peaks (tracing slows the run down)")
+    parser.add_argument("--output", default="pipeline_benchmark.json")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Slowdown reported as a regression")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Set before the scraper and HTTP client modules read them
+        fixture_server, base_url = start_fixture_server(latency=args.page_latency)
+        bridge, bridge_url, _ = start_mock_bridge(latency=args.bridge_latency)
+        os.environ.update({
+            "FILMAFFINITY_BASE_URL": base_url,
+            "HTTP_CACHE_PATH": os.path.join(directory, "http_cache"),
+            "SCRAPER_RATE_LIMIT": "10000",
+            "SCRAPER_BURST": "10000"
+        })
+        if args.ipfs_car:
+            fake_ipfs_car.install(directory)
+
+        if args.tracemalloc:
+            tracemalloc.start()
+        runs = []
+        for size in args.sizes:
+            size_directory = os.path.join(directory, f"movies_{size}")
+            os.makedirs(size_directory)
+            runs.append(run_size(size, args, size_directory, bridge_url))
+        if args.tracemalloc:
+            tracemalloc.stop()
+
+        fixture_server.shutdown()
+        bridge.shutdown()
+
+    results = {
+        "benchmark": "pipeline",
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": vars(args),
+        "runs": runs
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\n📝 Results written to {args.output}")
+
+    if args.compare and compare(args.compare, results, args.threshold):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
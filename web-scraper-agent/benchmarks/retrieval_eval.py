@@ -0,0 +1,83 @@
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from hybrid_retriever import CrossEncoderReranker, DEFAULT_RERANKER_MODEL
+from resources import build_embeddings, build_retriever, build_store
+
+# Recall@k and latency of each retrieval stage (dense, BM25, fused, reranked) over labelled questions
+def load_queries(path):
+    """JSON lines with a "query" and any of "relevant_ids", "relevant_urls" or "movie_ids" """
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def synthetic_queries(store, count, seed):
+    """Questions made of a few words taken from random chunks, the chunk itself being the only relevant one"""
+    rng = random.Random(seed)
+    rows = store.conn.execute("SELECT id, text FROM chunks").fetchall()
+    queries = []
+    for chunk_id, text in rng.sample(rows, min(count, len(rows))):
+        words = re.findall(r"\w+", text)
+        if len(words) < 6:
+            continue
+        start = rng.randrange(0, len(words) - 5)
+        queries.append({"query": " ".join(words[start:start + rng.randint(4, 8)]), "relevant_ids": [chunk_id]})
+    return queries
+
+def is_relevant(chunk, item):
+    return (
+        chunk["id"] in item.get("relevant_ids", ())
+        or chunk["url"] in item.get("relevant_urls", ())
+        or str(chunk["movie_id"]) in {str(movie_id) for movie_id in item.get("movie_ids", ())}
+    )
+
+def evaluate(name, search, queries, k):
+    hits, seconds = 0, 0.0
+    for item in queries:
+        start = time.perf_counter()
+        results = search(item["query"])[:k]
+        seconds += time.perf_counter() - start
+        hits += any(is_relevant(chunk, item) for chunk in results)
+    print(f"{name:<18}{hits / len(queries):>12.3f}{1000 * seconds / len(queries):>12.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate dense, BM25, hybrid and reranked retrieval")
+    parser.add_argument("--index", default="faiss_index.idx")
+    parser.add_argument("--queries", help="JSON lines file with labelled questions (default: synthetic ones)")
+    parser.add_argument("--synthetic", type=int, default=200, help="Synthetic questions to sample from the stored chunks")
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--candidates", type=int, default=20)
+    parser.add_argument("--dense-weight", type=float, default=1.0)
+    parser.add_argument("--sparse-weight", type=float, default=1.0)
+    parser.add_argument("--rerank", nargs="?", const=DEFAULT_RERANKER_MODEL, help="Also evaluate a cross-encoder reranker")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    store = build_store(args.index)
+    if not len(store):
+        raise SystemExit(f"❌ No chunks in {args.index}, ingest some movies first")
+    queries = load_queries(args.queries) if args.queries else synthetic_queries(store, args.synthetic, args.seed)
+
+    retriever = build_retriever(store, build_embeddings())
+    retriever.k = args.k
+    retriever.candidates = args.candidates
+    retriever.dense_weight = args.dense_weight
+    retriever.sparse_weight = args.sparse_weight
+    retriever.reranker = None
+
+    print(f"{len(queries)} questions, {len(store)} chunks, k={args.k}")
+    print(f"{'stage':<18}{'recall@k':>12}{'ms/query':>12}")
+    evaluate("dense", lambda query: retriever.dense(query, args.k), queries, args.k)
+    evaluate("bm25", lambda query: retriever.sparse(query, args.k), queries, args.k)
+    evaluate("hybrid (rrf)", retriever.retrieve, queries, args.k)
+    if args.rerank:
+        retriever.reranker = CrossEncoderReranker(args.rerank)
+        evaluate("hybrid + rerank", retriever.retrieve, queries, args.k)
+
+if __name__ == "__main__":
+    main()
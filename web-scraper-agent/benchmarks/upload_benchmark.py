@@ -0,0 +1,49 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mock_bridge import start_mock_bridge
+from storacha_utils import StorachaClient
+
+MOCK_HEADERS = {"X-Auth-Secret": "mock", "Authorization": "mock"}
+
+# One-by-one uploads vs batched bridge calls vs the background queue, against the local mock bridge
+def run(label, uploads, latency, upload):
+    server, bridge_url, state = start_mock_bridge(latency=latency)
+    client = StorachaClient(api_url=bridge_url, auth_headers=MOCK_HEADERS)
+    start = time.perf_counter()
+    results = upload(client, uploads)
+    seconds = time.perf_counter() - start
+    server.shutdown()
+
+    failed = sum(result["status"] != "success" for result in results)
+    print(f"{label:<12}{seconds:>9.2f}s{len(uploads) / seconds:>12.1f}{state.calls['bridge']:>14}{state.calls['put']:>7}{failed:>8}")
+
+def serial(client, uploads):
+    return [client.upload_text(text, title) for text, title in uploads]
+
+def batched(client, uploads):
+    return client.upload_many([(text.encode("utf-8"), client._text_filename(title)) for text, title in uploads])
+
+def queued(client, uploads):
+    futures = [client.enqueue_text(text, title) for text, title in uploads]
+    return [future.result() for future in futures]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Storacha upload modes against a mock bridge")
+    parser.add_argument("--uploads", type=int, default=50)
+    parser.add_argument("--size-kb", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated seconds per bridge/PUT round trip")
+    args = parser.parse_args()
+
+    uploads = [(f"Review {i} " + "x" * (args.size_kb * 1024), f"Movie {i}") for i in range(args.uploads)]
+    print(f"{args.uploads} uploads of {args.size_kb} KiB, {1000 * args.latency:.0f} ms per round trip")
+    print(f"{'mode':<12}{'time':>10}{'uploads/s':>12}{'bridge calls':>14}{'PUTs':>7}{'errors':>8}")
+    run("serial", uploads, args.latency, serial)
+    run("batched", uploads, args.latency, batched)
+    run("queue", uploads, args.latency, queued)
+
+if __name__ == "__main__":
+    main()
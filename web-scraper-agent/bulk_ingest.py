@@ -0,0 +1,119 @@
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
+from chunking import split_into_chunks
+from review_scraper import fetch_reviews, reviews_url
+
+class BulkIngester:
+    """Scrapes many movies concurrently while embedding and indexing their chunks in large batches"""
+
+    def __init__(self, store, embeddings, scrape_workers=8, batch_size=512):
+        self.store = store
+        self.embeddings = embeddings
+        self.scrape_workers = scrape_workers
+        self.batch_size = batch_size
+        self.stats = {"movies": 0, "chunks": 0, "failed": 0, "empty": 0, "batches": 0}
+
+    def _scrape(self, movie_id):
+        url = reviews_url(movie_id)
+        return movie_id, url, "\n".join(fetch_reviews(url))
+
+    def _flush(self, batch):
+        """Embed a batch of chunks in one call, add it to FAISS and save the index once"""
+        if not batch:
+            return
+
+        vectors = np.array(self.embeddings.embed_documents([chunk["text"] for chunk in batch]), dtype=np.float32)
+
+        # Replace what was stored for these movies before, then add the whole batch at once
+        self.store.remove_urls(chunk["url"] for chunk in batch)
+        self.store.add_chunks(batch, vectors)
+        self.store.save()
+
+        self.stats["chunks"] += len(batch)
+        self.stats["batches"] += 1
+
+    def run(self, movie_ids, progress=print):
+        """Ingest every movie id, returns throughput stats"""
+        start = time.perf_counter()
+        batch = []
+
+        # Scraping is I/O bound and runs in the pool while the main thread embeds finished pages
+        with ThreadPoolExecutor(max_workers=self.scrape_workers) as pool:
+            futures = [pool.submit(self._scrape, movie_id) for movie_id in movie_ids]
+            for future in as_completed(futures):
+                try:
+                    movie_id, url, text = future.result()
+                except Exception as e:
+                    self.stats["failed"] += 1
+                    progress(f"⚠️ {e}")
+                    continue
+
+                if not text:
+                    self.stats["empty"] += 1
+                    continue
+
+                self.stats["movies"] += 1
+                # Keep all chunks of a movie in the same batch so a re-ingest replaces them together
+                batch.extend(split_into_chunks(text, url, movie_id))
+                if len(batch) >= self.batch_size:
+                    self._flush(batch)
+                    batch = []
+                    progress(self._report(start))
+
+        self._flush(batch)
+
+        elapsed = time.perf_counter() - start
+        self.stats["seconds"] = elapsed
+        self.stats["movies_per_sec"] = self.stats["movies"] / elapsed if elapsed else 0.0
+        self.stats["chunks_per_sec"] = self.stats["chunks"] / elapsed if elapsed else 0.0
+        return self.stats
+
+    def _report(self, start):
+        elapsed = time.perf_counter() - start
+        return (f"📦 {self.stats['movies']} movies, {self.stats['chunks']} chunks "
+                f"({self.stats['movies'] / elapsed:.2f} movies/s, {self.stats['chunks'] / elapsed:.1f} chunks/s)")
+
+def resolve_movie_ids(ids=None, ids_file=None, query=None):
+    """Collect movie ids from the command line, a file (one per line) or a FilmAffinity search"""
+    movie_ids = list(ids or [])
+
+    if ids_file:
+        with open(ids_file, encoding="utf-8") as f:
+            movie_ids += [line.strip() for line in f if line.strip()]
+
+    if query:
+        from review_scraper import filmaffinity_client
+        fa = filmaffinity_client()
+        movie_ids += [pelicula["id"] for pelicula in fa.search(title=query)]
+
+    return list(dict.fromkeys(str(movie_id) for movie_id in movie_ids))
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk ingest FilmAffinity reviews into the FAISS index")
+    parser.add_argument("--ids", nargs="*", help="FilmAffinity movie ids")
+    parser.add_argument("--ids-file", help="File with one movie id per line")
+    parser.add_argument("--search", help="Ingest every result of a FilmAffinity title search")
+    parser.add_argument("--index", default="faiss_index.idx", help="Path to the FAISS index")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent scraping threads")
+    parser.add_argument("--batch-size", type=int, default=512, help="Chunks embedded and indexed per batch")
+    args = parser.parse_args()
+
+    movie_ids = resolve_movie_ids(args.ids, args.ids_file, args.search)
+    if not movie_ids:
+        parser.error("No movie ids given, use --ids, --ids-file or --search")
+
+    from resources import build_embeddings, build_store
+
+    embeddings = build_embeddings(batch_size=128)
+    store = build_store(args.index)
+
+    print(f"🎬 Ingesting {len(movie_ids)} movies...")
+    stats = BulkIngester(store, embeddings, args.workers, args.batch_size).run(movie_ids)
+    print(f"✅ {stats['movies']} movies ({stats['failed']} failed, {stats['empty']} without reviews), "
+          f"{stats['chunks']} chunks in {stats['batches']} batches, {stats['seconds']:.1f}s: "
+          f"{stats['movies_per_sec']:.2f} movies/s, {stats['chunks_per_sec']:.1f} chunks/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import base64
+import hashlib
+
+# Multicodec codes
+RAW = 0x55
+DAG_PB = 0x70
+CAR = 0x0202
+SHA2_256 = 0x12
+
+# Same UnixFS settings as ipfs-car: 1 MiB raw leaves, balanced tree of width 1024, file wrapped in a directory
+CHUNK_SIZE = 1024 * 1024
+TREE_WIDTH = 1024
+
+def encode_varint(value):
+    """Unsigned LEB128 varint, as used by multiformats, protobuf and CAR framing"""
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+def make_cid(codec, data):
+    """Binary CIDv1 of data with a sha2-256 multihash"""
+    digest = hashlib.sha256(data).digest()
+    return b"\x01" + encode_varint(codec) + bytes([SHA2_256, len(digest)]) + digest
+
+def cid_to_string(cid):
+    """Multibase base32 (lowercase, unpadded) string form of a binary CID"""
+    return "b" + base64.b32encode(cid).decode("ascii").lower().rstrip("=")
+
+def _pb_field(number, wire_type):
+    return encode_varint((number << 3) | wire_type)
+
+def _pb_bytes(number, value):
+    return _pb_field(number, 2) + encode_varint(len(value)) + value
+
+def _pb_uint(number, value):
+    return _pb_field(number, 0) + encode_varint(value)
+
+def encode_dag_pb(links, data):
+    """dag-pb node: links (hash, name, tsize) first, then the UnixFS data, as the spec orders them.
+    A name of None leaves the field out, "" writes an empty one"""
+    out = bytearray()
+    for cid, name, tsize in links:
+        link = _pb_bytes(1, cid)
+        if name is not None:
+            link += _pb_bytes(2, name.encode("utf-8"))
+        link += _pb_uint(3, tsize)
+        out += _pb_bytes(2, link)
+    out += _pb_bytes(1, data)
+    return bytes(out)
+
+def unixfs_file(filesize, blocksizes):
+    """UnixFS Data message for a file node (Type=File, filesize, one blocksize per child)"""
+    out = _pb_uint(1, 2) + _pb_uint(3, filesize)
+    for size in blocksizes:
+        out += _pb_uint(4, size)
+    return out
+
+def unixfs_directory():
+    """UnixFS Data message for a plain directory"""
+    return _pb_uint(1, 1)
+
+class UnixFSBuilder:
+    """Incremental balanced UnixFS DAG builder: feed bytes with write(), get the root with finish().
+    With keep_blocks=False only CIDs are kept, so large files can be verified in constant memory"""
+
+    def __init__(self, chunk_size=CHUNK_SIZE, width=TREE_WIDTH, keep_blocks=True):
+        self.chunk_size = chunk_size
+        self.width = width
+        self.keep_blocks = keep_blocks
+        self.blocks = []
+        self.buffer = bytearray()
+        # Leaves: (cid, content size, dag byte length)
+        self.leaves = []
+
+    def _add_leaf(self, chunk):
+        cid = make_cid(RAW, chunk)
+        if self.keep_blocks:
+            self.blocks.append((cid, chunk))
+        self.leaves.append((cid, len(chunk), len(chunk)))
+
+    def write(self, data):
+        self.buffer += data
+        while len(self.buffer) >= self.chunk_size:
+            self._add_leaf(bytes(self.buffer[:self.chunk_size]))
+            del self.buffer[:self.chunk_size]
+
+    def finish(self):
+        """Returns (root cid, dag byte length)"""
+        if self.buffer or not self.leaves:
+            self._add_leaf(bytes(self.buffer))
+            self.buffer.clear()
+
+        # Small files are a single raw block
+        nodes = self.leaves
+        while len(nodes) > 1:
+            parents = []
+            for start in range(0, len(nodes), self.width):
+                children = nodes[start:start + self.width]
+                # File links carry an empty Name (field present, zero length) like kubo and @ipld/unixfs,
+                # omitting it would change the CID of every multi-block file
+                node = encode_dag_pb(
+                    [(cid, "", tsize) for cid, _, tsize in children],
+                    unixfs_file(sum(size for _, size, _ in children), [size for _, size, _ in children])
+                )
+                cid = make_cid(DAG_PB, node)
+                if self.keep_blocks:
+                    self.blocks.append((cid, node))
+                parents.append((cid, sum(size for _, size, _ in children), len(node) + sum(tsize for _, _, tsize in children)))
+            nodes = parents
+
+        root_cid, _, dag_size = nodes[0]
+        return root_cid, dag_size
+
+def build_file_dag(data, chunk_size=CHUNK_SIZE, width=TREE_WIDTH):
+    """Chunk data into a balanced UnixFS DAG, returns (root cid, dag byte length, blocks in write order)"""
+    builder = UnixFSBuilder(chunk_size, width)
+    builder.write(data)
+    root_cid, dag_size = builder.finish()
+    return root_cid, dag_size, builder.blocks
+
+def wrap_in_directory(root, name, dag_size):
+    """Returns (cid, block) of a directory holding a single named file"""
+    directory = encode_dag_pb([(root, name, dag_size)], unixfs_directory())
+    return make_cid(DAG_PB, directory), directory
+
+def file_cids(path, name=None, chunk_size=CHUNK_SIZE, width=TREE_WIDTH):
+    """CID strings of a file on disk as packed by pack(): (file cid, cid of the wrapping directory or None)"""
+    builder = UnixFSBuilder(chunk_size, width, keep_blocks=False)
+    with open(path, "rb") as f:
+        for data in iter(lambda: f.read(chunk_size), b""):
+            builder.write(data)
+    root, dag_size = builder.finish()
+    wrapped = cid_to_string(wrap_in_directory(root, name, dag_size)[0]) if name else None
+    return cid_to_string(root), wrapped
+
+def encode_car(root, blocks):
+    """CARv1: varint-framed dag-cbor header {roots: [root], version: 1} followed by varint-framed blocks"""
+    # dag-cbor map with canonical key order ("roots" sorts before "version"), CIDs as tag 42 with a 0x00 prefix
+    cid_bytes = b"\x00" + root
+    header = (
+        b"\xa2"
+        + b"\x65roots" + b"\x81" + b"\xd8\x2a" + _cbor_bytes_head(len(cid_bytes)) + cid_bytes
+        + b"\x67version" + b"\x01"
+    )
+    out = bytearray(encode_varint(len(header)) + header)
+    for cid, data in blocks:
+        out += encode_varint(len(cid) + len(data))
+        out += cid
+        out += data
+    return bytes(out)
+
+def _cbor_bytes_head(length):
+    if length < 24:
+        return bytes([0x40 | length])
+    if length < 256:
+        return bytes([0x58, length])
+    return bytes([0x59]) + length.to_bytes(2, "big")
+
+def pack(data, name, wrap=True, chunk_size=CHUNK_SIZE, width=TREE_WIDTH):
+    """Pack bytes into a CAR in memory, like `ipfs-car pack`. Returns (car bytes, root cid, car cid) as strings for the cids"""
+    root, dag_size, blocks = build_file_dag(data, chunk_size, width)
+
+    if wrap:
+        root, directory = wrap_in_directory(root, name, dag_size)
+        blocks.append((root, directory))
+
+    car = encode_car(root, blocks)
+    return car, cid_to_string(root), cid_to_string(make_cid(CAR, car))
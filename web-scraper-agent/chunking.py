@@ -0,0 +1,204 @@
+import os
+import re
+import threading
+import zlib
+import numpy as np
+import metrics
+from resources import EMBEDDING_MODEL
+
+# all-MiniLM-L6-v2 silently drops everything past 256 word pieces, so chunks are kept within one pass of the model
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "256"))
+CHUNK_OVERLAP_SENTENCES = int(os.getenv("CHUNK_OVERLAP_SENTENCES", "0"))
+# Estimated Jaccard similarity (of word shingles) above which a chunk counts as a near-duplicate
+DEDUPE_THRESHOLD = float(os.getenv("CHUNK_DEDUPE_THRESHOLD", "0.8"))
+
+# A sentence runs up to its final punctuation (and closing quotes or brackets), or to the end of the text
+SENTENCE = re.compile(r"\S.*?(?:[.!?…]+[\"'»”)\]]*(?=\s|$)|$)", re.S)
+WORD = re.compile(r"\w+", re.UNICODE)
+
+def split_sentences(text):
+    """(start, end) offsets of each sentence in text"""
+    return [match.span() for match in SENTENCE.finditer(text)]
+
+def review_spans(text):
+    """(start, end) offsets of each non-empty line (review) in newline separated review text"""
+    spans, start = [], 0
+    for line in text.split("\n"):
+        if line.strip():
+            spans.append((start, start + len(line)))
+        start += len(line) + 1
+    return spans
+
+class TokenCounter:
+    """Counts tokens with the embedding model's tokenizer when it is available locally, estimates them otherwise"""
+
+    def __init__(self, model_name=EMBEDDING_MODEL):
+        self.model_name = model_name
+        self.tokenizer = None
+        self.loaded = False
+        self.lock = threading.Lock()
+
+    def _load(self):
+        with self.lock:
+            if not self.loaded:
+                try:
+                    from transformers import AutoTokenizer
+                    self.tokenizer = AutoTokenizer.from_pretrained(self.model_name, local_files_only=True)
+                except Exception:
+                    self.tokenizer = None
+                self.loaded = True
+
+    @staticmethod
+    def estimate(text):
+        # WordPiece splits Spanish words into ~1.5 pieces with MiniLM's English vocabulary, plus punctuation
+        words = len(WORD.findall(text))
+        return int(1.5 * words) + len(text.split()) - words + 1
+
+    def counts(self, texts):
+        self._load()
+        if self.tokenizer is None:
+            return [self.estimate(text) for text in texts]
+        return [len(ids) for ids in self.tokenizer(list(texts), add_special_tokens=False)["input_ids"]]
+
+_default_counter = TokenCounter()
+
+def _split_long(text, start, end, tokens, budget):
+    """Split an over-long sentence at word boundaries into pieces of about budget tokens,
+    returns (start, end, estimated tokens) per piece"""
+    pieces = -(-tokens // budget)
+    step = (end - start) / pieces
+    spans, piece_start = [], start
+    for i in range(1, pieces):
+        # Cut at the first whitespace after the target so no word is split
+        cut = int(start + i * step)
+        while cut < end and not text[cut].isspace():
+            cut += 1
+        if piece_start < cut < end:
+            spans.append((piece_start, cut))
+            piece_start = cut + 1
+    spans.append((piece_start, end))
+    return [(s, e, -(-tokens * (e - s) // (end - start))) for s, e in spans]
+
+def chunk_review(text, start, end, max_tokens=CHUNK_MAX_TOKENS, overlap_sentences=CHUNK_OVERLAP_SENTENCES, counter=None):
+    """(start, end) spans of the chunks of the review at text[start:end]: whole sentences packed up to
+    max_tokens, repeating the last overlap_sentences sentences at the start of the next chunk"""
+    counter = counter or _default_counter
+    # Room for the [CLS] and [SEP] tokens the model adds
+    budget = max(8, max_tokens - 2)
+
+    sentences = [(start + s, start + e) for s, e in split_sentences(text[start:end])]
+    counts = counter.counts([text[s:e] for s, e in sentences])
+    units = []
+    for (s, e), tokens in zip(sentences, counts):
+        units.extend(_split_long(text, s, e, tokens, budget) if tokens > budget else [(s, e, tokens)])
+
+    chunks, current = [], []
+    for unit in units:
+        if current and sum(tokens for _, _, tokens in current) + unit[2] > budget:
+            chunks.append((current[0][0], current[-1][1]))
+            current = current[-overlap_sentences:] if overlap_sentences else []
+            if sum(tokens for _, _, tokens in current) + unit[2] > budget:
+                current = []
+        current.append(unit)
+    if current:
+        chunks.append((current[0][0], current[-1][1]))
+    return chunks
+
+class MinHashDeduplicator:
+    """Near-duplicate detection with MinHash signatures of word shingles and LSH banding,
+    e.g. the same syndicated review published by several outlets"""
+
+    # Universal hashing (a * x + b) mod a Mersenne prime, the products wrap around in uint64 as in datasketch
+    PRIME = (1 << 61) - 1
+
+    def __init__(self, threshold=DEDUPE_THRESHOLD, num_perm=128, bands=32, shingle_size=3, seed=1):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, self.PRIME, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, self.PRIME, num_perm, dtype=np.uint64)
+
+    def shingles(self, text):
+        words = [word.lower() for word in WORD.findall(text)]
+        if len(words) <= self.shingle_size:
+            return {" ".join(words)}
+        return {" ".join(words[i:i + self.shingle_size]) for i in range(len(words) - self.shingle_size + 1)}
+
+    def signature(self, text):
+        hashes = np.array([zlib.crc32(shingle.encode("utf-8")) for shingle in self.shingles(text)], dtype=np.uint64)
+        return ((np.outer(hashes, self.a) + self.b) % np.uint64(self.PRIME)).min(axis=0)
+
+    def duplicates(self, texts):
+        """Index of the earlier text each text duplicates, or None for texts that are kept"""
+        signatures = [self.signature(text) for text in texts]
+        buckets = {}
+        result = []
+        for i, signature in enumerate(signatures):
+            original = None
+            candidates = set()
+            for band in range(self.bands):
+                key = (band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+                candidates.update(buckets.get(key, ()))
+            for j in sorted(candidates):
+                if np.mean(signatures[j] == signature) >= self.threshold:
+                    original = j
+                    break
+            result.append(original)
+
+            # Only kept texts are indexed, so every duplicate points at a chunk that is stored
+            if original is None:
+                for band in range(self.bands):
+                    key = (band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+                    buckets.setdefault(key, []).append(i)
+        return result
+
+_default_deduplicator = MinHashDeduplicator()
+
+def _pack(units, budget):
+    """Greedily group neighbouring (start, end, tokens) units into lists of units of up to budget tokens.
+    A None unit (a dropped duplicate) ends the group, so every group covers one contiguous span of text"""
+    groups, current, tokens = [], [], 0
+    for unit in units:
+        if current and (unit is None or tokens + unit[2] > budget):
+            groups.append(current)
+            current, tokens = [], 0
+        if unit is not None:
+            current.append(unit)
+            tokens += unit[2]
+    if current:
+        groups.append(current)
+    return groups
+
+def split_into_chunks(text, url, movie_id=None, max_tokens=CHUNK_MAX_TOKENS, overlap_sentences=CHUNK_OVERLAP_SENTENCES,
+                      dedupe=True, counter=None, deduplicator=None):
+    """Split newline separated reviews into chunks of whole reviews (or whole sentences of reviews longer than
+    max_tokens) that remember the span of text they cover. Near-duplicate reviews are dropped before they are embedded"""
+    counter = counter or _default_counter
+    budget = max(8, max_tokens - 2)
+
+    reviews = review_spans(text)
+    units = []
+    for (start, end), tokens in zip(reviews, counter.counts([text[start:end] for start, end in reviews])):
+        if tokens <= budget:
+            units.append((start, end, tokens))
+        else:
+            # A long review is chunked on its own, its pieces fill a chunk each
+            units.extend((s, e, budget) for s, e in chunk_review(text, start, end, max_tokens, overlap_sentences, counter))
+
+    if dedupe and len(units) > 1:
+        duplicates = (deduplicator or _default_deduplicator).duplicates([text[start:end] for start, end, _ in units])
+        metrics.inc("chunks_deduplicated_total", sum(original is not None for original in duplicates))
+        units = [unit if original is None else None for unit, original in zip(units, duplicates)]
+
+    return [
+        {
+            "text": text[group[0][0]:group[-1][1]],
+            "url": url,
+            "movie_id": movie_id,
+            "start": group[0][0],
+            "end": group[-1][1]
+        }
+        for group in _pack(units, budget)
+    ]
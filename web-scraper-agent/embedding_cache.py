@@ -0,0 +1,170 @@
+import os
+import sqlite3
+import hashlib
+import threading
+import time
+import numpy as np
+import metrics
+
+class EmbeddingCache:
+    """Disk-backed LRU cache of embeddings: a float32 memory-mapped array plus a SQLite index file"""
+
+    def __init__(self, path="embedding_cache", dimension=384, max_entries=200000):
+        self.path = path
+        self.dimension = dimension
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(path, exist_ok=True)
+
+        self.conn = sqlite3.connect(os.path.join(path, "index.db"), check_same_thread=False)
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                slot INTEGER NOT NULL UNIQUE,
+                last_used INTEGER NOT NULL
+            )"""
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value INTEGER)")
+
+        # A cache built with another shape cannot be reused, start over
+        vectors_path = os.path.join(path, "vectors.f32")
+        settings = dict(self.conn.execute("SELECT name, value FROM settings").fetchall())
+        if settings != {"dimension": dimension, "max_entries": max_entries} or not os.path.exists(vectors_path):
+            self.conn.execute("DELETE FROM entries")
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO settings VALUES (?, ?)",
+                [("dimension", dimension), ("max_entries", max_entries)]
+            )
+            self.vectors = np.memmap(vectors_path, dtype=np.float32, mode="w+", shape=(max_entries, dimension))
+        else:
+            self.vectors = np.memmap(vectors_path, dtype=np.float32, mode="r+", shape=(max_entries, dimension))
+        self.conn.commit()
+
+    @staticmethod
+    def make_key(model_name, text, kind="document"):
+        """Cache key for a text embedded by a given model"""
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{model_name}:{kind}:{digest}"
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def _lookup(self, keys):
+        """Map the cached keys among keys to their slot"""
+        found = {}
+        # Stay well under SQLite's bound parameter limit
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            found.update(self.conn.execute(
+                f"SELECT key, slot FROM entries WHERE key IN ({placeholders})", batch
+            ).fetchall())
+        return found
+
+    def get_many(self, keys):
+        """Return a list with the cached vector for each key, or None when missing"""
+        if not keys:
+            return []
+
+        with self.lock:
+            found = self._lookup(keys)
+            if found:
+                now = time.time_ns()
+                self.conn.executemany("UPDATE entries SET last_used = ? WHERE key = ?", [(now, key) for key in found])
+                self.conn.commit()
+
+            results = [np.array(self.vectors[found[key]]) if key in found else None for key in keys]
+
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        metrics.inc("cache_requests_total", len(found), cache="embedding", result="hit")
+        metrics.inc("cache_requests_total", len(keys) - len(found), cache="embedding", result="miss")
+        return results
+
+    def put_many(self, keys, vectors):
+        """Store vectors, evicting the least recently used entries once the cache is full"""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimension)
+        pending = {key: vector for key, vector in zip(keys, vectors)}
+
+        with self.lock:
+            existing = self._lookup(list(pending))
+
+            # Refresh entries we already have so they are not picked for eviction below
+            now = time.time_ns()
+            rows = []
+            for key, slot in existing.items():
+                self.vectors[slot] = pending[key]
+                rows.append((key, slot, now))
+            self.conn.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?)", rows)
+
+            new_keys = [key for key in pending if key not in existing][:self.max_entries]
+            used = len(self)
+            free_slots = list(range(used, min(self.max_entries, used + len(new_keys))))
+
+            # Reuse the slots of the least recently used entries for whatever does not fit
+            evict_count = len(new_keys) - len(free_slots)
+            if evict_count > 0:
+                evicted = self.conn.execute(
+                    "SELECT key, slot FROM entries WHERE last_used < ? ORDER BY last_used LIMIT ?", (now, evict_count)
+                ).fetchall()
+                self.conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in evicted])
+                free_slots += [slot for _, slot in evicted]
+
+            rows = []
+            for key, slot in zip(new_keys, free_slots):
+                self.vectors[slot] = pending[key]
+                rows.append((key, slot, now))
+
+            self.vectors.flush()
+            self.conn.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?)", rows)
+            self.conn.commit()
+
+    def stats(self):
+        return {"entries": len(self), "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses}
+
+class CachedEmbeddings:
+    """Wraps a LangChain embeddings model so repeated texts skip the forward pass"""
+
+    def __init__(self, embeddings, cache, model_name):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_name = model_name
+
+    def _embed(self, texts, kind):
+        keys = [self.cache.make_key(self.model_name, text, kind=kind) for text in texts]
+        vectors = self.cache.get_many(keys)
+
+        # Only the texts we have never seen go through the model, once each and in a single call
+        missing = {}
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(keys[i], i)
+        if missing:
+            with metrics.span("embedding_model"):
+                computed = np.asarray(self.embeddings.embed_documents([texts[i] for i in missing.values()]), dtype=np.float32)
+            metrics.inc("texts_embedded_total", len(missing), kind=kind)
+            self.cache.put_many(list(missing), computed)
+            by_key = dict(zip(missing, computed))
+            vectors = [by_key[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+
+        return [vector.tolist() for vector in vectors]
+
+    def embed_documents(self, texts):
+        return self._embed(texts, "document")
+
+    def embed_queries(self, texts):
+        """Embed many questions with one model call (MiniLM encodes queries and documents the same way)"""
+        return self._embed(texts, "query")
+
+    def embed_query(self, text):
+        key = self.cache.make_key(self.model_name, text, kind="query")
+        vector = self.cache.get_many([key])[0]
+        if vector is None:
+            with metrics.span("embedding_model"):
+                vector = np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+            metrics.inc("texts_embedded_total", kind="query")
+            self.cache.put_many([key], vector)
+        return vector.tolist()
@@ -0,0 +1,451 @@
+import os
+import re
+import sqlite3
+import hashlib
+import threading
+import faiss
+import numpy as np
+from index_factory import (
+    build_index, extract_vectors, index_ids, index_kind, index_params, is_id_mapped, min_training_size, read_index,
+    search_parameters, set_search_params, supports_remove
+)
+
+# Filtered searches over fewer chunks than this compare the query with each of them exactly
+EXACT_SEARCH_LIMIT = 4096
+
+# Filters accepted by search and keyword_search, and the column each one matches
+FILTER_COLUMNS = {"movie_id": "c.movie_id", "url": "c.url", "year": "m.year", "country": "m.country"}
+
+class FaissDocumentStore:
+    """FAISS index keyed by stable chunk ids with a SQLite metadata sidecar"""
+
+    def __init__(self, index_path="faiss_index.idx", metadata_path=None, dimension=384,
+                 index_kind="flat", index_params=None, nprobe=None, ef_search=None, mmap=False):
+        self.index_path = index_path
+        self.mmap = mmap
+        self.metadata_path = metadata_path or f"{os.path.splitext(index_path)[0]}.db"
+        self.dimension = dimension
+        self.index_kind = index_kind
+        self.index_params = index_params or {}
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        # File the index is memory-mapped from, None once it is in RAM
+        self.mapped_path = None
+        self.index = self._new_index()
+        self.lock = threading.RLock()
+
+        # The sidecar lives next to the index so both are saved and loaded together
+        self.conn = sqlite3.connect(self.metadata_path, check_same_thread=False)
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS chunks (
+                id INTEGER PRIMARY KEY,
+                movie_id TEXT,
+                url TEXT NOT NULL,
+                start_offset INTEGER NOT NULL,
+                end_offset INTEGER NOT NULL,
+                text TEXT NOT NULL
+            )"""
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS chunks_url ON chunks (url)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS chunks_movie ON chunks (movie_id)")
+        # Movie metadata used to filter searches by year or country
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS movies (
+                movie_id TEXT PRIMARY KEY,
+                title TEXT,
+                year INTEGER,
+                country TEXT
+            )"""
+        )
+        self._create_keyword_index()
+        # Sources added or removed since the last published snapshot (see index_snapshots.py)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS unpublished_urls (seq INTEGER PRIMARY KEY AUTOINCREMENT, url TEXT UNIQUE NOT NULL)")
+        self.conn.commit()
+
+    def _create_keyword_index(self):
+        """BM25 inverted index (SQLite FTS5) over the chunk texts, kept in sync with the chunks table by triggers"""
+        exists = self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'chunks_fts'").fetchone()
+        # Rows dropped by INSERT OR REPLACE only fire the delete trigger with recursive triggers on
+        self.conn.execute("PRAGMA recursive_triggers = ON")
+        # unicode61 folds accents, so "almodovar" matches "Almodóvar"
+        self.conn.executescript(
+            """CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+                text, content='chunks', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+            );
+            CREATE TRIGGER IF NOT EXISTS chunks_fts_insert AFTER INSERT ON chunks BEGIN
+                INSERT INTO chunks_fts (rowid, text) VALUES (new.id, new.text);
+            END;
+            CREATE TRIGGER IF NOT EXISTS chunks_fts_delete AFTER DELETE ON chunks BEGIN
+                INSERT INTO chunks_fts (chunks_fts, rowid, text) VALUES ('delete', old.id, old.text);
+            END;
+            CREATE TRIGGER IF NOT EXISTS chunks_fts_update AFTER UPDATE ON chunks BEGIN
+                INSERT INTO chunks_fts (chunks_fts, rowid, text) VALUES ('delete', old.id, old.text);
+                INSERT INTO chunks_fts (rowid, text) VALUES (new.id, new.text);
+            END;"""
+        )
+        # Sidecars written before the keyword index existed are indexed once
+        if not exists:
+            self.conn.execute("INSERT INTO chunks_fts (chunks_fts) VALUES ('rebuild')")
+
+    def _new_index(self):
+        """Create an empty id-mapped index, starting flat until trainable kinds have enough data"""
+        kind = self.index_kind if min_training_size(self.index_kind, **self.index_params) == 0 else "flat"
+        index = build_index(kind, self.dimension, **self.index_params)
+        return set_search_params(index, self.nprobe, self.ef_search)
+
+    def rebuild(self, kind=None, **params):
+        """Rebuild the index as another kind (e.g. migrate a flat index to HNSW or IVF-PQ)"""
+        with self.lock:
+            kind = kind or self.index_kind
+            # Parameters only carry over when the kind stays the same, another kind starts from its own defaults
+            if not params and kind == self.index_kind:
+                params = self.index_params
+            params = index_params(kind, **params)
+            ids, vectors = extract_vectors(self.index)
+
+            new_index = build_index(kind, self.dimension, training_vectors=vectors, **params)
+            set_search_params(new_index, self.nprobe, self.ef_search)
+            if len(ids):
+                new_index.add_with_ids(vectors, ids)
+
+            self._set_index(new_index)
+            self.index_kind = kind
+            self.index_params = params
+            return self.index
+
+    def _maybe_upgrade(self):
+        """Switch from the flat bootstrap index to the configured kind once there is enough data to train it.
+        An index of another trained kind (e.g. migrated with rebuild_index.py) is kept as it is"""
+        if self.index_kind == "flat" or index_kind(self.index) != "flat":
+            return False
+        if self.index.ntotal < min_training_size(self.index_kind, **self.index_params):
+            return False
+        self.rebuild(self.index_kind, **self.index_params)
+        return True
+
+    def _remove_ids(self, ids):
+        """Remove vectors by id, rebuilding indexes that cannot delete in place"""
+        if supports_remove(self.index):
+            self.index.remove_ids(ids)
+            return
+
+        # Rebuilding reads every vector and builds a new graph, skipped when none of the ids is stored (new chunks)
+        if not np.isin(index_ids(self.index), ids).any():
+            return
+        existing_ids, vectors = extract_vectors(self.index)
+        keep = ~np.isin(existing_ids, ids)
+        new_index = build_index(index_kind(self.index), self.dimension, **self.index_params)
+        set_search_params(new_index, self.nprobe, self.ef_search)
+        new_index.add_with_ids(vectors[keep], existing_ids[keep])
+        self._set_index(new_index)
+
+    def _set_index(self, index, mapped_path=None):
+        self.index = set_search_params(index, self.nprobe, self.ef_search)
+        self.mapped_path = mapped_path
+        return self.index
+
+    def _writable(self):
+        """Read a memory-mapped index into RAM before its first change, the mapped vectors are read-only"""
+        if self.mapped_path:
+            self._set_index(read_index(self.mapped_path))
+
+    @staticmethod
+    def chunk_id(url, start, end):
+        """Stable 63-bit id for a chunk, derived from its source and offsets"""
+        digest = hashlib.blake2b(f"{url}:{start}:{end}".encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "big") & 0x7FFFFFFFFFFFFFFF
+
+    def __len__(self):
+        return self.index.ntotal
+
+    def load(self, path=None):
+        """Load the index from disk (default: index_path), returns True if an id-mapped index was found"""
+        path = path or self.index_path
+        with self.lock:
+            if not os.path.exists(path):
+                return False
+
+            # Memory-mapped indexes open without reading the vectors, pages are loaded on first use and
+            # the whole index is read into RAM when it is first modified
+            loaded_index = read_index(path, mmap=self.mmap)
+
+            # Indexes written before the id map have no metadata to map rows back to chunks
+            if not is_id_mapped(loaded_index):
+                return False
+
+            self._set_index(loaded_index, path if self.mmap else None)
+            return True
+
+    def replace_index(self, index, mapped_path=None):
+        """Search another index from now on (e.g. one downloaded by CID). It must be id-mapped and every chunk
+        id in it must be in the metadata sidecar, otherwise its hits could not be mapped back to reviews.
+        mapped_path is the file a memory-mapped index was read from, it is read again into RAM before any change"""
+        if not is_id_mapped(index):
+            raise ValueError("This FAISS index has no chunk ids and cannot be mapped back to reviews, "
+                             "load a published snapshot instead")
+        if index.d != self.dimension:
+            raise ValueError(f"This FAISS index has {index.d} dimensions, the store expects {self.dimension}")
+
+        ids = index_ids(index)
+        with self.lock:
+            known = np.array([row[0] for row in self.conn.execute("SELECT id FROM chunks")], dtype=np.int64)
+            missing = int((~np.isin(ids, known)).sum())
+            if missing:
+                raise ValueError(f"{missing} of {len(ids)} chunks of this FAISS index are not in {self.metadata_path}, "
+                                 "load a published snapshot to get their metadata too")
+            self._set_index(index, mapped_path)
+            return len(ids)
+
+    def save(self):
+        """Write the index and flush the metadata sidecar"""
+        with self.lock:
+            # Replaced atomically, the previous file may still be memory-mapped
+            temp_path = f"{self.index_path}.tmp"
+            faiss.write_index(self.index, temp_path)
+            os.replace(temp_path, self.index_path)
+            self.conn.commit()
+            return self.index_path
+
+    def remove_url(self, url):
+        """Remove every chunk stored for a source URL"""
+        return self.remove_urls([url])
+
+    def remove_urls(self, urls):
+        """Remove every chunk stored for several source URLs, in one pass over the index"""
+        with self.lock:
+            ids = {}
+            for url in dict.fromkeys(urls):
+                rows = self.conn.execute("SELECT id FROM chunks WHERE url = ?", (url,)).fetchall()
+                if rows:
+                    ids[url] = [row[0] for row in rows]
+            if not ids:
+                return 0
+
+            self._writable()
+            self._remove_ids(np.array([chunk_id for url_ids in ids.values() for chunk_id in url_ids], dtype=np.int64))
+            self.conn.executemany("DELETE FROM chunks WHERE url = ?", [(url,) for url in ids])
+            self._mark_unpublished(ids)
+            return sum(len(url_ids) for url_ids in ids.values())
+
+    def add_chunks(self, chunks, vectors):
+        """Add chunks (dicts with text, url, movie_id, start, end) and their vectors"""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimension)
+        if len(chunks) != len(vectors):
+            raise ValueError(f"Got {len(chunks)} chunks but {len(vectors)} vectors")
+
+        with self.lock:
+            ids = []
+            rows = []
+            for chunk in chunks:
+                chunk_id = self.chunk_id(chunk["url"], chunk["start"], chunk["end"])
+                ids.append(chunk_id)
+                rows.append((
+                    chunk_id,
+                    None if chunk.get("movie_id") is None else str(chunk["movie_id"]),
+                    chunk["url"],
+                    chunk["start"],
+                    chunk["end"],
+                    chunk["text"]
+                ))
+
+            ids = np.array(ids, dtype=np.int64)
+
+            # Re-adding an existing chunk replaces it instead of duplicating the vector
+            self._writable()
+            self._remove_ids(ids)
+            self.index.add_with_ids(vectors, ids)
+            self.conn.executemany("INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self._mark_unpublished({row[2] for row in rows})
+            self._maybe_upgrade()
+            return ids
+
+    def _mark_unpublished(self, urls):
+        # Re-inserting moves the url to a new seq, so changes made while publishing are not lost
+        self.conn.executemany("DELETE FROM unpublished_urls WHERE url = ?", [(url,) for url in urls])
+        self.conn.executemany("INSERT INTO unpublished_urls (url) VALUES (?)", [(url,) for url in urls])
+
+    def unpublished_changes(self):
+        """URLs changed since the last published snapshot and the seq to pass to mark_published"""
+        with self.lock:
+            rows = self.conn.execute("SELECT seq, url FROM unpublished_urls ORDER BY seq").fetchall()
+        return [row[1] for row in rows], max((row[0] for row in rows), default=0)
+
+    def mark_published(self, urls, up_to_seq):
+        with self.lock:
+            self.conn.executemany(
+                "DELETE FROM unpublished_urls WHERE url = ? AND seq <= ?", [(url, up_to_seq) for url in urls]
+            )
+            self.conn.commit()
+
+    def urls(self):
+        with self.lock:
+            return [row[0] for row in self.conn.execute("SELECT DISTINCT url FROM chunks").fetchall()]
+
+    def chunks_for_urls(self, urls):
+        """Chunk metadata and vectors currently stored for the given URLs"""
+        with self.lock:
+            chunks = []
+            for url in urls:
+                rows = self.conn.execute(
+                    "SELECT id, movie_id, url, start_offset, end_offset, text FROM chunks WHERE url = ? ORDER BY start_offset",
+                    (url,)
+                ).fetchall()
+                chunks.extend(
+                    {"id": row[0], "movie_id": row[1], "url": row[2], "start": row[3], "end": row[4], "text": row[5]}
+                    for row in rows
+                )
+            if not chunks:
+                return chunks, np.empty((0, self.dimension), dtype=np.float32)
+            vectors = np.vstack([self.index.reconstruct(chunk["id"]) for chunk in chunks]).astype(np.float32)
+            return chunks, vectors
+
+    def reset(self):
+        """Drop every chunk, e.g. before loading a published snapshot"""
+        with self.lock:
+            self._set_index(self._new_index())
+            self.conn.execute("DELETE FROM chunks")
+            self.conn.execute("DELETE FROM movies")
+            self.conn.execute("DELETE FROM unpublished_urls")
+            self.conn.commit()
+
+    def get_chunks(self, ids):
+        """Look up chunk metadata by id, preserving the order of ids"""
+        ids = [int(chunk_id) for chunk_id in ids if chunk_id >= 0]
+        if not ids:
+            return []
+
+        placeholders = ",".join("?" * len(ids))
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT id, movie_id, url, start_offset, end_offset, text FROM chunks WHERE id IN ({placeholders})",
+                ids
+            ).fetchall()
+
+        by_id = {
+            row[0]: {"id": row[0], "movie_id": row[1], "url": row[2], "start": row[3], "end": row[4], "text": row[5]}
+            for row in rows
+        }
+        return [by_id[chunk_id] for chunk_id in ids if chunk_id in by_id]
+
+    def set_movie(self, movie_id, title=None, year=None, country=None):
+        """Record a movie's metadata so its chunks can be filtered by year or country"""
+        try:
+            year = int(year) if year not in (None, "") else None
+        except (TypeError, ValueError):
+            year = None
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO movies VALUES (?, ?, ?, ?)",
+                (str(movie_id), title, year, country.strip() if country else None)
+            )
+
+    def get_movies(self, movie_ids):
+        movie_ids = [str(movie_id) for movie_id in set(movie_ids) if movie_id is not None]
+        if not movie_ids:
+            return []
+        placeholders = ",".join("?" * len(movie_ids))
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT movie_id, title, year, country FROM movies WHERE movie_id IN ({placeholders})", movie_ids
+            ).fetchall()
+        return [{"movie_id": row[0], "title": row[1], "year": row[2], "country": row[3]} for row in rows]
+
+    @staticmethod
+    def _filter_clause(filters):
+        """SQL condition (on chunks c joined with movies m) for filters such as {"movie_id": 809297, "year": 2019}.
+        A list value matches any of its items"""
+        conditions, params = [], []
+        for name, value in (filters or {}).items():
+            if value is None:
+                continue
+            if name not in FILTER_COLUMNS:
+                raise ValueError(f"Unknown filter '{name}', choose from: {', '.join(FILTER_COLUMNS)}")
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            values = [int(item) if name == "year" else str(item) for item in values]
+            conditions.append(f"{FILTER_COLUMNS[name]} IN ({','.join('?' * len(values))})")
+            params.extend(values)
+        return " AND ".join(conditions), params
+
+    def filtered_ids(self, filters):
+        """Ids of the chunks matching the filters"""
+        clause, params = self._filter_clause(filters)
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT c.id FROM chunks c LEFT JOIN movies m ON m.movie_id = c.movie_id WHERE {clause or '1'}", params
+            ).fetchall()
+        return np.array([row[0] for row in rows], dtype=np.int64)
+
+    @staticmethod
+    def _match_expression(query):
+        """FTS5 query matching any of the words, quoted so user input is never parsed as FTS syntax"""
+        words = re.findall(r"\w+", query.lower())
+        return " OR ".join(f'"{word}"' for word in dict.fromkeys(words))
+
+    def keyword_search(self, query, k=20, filters=None):
+        """Return the k best BM25 matches for a text query (lower score is better, as with L2)"""
+        expression = self._match_expression(query)
+        if not expression:
+            return []
+
+        clause, params = self._filter_clause(filters)
+        with self.lock:
+            rows = self.conn.execute(
+                f"""SELECT c.id, c.movie_id, c.url, c.start_offset, c.end_offset, c.text, bm25(chunks_fts)
+                   FROM chunks_fts JOIN chunks c ON c.id = chunks_fts.rowid
+                   LEFT JOIN movies m ON m.movie_id = c.movie_id
+                   WHERE chunks_fts MATCH ? {'AND ' + clause if clause else ''}
+                   ORDER BY bm25(chunks_fts) LIMIT ?""",
+                [expression] + params + [k]
+            ).fetchall()
+
+        return [
+            {"id": row[0], "movie_id": row[1], "url": row[2], "start": row[3], "end": row[4], "text": row[5], "score": row[6]}
+            for row in rows
+        ]
+
+    def _filtered_search(self, query_vectors, k, ids):
+        """Nearest neighbours among the given ids only"""
+        if len(ids) <= EXACT_SEARCH_LIMIT:
+            # Small subsets (e.g. one movie): exact distances to each of their vectors
+            vectors = np.vstack([self.index.reconstruct(int(chunk_id)) for chunk_id in ids])
+            distances = (
+                (query_vectors ** 2).sum(axis=1, keepdims=True)
+                - 2 * query_vectors @ vectors.T
+                + (vectors ** 2).sum(axis=1)
+            )
+            order = np.argsort(distances, axis=1)[:, :k]
+            return np.take_along_axis(distances, order, axis=1), ids[order]
+
+        selector = faiss.IDSelectorBatch(ids)
+        params = search_parameters(self.index, selector, self.nprobe, self.ef_search)
+        return self.index.search(query_vectors, k, params=params)
+
+    def search_batch(self, query_vectors, k=2, filters=None):
+        """Search many queries with one index call over an (N, dimension) matrix, returns one result list per query"""
+        query_vectors = np.ascontiguousarray(query_vectors, dtype=np.float32).reshape(-1, self.dimension)
+
+        with self.lock:
+            if self.index.ntotal == 0 or not len(query_vectors):
+                return [[] for _ in range(len(query_vectors))]
+            if filters:
+                ids = self.filtered_ids(filters)
+                if not len(ids):
+                    return [[] for _ in range(len(query_vectors))]
+                D, I = self._filtered_search(query_vectors, k, ids)
+            else:
+                D, I = self.index.search(query_vectors, k)
+
+        # Metadata for every query is fetched at once
+        chunks = {chunk["id"]: chunk for chunk in self.get_chunks(np.unique(I[I >= 0]))}
+        results = []
+        for row_ids, row_distances in zip(I, D):
+            row = []
+            for chunk_id, distance in zip(row_ids, row_distances):
+                if chunk_id >= 0 and int(chunk_id) in chunks:
+                    row.append(dict(chunks[int(chunk_id)], score=float(distance)))
+            results.append(row)
+        return results
+
+    def search(self, query_vector, k=2, filters=None):
+        """Return the k nearest chunks with their L2 distance, only among chunks matching filters when given"""
+        return self.search_batch(np.asarray(query_vector, dtype=np.float32).reshape(1, -1), k, filters)[0]
@@ -0,0 +1,146 @@
+import argparse
+import hashlib
+import os
+import random
+import threading
+import time
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+CRITICS = [
+    ("Carlos Boyero", "Diario El País"),
+    ("Luis Martínez", "Diario El Mundo"),
+    ("Oti Rodríguez Marchante", "Diario ABC"),
+    ("Sergi Sánchez", "Diario La Razón"),
+    ("Jordi Costa", "Fotogramas"),
+    ("Manohla Dargis", "The New York Times"),
+    ("Peter Bradshaw", "The Guardian"),
+    ("Todd McCarthy", "The Hollywood Reporter"),
+]
+PHRASES = [
+    "Una película de una ambición formal poco habitual",
+    "el reparto sostiene con oficio un guion que se pierde en el tercer acto",
+    "la fotografía convierte cada plano en un cuadro",
+    "su director vuelve a demostrar un pulso narrativo envidiable",
+    "la banda sonora subraya con insistencia lo que las imágenes ya cuentan",
+    "un entretenimiento eficaz que no aspira a más",
+    "hay momentos de auténtica emoción, aunque el conjunto resulta irregular",
+    "la actriz protagonista ofrece una interpretación memorable",
+]
+RATINGS = [("pos", "Positiva"), ("neu", "Neutral"), ("neg", "Negativa")]
+
+def render_reviews_page(movie_id, review_count=None):
+    """Deterministic FilmAffinity-like pro-reviews page used when no fixture file exists. The files in fixtures/
+    were written by it too (with 12, 60 and 24 reviews), they are not captures of real pages"""
+    rng = random.Random(str(movie_id))
+    review_count = review_count or rng.randint(5, 40)
+
+    rows = []
+    for i in range(review_count):
+        critic, outlet = rng.choice(CRITICS)
+        rating_class, rating_title = rng.choice(RATINGS)
+        sentences = ". ".join(rng.choice(PHRASES).capitalize() for _ in range(rng.randint(2, 6)))
+        rows.append(
+            f'<tr><td class="rev-text"><div class="rev-text-wrap">'
+            f'<a href="https://example.com/review/{movie_id}/{i}" target="_blank" rel="nofollow">'
+            f'"{escape(sentences)}."</a></div></td>'
+            f'<td class="rev-author"><div class="author">{escape(critic)}</div>'
+            f'<div class="source">{escape(outlet)}</div></td>'
+            f'<td class="rev-eval"><i class="fa fa-circle {rating_class}" title="{rating_title}"></i></td></tr>'
+        )
+
+    return (
+        "<!DOCTYPE html><html lang=\"es\"><head><meta charset=\"utf-8\">"
+        f"<title>Críticas profesionales de la película {movie_id} - FilmAffinity</title></head>"
+        "<body><div id=\"header\"><nav>Inicio | Películas | Series | Rankings</nav></div>"
+        f"<div id=\"main-wrapper\"><h1>Críticas profesionales</h1><table id=\"pro-reviews\">{''.join(rows)}</table></div>"
+        "<div id=\"footer\">© FilmAffinity</div></body></html>"
+    )
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """Serves fixture files (or synthetic pages) in the FilmAffinity markup so scraping can be exercised offline"""
+
+    fixtures_dir = FIXTURES_DIR
+    synthetic = True
+    latency = 0.0
+    error_rate = 0.0
+
+    def do_GET(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+        # Simulate an overloaded server so retry/backoff can be exercised
+        if self.error_rate and random.random() < self.error_rate:
+            self.send_response(random.choice([429, 503]))
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        parts = urlsplit(self.path)
+        if not parts.path.endswith("pro-reviews.php"):
+            return self._send(404, b"Not found")
+
+        movie_id = parse_qs(parts.query).get("movie-id", [""])[0]
+        fixture = os.path.join(self.fixtures_dir, f"pro-reviews_{os.path.basename(movie_id)}.html")
+        if os.path.exists(fixture):
+            with open(fixture, "rb") as f:
+                return self._send(200, f.read())
+        if self.synthetic and movie_id:
+            return self._send(200, render_reviews_page(movie_id).encode("utf-8"))
+        return self._send(404, b"Not found")
+
+    def _send(self, status, body):
+        # ETags let HTTP caches revalidate pages with a cheap 304
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        if status == 200 and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        self.send_response(status)
+        if status == 200:
+            self.send_header("ETag", etag)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_fixture_server(port=0, fixtures_dir=FIXTURES_DIR, synthetic=True, latency=0.0, error_rate=0.0):
+    """Start the fixture server in a background thread, returns (server, base_url)"""
+    handler = type("ConfiguredFixtureHandler", (FixtureHandler,), {
+        "fixtures_dir": fixtures_dir,
+        "synthetic": synthetic,
+        "latency": latency,
+        "error_rate": error_rate
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve FilmAffinity fixture pages for offline scraping")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--dir", default=FIXTURES_DIR, help="Directory with pro-reviews_<id>.html files")
+    parser.add_argument("--no-synthetic", action="store_true", help="Return 404 for ids without a fixture file")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before each response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 429/503")
+    args = parser.parse_args()
+
+    server, base_url = start_fixture_server(args.port, args.dir, not args.no_synthetic, args.latency, args.error_rate)
+    print(f"🎞️ Serving fixtures on {base_url} (set FILMAFFINITY_BASE_URL={base_url})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
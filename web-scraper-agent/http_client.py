@@ -0,0 +1,209 @@
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+import requests
+import requests_cache
+import metrics
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# Per-endpoint cache lifetimes in seconds, stale entries are revalidated with ETag/Last-Modified
+CACHE_TTLS = {
+    "*/pro-reviews.php*": int(os.getenv("HTTP_CACHE_REVIEWS_TTL", str(6 * 3600))),
+    "*/search.php*": int(os.getenv("HTTP_CACHE_SEARCH_TTL", str(24 * 3600))),
+    "*/advsearch.php*": int(os.getenv("HTTP_CACHE_SEARCH_TTL", str(24 * 3600))),
+    "*/film*.html": int(os.getenv("HTTP_CACHE_FILM_TTL", str(7 * 24 * 3600))),
+}
+
+class TokenBucket:
+    """Thread-safe token bucket, refilled at `rate` tokens per second up to `capacity`"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class HttpClient:
+    """Pooled keep-alive HTTP client with per-host concurrency limits, rate limiting and retry/backoff"""
+
+    def __init__(self, timeout=(5, 30), max_retries=4, backoff=0.5, max_backoff=30.0,
+                 per_host_concurrency=4, rate=2.0, burst=4, pool_size=16, headers=None,
+                 cache_name=None, cache_ttls=None, cache_max_bytes=None):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.per_host_concurrency = per_host_concurrency
+        self.rate = rate
+        self.burst = burst
+        self.lock = threading.Lock()
+        self.host_slots = {}
+        self.host_buckets = {}
+
+        self.cache_max_bytes = cache_max_bytes
+        self.cache_stats = {"hits": 0, "misses": 0, "revalidated": 0, "evicted": 0}
+        self.writes_since_trim = 0
+
+        if cache_name:
+            # Everything not matched by an endpoint TTL is not cached at all
+            self.session = requests_cache.CachedSession(
+                cache_name,
+                backend="sqlite",
+                expire_after=requests_cache.DO_NOT_CACHE,
+                urls_expire_after=cache_ttls or CACHE_TTLS,
+                allowable_codes=(200,),
+                stale_if_error=True
+            )
+            self.session.hooks["response"].append(self._count_cache_use)
+            self.trim_cache()
+        else:
+            self.session = requests.Session()
+        self.session.headers.update(headers or {"User-Agent": "Mozilla/5.0"})
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _host_limits(self, url):
+        """Semaphore and token bucket shared by every request to the same host"""
+        host = urlsplit(url).netloc
+        with self.lock:
+            if host not in self.host_slots:
+                self.host_slots[host] = threading.BoundedSemaphore(self.per_host_concurrency)
+                self.host_buckets[host] = TokenBucket(self.rate, self.burst) if self.rate else None
+            return self.host_slots[host], self.host_buckets[host]
+
+    def _retry_delay(self, attempt, response=None):
+        """Exponential backoff with jitter, honouring Retry-After when the server sends it"""
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return min(self.max_backoff, float(retry_after))
+            except ValueError:
+                try:
+                    return min(self.max_backoff, max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time()))
+                except (TypeError, ValueError):
+                    pass
+        return min(self.max_backoff, self.backoff * (2 ** attempt)) * random.uniform(0.5, 1.0)
+
+    def request(self, method, url, **kwargs):
+        """Send a request, retrying connection errors, timeouts, 429 and 5xx responses"""
+        kwargs.setdefault("timeout", self.timeout)
+        slots, bucket = self._host_limits(url)
+
+        for attempt in range(self.max_retries + 1):
+            if bucket:
+                bucket.acquire()
+
+            response = None
+            try:
+                with slots:
+                    response = self.session.request(method, url, **kwargs)
+                if response.status_code not in RETRY_STATUS or attempt == self.max_retries:
+                    return response
+                response.close()
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+
+            time.sleep(self._retry_delay(attempt, response))
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def _count(self, name, value=1):
+        """Add to a cache counter, responses arrive on several threads at once"""
+        with self.lock:
+            self.cache_stats[name] += value
+
+    def _count_cache_use(self, response, *args, **kwargs):
+        """Response hook, also sees requests made by other users of the session (e.g. FilmAffinity search)"""
+        from_cache = getattr(response, "from_cache", None)
+        if from_cache is None:
+            return
+        if not from_cache:
+            self._count("misses")
+            metrics.inc("cache_requests_total", cache="http", result="miss")
+            with self.lock:
+                self.writes_since_trim += 1
+                trim = self.writes_since_trim >= 50
+                if trim:
+                    self.writes_since_trim = 0
+            if trim:
+                self.trim_cache()
+        elif getattr(response, "revalidated", False):
+            self._count("revalidated")
+            metrics.inc("cache_requests_total", cache="http", result="revalidated")
+        else:
+            self._count("hits")
+            metrics.inc("cache_requests_total", cache="http", result="hit")
+
+    def trim_cache(self):
+        """Evict the least recently written cached responses until the cache fits in cache_max_bytes"""
+        if not self.cache_max_bytes or not isinstance(self.session, requests_cache.CachedSession):
+            return 0
+
+        # Sizes come straight from the SQLite table instead of deserialising every response. Responses are
+        # written with INSERT OR REPLACE, so rowid order is the order they were last stored in. Expired
+        # entries are kept on purpose, they can still be revalidated cheaply
+        cache = self.session.cache
+        with cache.responses.connection() as connection:
+            entries = connection.execute(
+                f"SELECT key, LENGTH(value) FROM {cache.responses.table_name} ORDER BY rowid"
+            ).fetchall()
+        total = sum(size for _, size in entries)
+        if total <= self.cache_max_bytes:
+            return 0
+
+        evicted = []
+        for key, size in entries:
+            if total <= self.cache_max_bytes:
+                break
+            evicted.append(key)
+            total -= size
+        # Deleted directly, without the VACUUM of cache.delete that rewrites the whole file: SQLite reuses the
+        # freed pages for the next responses, so the file stops growing instead of shrinking
+        cache.responses.bulk_delete(evicted)
+        cache.redirects.bulk_delete(values=evicted)
+        self._count("evicted", len(evicted))
+        return len(evicted)
+
+    def close(self):
+        self.session.close()
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+def get_http_client():
+    """Process-wide client configured from the environment, shared by both scrapers"""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = HttpClient(
+                timeout=(float(os.getenv("SCRAPER_CONNECT_TIMEOUT", "5")), float(os.getenv("SCRAPER_READ_TIMEOUT", "30"))),
+                max_retries=int(os.getenv("SCRAPER_MAX_RETRIES", "4")),
+                per_host_concurrency=int(os.getenv("SCRAPER_CONCURRENCY", "4")),
+                rate=float(os.getenv("SCRAPER_RATE_LIMIT", "2")),
+                burst=int(os.getenv("SCRAPER_BURST", "4")),
+                cache_name=os.getenv("HTTP_CACHE_PATH", "http_cache"),
+                cache_max_bytes=int(float(os.getenv("HTTP_CACHE_MAX_MB", "200")) * 1024 * 1024)
+            )
+        return _default_client
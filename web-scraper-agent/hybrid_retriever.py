@@ -0,0 +1,141 @@
+import time
+import numpy as np
+
+# Multilingual cross-encoder, the reviews are mostly in Spanish
+DEFAULT_RERANKER_MODEL = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+
+def reciprocal_rank_fusion(rankings, weights=None, rrf_k=60):
+    """Fuse ranked lists of chunks: each chunk scores sum(weight / (rrf_k + rank)) over the lists it appears in"""
+    weights = weights or [1.0] * len(rankings)
+    scores, chunks = {}, {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, chunk in enumerate(ranking, start=1):
+            scores[chunk["id"]] = scores.get(chunk["id"], 0.0) + weight / (rrf_k + rank)
+            chunks.setdefault(chunk["id"], chunk)
+
+    fused = []
+    for chunk_id in sorted(scores, key=scores.get, reverse=True):
+        chunk = dict(chunks[chunk_id])
+        chunk["rrf_score"] = scores[chunk_id]
+        fused.append(chunk)
+    return fused
+
+class CrossEncoderReranker:
+    """Rescores (query, chunk) pairs with a cross-encoder, loaded on first use"""
+
+    def __init__(self, model_name=DEFAULT_RERANKER_MODEL, batch_size=32):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.model = None
+
+    def rerank(self, query, chunks, k):
+        return self.rerank_many([query], [chunks], k)[0]
+
+    def rerank_many(self, queries, candidate_lists, k):
+        """Rerank the candidates of several queries with a single model call"""
+        pairs = [(query, chunk["text"]) for query, chunks in zip(queries, candidate_lists) for chunk in chunks]
+        if not pairs:
+            return [[] for _ in queries]
+        if self.model is None:
+            from sentence_transformers import CrossEncoder
+            self.model = CrossEncoder(self.model_name)
+
+        scores = np.asarray(self.model.predict(pairs, batch_size=self.batch_size))
+        results, offset = [], 0
+        for chunks in candidate_lists:
+            chunk_scores = scores[offset:offset + len(chunks)]
+            offset += len(chunks)
+            reranked = []
+            for index in np.argsort(-chunk_scores)[:k]:
+                chunk = dict(chunks[index])
+                chunk["rerank_score"] = float(chunk_scores[index])
+                reranked.append(chunk)
+            results.append(reranked)
+        return results
+
+class HybridRetriever:
+    """Dense (FAISS) + sparse (BM25) retrieval fused with reciprocal rank fusion, optionally reranked"""
+
+    def __init__(self, store, embeddings, k=4, candidates=20, dense_weight=1.0, sparse_weight=1.0,
+                 rrf_k=60, reranker=None, rerank_candidates=20):
+        self.store = store
+        self.embeddings = embeddings
+        self.k = k
+        self.candidates = candidates
+        self.dense_weight = dense_weight
+        self.sparse_weight = sparse_weight
+        self.rrf_k = rrf_k
+        self.reranker = reranker
+        self.rerank_candidates = rerank_candidates
+
+    def dense(self, query, k, filters=None):
+        query_vector = np.array(self.embeddings.embed_query(query), dtype=np.float32).reshape(1, -1)
+        return self.store.search(query_vector, k=k, filters=filters)
+
+    def sparse(self, query, k, filters=None):
+        return self.store.keyword_search(query, k=k, filters=filters)
+
+    def retrieve(self, query, k=None, timings=None, filters=None):
+        """Return the k best chunks for a question, recording seconds per stage in timings when given.
+        filters (movie_id, year, country, url) restrict both retrievers to matching chunks"""
+        k = k or self.k
+        timings = timings if timings is not None else {}
+
+        start = time.perf_counter()
+        dense = self.dense(query, self.candidates, filters)
+        timings["dense"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        sparse = self.sparse(query, self.candidates, filters)
+        timings["sparse"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        fused = reciprocal_rank_fusion([dense, sparse], [self.dense_weight, self.sparse_weight], self.rrf_k)
+        timings["fusion"] = time.perf_counter() - start
+
+        if self.reranker is None:
+            return fused[:k]
+
+        start = time.perf_counter()
+        reranked = self.reranker.rerank(query, fused[:self.rerank_candidates], k)
+        timings["rerank"] = time.perf_counter() - start
+        return reranked
+
+    def _embed_queries(self, queries):
+        # Plain LangChain embeddings have no batch query method, their document embedding is the same for MiniLM
+        embed = getattr(self.embeddings, "embed_queries", self.embeddings.embed_documents)
+        return np.array(embed(list(queries)), dtype=np.float32)
+
+    def retrieve_batch(self, queries, k=None, timings=None, filters=None):
+        """retrieve() for many questions: one embedding call and one FAISS search over all of them"""
+        k = k or self.k
+        timings = timings if timings is not None else {}
+        if not queries:
+            return []
+
+        start = time.perf_counter()
+        query_vectors = self._embed_queries(queries)
+        timings["embed"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        dense = self.store.search_batch(query_vectors, k=self.candidates, filters=filters)
+        timings["dense"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        sparse = [self.sparse(query, self.candidates, filters) for query in queries]
+        timings["sparse"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        fused = [
+            reciprocal_rank_fusion([dense_row, sparse_row], [self.dense_weight, self.sparse_weight], self.rrf_k)
+            for dense_row, sparse_row in zip(dense, sparse)
+        ]
+        timings["fusion"] = time.perf_counter() - start
+
+        if self.reranker is None:
+            return [row[:k] for row in fused]
+
+        start = time.perf_counter()
+        reranked = self.reranker.rerank_many(queries, [row[:self.rerank_candidates] for row in fused], k)
+        timings["rerank"] = time.perf_counter() - start
+        return reranked
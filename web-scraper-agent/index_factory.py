@@ -0,0 +1,201 @@
+import faiss
+import numpy as np
+
+# Supported index kinds and the defaults used to build them
+INDEX_KINDS = {
+    "flat": {},
+    "ivf_flat": {"nlist": 256},
+    "ivf_pq": {"nlist": 256, "pq_m": 16, "pq_bits": 8},
+    "hnsw": {"hnsw_m": 32, "ef_construction": 80},
+    # Compact flat storage: each dimension as float16 (2 bytes), int8 (1 byte) or 4 bits, optionally after PCA
+    "sq_fp16": {"pca_dim": 0},
+    "sq_int8": {"pca_dim": 0},
+    "sq_4bit": {"pca_dim": 0},
+}
+
+SCALAR_QUANTIZERS = {
+    "sq_fp16": faiss.ScalarQuantizer.QT_fp16,
+    "sq_int8": faiss.ScalarQuantizer.QT_8bit,
+    "sq_4bit": faiss.ScalarQuantizer.QT_4bit,
+}
+
+# k-means in FAISS wants at least this many training points per centroid
+MIN_POINTS_PER_CENTROID = 39
+
+# Vectors used to learn the per-dimension ranges of int8/4-bit codes and the PCA projection
+MIN_COMPACT_TRAINING = 1000
+
+def index_params(kind, **overrides):
+    """Merge the defaults for an index kind with user overrides"""
+    if kind not in INDEX_KINDS:
+        raise ValueError(f"Unknown index kind '{kind}', choose one of: {', '.join(INDEX_KINDS)}")
+    params = dict(INDEX_KINDS[kind])
+    params.update({key: value for key, value in overrides.items() if key in params and value is not None})
+    return params
+
+def min_training_size(kind, **overrides):
+    """Number of vectors needed before an index of this kind can be trained"""
+    params = index_params(kind, **overrides)
+    if kind == "ivf_pq":
+        # Each sub-quantizer also learns 2^pq_bits centroids
+        return max(params["nlist"], 1 << params["pq_bits"]) * MIN_POINTS_PER_CENTROID
+    if kind == "ivf_flat":
+        return params["nlist"] * MIN_POINTS_PER_CENTROID
+    if kind in SCALAR_QUANTIZERS and (kind != "sq_fp16" or params["pca_dim"]):
+        return MIN_COMPACT_TRAINING
+    return 0
+
+def build_index(kind="flat", dimension=384, training_vectors=None, sample_size=50000, **overrides):
+    """Create an id-mapped index of the given kind, trained on a sample when required"""
+    params = index_params(kind, **overrides)
+
+    if kind == "flat":
+        base = faiss.IndexFlatL2(dimension)
+    elif kind == "hnsw":
+        base = faiss.IndexHNSWFlat(dimension, params["hnsw_m"])
+        base.hnsw.efConstruction = params["ef_construction"]
+    elif kind in SCALAR_QUANTIZERS:
+        pca_dim = params["pca_dim"]
+        if pca_dim and not 0 < pca_dim < dimension:
+            raise ValueError(f"pca_dim={pca_dim} must be between 0 and the vector dimension {dimension}")
+
+        base = faiss.IndexScalarQuantizer(pca_dim or dimension, SCALAR_QUANTIZERS[kind], faiss.METRIC_L2)
+        if pca_dim:
+            # Queries and added vectors are projected on the fly, reconstruct() maps codes back to full vectors
+            base = faiss.IndexPreTransform(faiss.PCAMatrix(dimension, pca_dim), base)
+        if not base.is_trained:
+            if training_vectors is None or len(training_vectors) < min_training_size(kind, **overrides):
+                raise ValueError(f"Index kind '{kind}' needs at least {min_training_size(kind, **overrides)} training vectors")
+            base.train(_training_sample(training_vectors, sample_size))
+    else:
+        if training_vectors is None or len(training_vectors) < min_training_size(kind, **overrides):
+            raise ValueError(f"Index kind '{kind}' needs at least {min_training_size(kind, **overrides)} training vectors")
+
+        sample = _training_sample(training_vectors, sample_size)
+
+        quantizer = faiss.IndexFlatL2(dimension)
+        if kind == "ivf_flat":
+            base = faiss.IndexIVFFlat(quantizer, dimension, params["nlist"])
+        else:
+            if dimension % params["pq_m"] != 0:
+                raise ValueError(f"pq_m={params['pq_m']} must divide the vector dimension {dimension}")
+            base = faiss.IndexIVFPQ(quantizer, dimension, params["nlist"], params["pq_m"], params["pq_bits"])
+        base.train(sample)
+
+        # IVF lists store external ids natively, the hash map lets us reconstruct and remove by id
+        base.set_direct_map_type(faiss.DirectMap.Hashtable)
+        return base
+
+    return faiss.IndexIDMap2(base)
+
+def read_index(path, mmap=False):
+    """Read an index from disk. Memory-mapped, its vectors (flat codes, HNSW storage, IVF lists) stay in the file
+    and are paged in on use, but FAISS aborts on any change to them: copy the index into RAM before modifying it"""
+    return faiss.read_index(path, faiss.IO_FLAG_MMAP_IFC if mmap else 0)
+
+def _training_sample(vectors, sample_size):
+    """Random subset of the vectors used to train coarse and product quantizers"""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    if len(vectors) <= sample_size:
+        return vectors
+    rows = np.random.default_rng(1234).choice(len(vectors), sample_size, replace=False)
+    return vectors[np.sort(rows)]
+
+def _mapped_index(index):
+    """Unwrap the id map around flat, HNSW and scalar quantizer indexes"""
+    return faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else faiss.downcast_index(index)
+
+def _base_index(index):
+    """The index doing the search, below the id map and any PCA transform"""
+    base = _mapped_index(index)
+    return faiss.downcast_index(base.index) if isinstance(base, faiss.IndexPreTransform) else base
+
+def is_id_mapped(index):
+    """True for indexes that search with chunk ids rather than row numbers"""
+    return isinstance(index, (faiss.IndexIDMap, faiss.IndexIVF))
+
+def index_kind(index):
+    """Detect the kind of an (optionally id-mapped) index"""
+    base = _base_index(index)
+    if isinstance(base, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(base, faiss.IndexIVFFlat):
+        return "ivf_flat"
+    if isinstance(base, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(base, faiss.IndexScalarQuantizer):
+        return next((kind for kind, qtype in SCALAR_QUANTIZERS.items() if qtype == base.sq.qtype), "flat")
+    return "flat"
+
+def pca_dim(index):
+    """Output dimension of the PCA applied before the index, 0 without one"""
+    mapped = _mapped_index(index)
+    return mapped.index.d if isinstance(mapped, faiss.IndexPreTransform) else 0
+
+def bytes_per_vector(index):
+    """Bytes the index keeps per stored vector, not counting ids or graph links"""
+    base = _base_index(index)
+    if isinstance(base, faiss.IndexIVF):
+        return base.code_size
+    if isinstance(base, faiss.IndexHNSW):
+        return faiss.downcast_index(base.storage).sa_code_size()
+    return base.sa_code_size()
+
+def storage_dtype(index):
+    """Vectors from compact indexes are approximate, so exported copies of them need no more than float16"""
+    return np.float16 if index_kind(index) in SCALAR_QUANTIZERS else np.float32
+
+def set_search_params(index, nprobe=None, ef_search=None):
+    """Apply recall/latency knobs to the underlying index, ignoring ones that do not apply"""
+    base = _base_index(index)
+    if nprobe is not None and isinstance(base, faiss.IndexIVF):
+        base.nprobe = min(int(nprobe), base.nlist)
+    if ef_search is not None and isinstance(base, faiss.IndexHNSW):
+        base.hnsw.efSearch = int(ef_search)
+    return index
+
+def search_parameters(index, selector, nprobe=None, ef_search=None):
+    """Per-query search parameters restricting results to the ids accepted by selector"""
+    base = _base_index(index)
+    if isinstance(base, faiss.IndexIVF):
+        # Explicit parameters replace the index defaults, so nprobe has to be carried over
+        return faiss.SearchParametersIVF(sel=selector, nprobe=min(int(nprobe or base.nprobe), base.nlist))
+    if isinstance(base, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=int(ef_search or base.hnsw.efSearch))
+    return faiss.SearchParameters(sel=selector)
+
+def index_ids(index):
+    """Ids of every vector stored in an index, without reading the vectors"""
+    base = _base_index(index)
+    if isinstance(base, faiss.IndexIVF):
+        invlists = base.invlists
+        return np.concatenate([
+            faiss.rev_swig_ptr(invlists.get_ids(list_no), invlists.list_size(list_no)).copy()
+            for list_no in range(base.nlist)
+        ] + [np.empty(0, dtype=np.int64)]).astype(np.int64)
+    if isinstance(index, faiss.IndexIDMap):
+        return faiss.vector_to_array(index.id_map).astype(np.int64)
+    # Bare indexes use their row number as id
+    return np.arange(index.ntotal, dtype=np.int64)
+
+def extract_vectors(index):
+    """Return (ids, vectors) stored in an index, used to rebuild it as another kind"""
+    base = _base_index(index)
+    ids = index_ids(index)
+
+    if isinstance(base, faiss.IndexIVF):
+        if base.direct_map.type != faiss.DirectMap.Hashtable:
+            base.set_direct_map_type(faiss.DirectMap.Hashtable)
+        vectors = np.vstack([base.reconstruct(int(chunk_id)) for chunk_id in ids]) if len(ids) else None
+    else:
+        # Reconstructed through the PCA transform (if any), so vectors always have the full dimension
+        mapped = _mapped_index(index)
+        vectors = mapped.reconstruct_n(0, mapped.ntotal) if mapped.ntotal else None
+
+    if vectors is None:
+        vectors = np.empty((0, index.d), dtype=np.float32)
+    return ids, vectors
+
+def supports_remove(index):
+    """HNSW graphs cannot drop vectors in place and have to be rebuilt instead"""
+    return not isinstance(_base_index(index), faiss.IndexHNSW)
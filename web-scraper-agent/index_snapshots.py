@@ -0,0 +1,155 @@
+import io
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from index_factory import storage_dtype
+from ipfs_download import download
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+# Immutable index segments: the chunks (and vectors) of the sources changed since the previous snapshot.
+# A manifest lists the segment CIDs in order, loading replays them so later segments replace earlier ones.
+def encode_segment(urls, chunks, vectors, movies=(), vector_dtype=np.float32):
+    """Serialise a segment: every url it replaces, plus the chunks now stored for them and their movies"""
+    metadata = json.dumps({"urls": list(urls), "chunks": chunks, "movies": list(movies)}, ensure_ascii=False).encode("utf-8")
+    buffer = io.BytesIO()
+    np.savez(
+        buffer,
+        metadata=np.frombuffer(metadata, dtype=np.uint8),
+        vectors=np.asarray(vectors, dtype=vector_dtype)
+    )
+    return buffer.getvalue()
+
+def decode_segment(data):
+    """Returns (urls, chunks, vectors, movies) of a serialised segment"""
+    with np.load(io.BytesIO(data)) as arrays:
+        metadata = json.loads(arrays["metadata"].tobytes().decode("utf-8"))
+        # Segments of compact indexes hold float16 vectors
+        return metadata["urls"], metadata["chunks"], arrays["vectors"].astype(np.float32), metadata.get("movies", [])
+
+def apply_segment(store, segment):
+    """Merge a decoded segment into the store, replacing whatever it held for the segment's urls"""
+    urls, chunks, vectors, movies = segment
+    for movie in movies:
+        store.set_movie(**movie)
+    store.remove_urls(urls)
+    if chunks:
+        store.add_chunks(chunks, vectors)
+    return len(chunks)
+
+def gateway_url(cid, filename):
+    # Uploads are wrapped in a directory, the file sits under its name
+    return f"https://{cid}.ipfs.w3s.link/{filename}"
+
+def fetch(cid, filename):
+    """Verified content of a published file, from the local content cache when it was seen before"""
+    with open(download(cid, filename), "rb") as f:
+        return f.read()
+
+class SnapshotPublisher:
+    """Publishes a store as delta segments plus a manifest of segment CIDs, so each upload is proportional to the change"""
+
+    def __init__(self, store, storacha, manifest_path=None, compact_after=64):
+        self.store = store
+        self.storacha = storacha
+        self.manifest_path = manifest_path or f"{os.path.splitext(store.index_path)[0]}.manifest.json"
+        self.compact_after = compact_after
+        self.lock = threading.Lock()
+        # Publishes run one at a time, in the background when started with publish_async
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    def load_manifest(self):
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_manifest(self, manifest):
+        temp_path = f"{self.manifest_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(temp_path, self.manifest_path)
+
+    def _new_manifest(self):
+        return {"version": MANIFEST_VERSION, "dimension": self.store.dimension, "segments": []}
+
+    def publish(self, compact=False):
+        """Upload a segment with the unpublished changes and a new manifest, returns the upload result of the manifest"""
+        with self.lock:
+            manifest = self.load_manifest()
+            changed, up_to_seq = self.store.unpublished_changes()
+            urls = changed
+
+            # Without a previous manifest (or when there are too many segments) publish everything as one segment
+            if manifest is None or compact or len(manifest["segments"]) >= self.compact_after:
+                manifest = self._new_manifest()
+                urls = self.store.urls()
+            elif not urls and manifest.get("cid"):
+                return {"status": "success", "cid": manifest["cid"], "url": gateway_url(manifest["cid"], MANIFEST_NAME), "unchanged": True}
+
+            chunks, vectors = self.store.chunks_for_urls(urls)
+            movies = self.store.get_movies(chunk["movie_id"] for chunk in chunks)
+            segment = encode_segment(urls, chunks, vectors, movies, storage_dtype(self.store.index))
+            segment_name = f"segment_{int(time.time())}_{len(manifest['segments']):05d}.npz"
+            result = self.storacha.upload_many([(segment, segment_name)])[0]
+            if result["status"] != "success":
+                return result
+
+            manifest["segments"].append({
+                "cid": result["cid"],
+                "filename": segment_name,
+                "urls": len(urls),
+                "chunks": len(chunks),
+                "bytes": len(segment)
+            })
+            manifest.pop("cid", None)
+            result = self.storacha.upload_many([(json.dumps(manifest, indent=2).encode("utf-8"), MANIFEST_NAME)])[0]
+            if result["status"] != "success":
+                return result
+
+            manifest["cid"] = result["cid"]
+            self._save_manifest(manifest)
+            self.store.mark_published(changed, up_to_seq)
+            return {**result, "url": gateway_url(result["cid"], MANIFEST_NAME), "segment_bytes": len(segment), "segments": len(manifest["segments"])}
+
+    def publish_async(self, compact=False):
+        """Like publish, but returns immediately with a Future of the result"""
+        def run():
+            try:
+                return self.publish(compact)
+            except Exception as e:
+                return {"status": "error", "message": str(e)}
+        return self.executor.submit(run)
+
+    def load(self, manifest_cid, fetch_segment=fetch):
+        """Replace the store contents with a published snapshot, returns the number of chunks loaded"""
+        with self.lock:
+            manifest = json.loads(fetch_segment(manifest_cid, MANIFEST_NAME))
+            if manifest.get("version") != MANIFEST_VERSION:
+                raise ValueError(f"Unsupported manifest version {manifest.get('version')}")
+            if manifest["dimension"] != self.store.dimension:
+                raise ValueError(f"Snapshot has dimension {manifest['dimension']}, expected {self.store.dimension}")
+
+            # Segments are downloaded in parallel but applied in order. Every one of them is fetched and decoded
+            # before the store is reset, so a failed download leaves the current index and sidecar as they were
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                segments = list(pool.map(
+                    lambda entry: decode_segment(fetch_segment(entry["cid"], entry["filename"])), manifest["segments"]
+                ))
+            with self.store.lock:
+                self.store.reset()
+                for segment in segments:
+                    apply_segment(self.store, segment)
+
+            # The loaded state is already published, new ingests become the next delta
+            urls, up_to_seq = self.store.unpublished_changes()
+            self.store.mark_published(urls, up_to_seq)
+            self.store.save()
+            manifest["cid"] = manifest_cid
+            self._save_manifest(manifest)
+            return len(self.store)
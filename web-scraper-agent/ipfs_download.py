@@ -0,0 +1,106 @@
+import os
+import shutil
+import time
+import requests
+import car_utils
+
+# Gateway URL template, {cid} and {path} are filled in ("" for the bare CID)
+IPFS_GATEWAY = os.getenv("IPFS_GATEWAY", "https://{cid}.ipfs.w3s.link/{path}")
+IPFS_CACHE_DIR = os.getenv("IPFS_CACHE_DIR", "ipfs_cache")
+
+class DownloadError(Exception):
+    """Download failed or its content did not match the CID"""
+
+class ContentNotFound(DownloadError):
+    """The gateway has nothing at this CID and path"""
+
+class ContentCache:
+    """Local content-addressed cache: verified downloads stored under their CID, so repeated loads skip the network"""
+
+    def __init__(self, path=IPFS_CACHE_DIR):
+        self.path = path
+        os.makedirs(self.path, exist_ok=True)
+
+    def path_for(self, cid, filename=None):
+        return os.path.join(self.path, cid, os.path.basename(filename) if filename else "content")
+
+    def get(self, cid, filename=None):
+        """Path of the cached content, or None when it was never downloaded"""
+        path = self.path_for(cid, filename)
+        return path if os.path.exists(path) else None
+
+    def size(self):
+        total = 0
+        for root, _, files in os.walk(self.path):
+            total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+        return total
+
+def verify(path, cid, filename=None):
+    """True if the file is the content addressed by cid, either directly or wrapped in a directory under filename"""
+    file_cid, wrapped_cid = car_utils.file_cids(path, filename)
+    return cid in (file_cid, wrapped_cid)
+
+def _fetch_to(url, part_path, timeout, max_retries, chunk_size, progress):
+    """Stream url into part_path, resuming with HTTP Range after dropped connections"""
+    attempt = 0
+    while True:
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        # Identity encoding so byte offsets match the content
+        headers = {"Accept-Encoding": "identity"}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+        try:
+            with requests.get(url, headers=headers, stream=True, timeout=timeout) as response:
+                if response.status_code == 416:
+                    # The part file already holds everything
+                    return
+                if response.status_code == 404:
+                    raise ContentNotFound(f"Not found: {url}")
+                response.raise_for_status()
+
+                # Servers that ignore Range send the whole body again
+                mode = "ab" if response.status_code == 206 else "wb"
+                total = response.headers.get("Content-Length")
+                total = int(total) + (offset if mode == "ab" else 0) if total else None
+                written = offset if mode == "ab" else 0
+                with open(part_path, mode) as f:
+                    for data in response.iter_content(chunk_size):
+                        f.write(data)
+                        written += len(data)
+                        if progress:
+                            progress(written, total)
+                if total is not None and written < total:
+                    raise requests.ConnectionError(f"Connection closed after {written} of {total} bytes")
+                return
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+            attempt += 1
+            if attempt > max_retries:
+                raise DownloadError(f"Download of {url} failed: {e}") from e
+            time.sleep(min(30, 0.5 * 2 ** attempt))
+
+def download(cid, filename=None, cache=None, gateway=IPFS_GATEWAY, timeout=(5, 60), max_retries=5,
+             chunk_size=1024 * 1024, progress=None):
+    """Download the content of cid (the file named filename when the CID is a wrapping directory)
+    into the content cache and return its path. The bytes are verified against the CID before use"""
+    cache = cache or ContentCache()
+    cached = cache.get(cid, filename)
+    if cached:
+        return cached
+
+    path = cache.path_for(cid, filename)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    part_path = f"{path}.part"
+    url = gateway.format(cid=cid, path=filename or "")
+
+    _fetch_to(url, part_path, timeout, max_retries, chunk_size, progress)
+
+    if not verify(part_path, cid, filename):
+        os.remove(part_path)
+        raise DownloadError(f"Content downloaded from {url} does not match {cid}")
+    os.replace(part_path, path)
+    return path
+
+def download_to(cid, output_path, filename=None, **kwargs):
+    """Download (or take from the cache) and copy to output_path"""
+    shutil.copyfile(download(cid, filename, **kwargs), output_path)
+    return output_path
@@ -0,0 +1,146 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+
+class QueueFull(Exception):
+    """Raised when the job queue already holds its maximum of unfinished jobs"""
+
+class Job:
+    """A unit of background work and its outcome, polled by clients through its id"""
+
+    def __init__(self, kind, key=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.key = key
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.trace_id = None
+
+    @property
+    def done(self):
+        return self.status in ("done", "failed")
+
+    def as_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "key": self.key,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "trace_id": self.trace_id
+        }
+
+class JobQueue:
+    """Bounded pool of background workers. Jobs submitted with the key of a queued or running job
+    are coalesced into it, so concurrent identical requests (e.g. ingesting the same movie) run once"""
+
+    def __init__(self, max_workers=2, max_pending=64, keep_finished=3600):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self.max_pending = max_pending
+        self.keep_finished = keep_finished
+        self.jobs = {}
+        self.active = {}
+        self.lock = threading.Lock()
+
+    def submit(self, kind, key, fn):
+        """Run fn() in the background and return its Job, or the unfinished job already holding key"""
+        with self.lock:
+            self._prune()
+            if key is not None and key in self.active:
+                return self.active[key]
+            if self.pending() >= self.max_pending:
+                raise QueueFull(f"{self.max_pending} jobs are already waiting")
+            job = self._add(kind, key)
+        self.executor.submit(self._run, job, fn)
+        return job
+
+    def track(self, kind, future):
+        """Expose a Future started elsewhere (e.g. a Storacha upload) as a job, without taking a worker"""
+        with self.lock:
+            self._prune()
+            job = self._add(kind, None)
+            job.status = "running"
+            job.started = time.time()
+
+        def finished(future):
+            try:
+                self._finish(job, future.result(), None)
+            except Exception as e:
+                self._finish(job, None, str(e))
+
+        future.add_done_callback(finished)
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def pending(self):
+        return sum(1 for job in self.jobs.values() if not job.done)
+
+    def stats(self):
+        with self.lock:
+            counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+            for job in self.jobs.values():
+                counts[job.status] += 1
+            return counts
+
+    def run_when_idle(self, fn):
+        """Run fn() if no job is queued or running, with new jobs held off until it returns. Returns whether it ran"""
+        with self.lock:
+            if self.pending():
+                return False
+            fn()
+            return True
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _add(self, kind, key):
+        job = Job(kind, key)
+        self.jobs[job.id] = job
+        if key is not None:
+            self.active[key] = job
+        return job
+
+    def _run(self, job, fn):
+        with self.lock:
+            job.status = "running"
+            job.started = time.time()
+        metrics.REGISTRY.observe("job_wait_seconds", job.started - job.created, kind=job.kind)
+
+        # Each job collects the spans of its stages in a trace of its own
+        with metrics.trace(f"job {job.kind}") as trace:
+            job.trace_id = trace.id
+            try:
+                result, error = fn(), None
+            except Exception as e:
+                result, error = None, str(e)
+        metrics.REGISTRY.observe("job_seconds", trace.seconds, kind=job.kind)
+        metrics.inc("jobs_total", kind=job.kind, status="failed" if error is not None else "done")
+        self._finish(job, result, error)
+
+    def _finish(self, job, result, error):
+        with self.lock:
+            job.result = result
+            job.error = error
+            job.status = "failed" if error is not None else "done"
+            job.finished = time.time()
+            if job.key is not None and self.active.get(job.key) is job:
+                del self.active[job.key]
+
+    def _prune(self):
+        # Finished jobs stay pollable for keep_finished seconds
+        cutoff = time.time() - self.keep_finished
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.done and job.finished < cutoff]:
+            del self.jobs[job_id]
@@ -0,0 +1,120 @@
+import hashlib
+import sqlite3
+import threading
+import time
+import metrics
+
+# Bump when a prompt template changes so old results are not reused
+SUMMARY_PROMPT_VERSION = "summary-v1"
+ANSWER_PROMPT_VERSION = "answer-v1"
+
+class LLMCache:
+    """Persistent cache of LLM results keyed by (model, prompt template version, context hash)"""
+
+    def __init__(self, path="llm_cache.db", ttl=7 * 24 * 3600, max_entries=5000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(
+            """CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS result_movies (
+                key TEXT NOT NULL,
+                movie_id TEXT NOT NULL,
+                PRIMARY KEY (key, movie_id)
+            );
+            CREATE INDEX IF NOT EXISTS result_movies_movie ON result_movies (movie_id);
+            CREATE TABLE IF NOT EXISTS movie_content (
+                movie_id TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL
+            );"""
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def make_key(model, prompt_version, context):
+        digest = hashlib.sha256(context.encode("utf-8")).hexdigest()
+        return f"{model}:{prompt_version}:{digest}"
+
+    def get(self, key):
+        """Cached value, or None when missing or expired"""
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute("SELECT value, created_at FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None or (self.ttl and now - row[1] > self.ttl):
+                self.misses += 1
+                metrics.inc("cache_requests_total", cache="llm", result="miss")
+                return None
+            self.conn.execute("UPDATE results SET last_used = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+            self.hits += 1
+            metrics.inc("cache_requests_total", cache="llm", result="hit")
+            return row[0]
+
+    def put(self, key, value, movie_ids=()):
+        """Store a result, linked to the movies it was generated from"""
+        now = time.time()
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)", (key, value, now, now))
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO result_movies VALUES (?, ?)",
+                [(key, str(movie_id)) for movie_id in set(movie_ids) if movie_id is not None]
+            )
+            self._evict(now)
+            self.conn.commit()
+
+    def _evict(self, now):
+        """Drop expired results, then the least recently used ones beyond max_entries"""
+        if self.ttl:
+            self.conn.execute("DELETE FROM results WHERE created_at < ?", (now - self.ttl,))
+        if self.max_entries:
+            self.conn.execute(
+                "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+        self.conn.execute("DELETE FROM result_movies WHERE key NOT IN (SELECT key FROM results)")
+
+    def get_or_compute(self, key, compute, movie_ids=()):
+        """Return the cached result for key, computing and storing it on a miss"""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value, movie_ids)
+        return value
+
+    def invalidate_movie(self, movie_id):
+        """Forget every result generated from a movie's reviews, returns how many were removed"""
+        with self.lock:
+            keys = [row[0] for row in self.conn.execute(
+                "SELECT key FROM result_movies WHERE movie_id = ?", (str(movie_id),)
+            ).fetchall()]
+            self.conn.executemany("DELETE FROM results WHERE key = ?", [(key,) for key in keys])
+            self.conn.execute("DELETE FROM result_movies WHERE movie_id = ?", (str(movie_id),))
+            self.conn.commit()
+            return len(keys)
+
+    def track_content(self, movie_id, content):
+        """Record the reviews seen for a movie, invalidating its results when they changed"""
+        content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT content_hash FROM movie_content WHERE movie_id = ?", (str(movie_id),)
+            ).fetchone()
+            self.conn.execute("INSERT OR REPLACE INTO movie_content VALUES (?, ?)", (str(movie_id), content_hash))
+            self.conn.commit()
+
+        if row is not None and row[0] != content_hash:
+            return self.invalidate_movie(movie_id)
+        return 0
+
+    def stats(self):
+        count = self.conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        return {"entries": count, "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,55 @@
+import time
+
+class StreamStats:
+    """Time-to-first-token and throughput of one streamed generation"""
+
+    def __init__(self, model=None):
+        self.model = model
+        self.started = None
+        self.first_token_at = None
+        self.finished = None
+        self.tokens = 0
+
+    @property
+    def time_to_first_token(self):
+        return self.first_token_at - self.started if self.first_token_at else None
+
+    @property
+    def total_seconds(self):
+        return (self.finished or time.perf_counter()) - self.started if self.started else None
+
+    @property
+    def tokens_per_sec(self):
+        # Decode speed, measured from the first token so prompt processing does not skew it
+        if not self.first_token_at or self.tokens < 2:
+            return None
+        elapsed = (self.finished or time.perf_counter()) - self.first_token_at
+        return (self.tokens - 1) / elapsed if elapsed > 0 else None
+
+    def as_dict(self):
+        return {
+            "model": self.model,
+            "time_to_first_token": self.time_to_first_token,
+            "tokens": self.tokens,
+            "tokens_per_sec": self.tokens_per_sec,
+            "total_seconds": self.total_seconds
+        }
+
+    def describe(self):
+        ttft = f"{self.time_to_first_token:.2f}s" if self.time_to_first_token is not None else "-"
+        speed = f"{self.tokens_per_sec:.1f} tok/s" if self.tokens_per_sec else "-"
+        return f"⏱️ {self.model or 'LLM'}: first token {ttft} · {speed} · {self.tokens} tokens in {self.total_seconds:.2f}s"
+
+def stream_with_metrics(chunks, stats):
+    """Pass streamed chunks through unchanged while recording timings in stats (one chunk ≈ one token)"""
+    stats.started = time.perf_counter()
+    try:
+        for chunk in chunks:
+            if not chunk:
+                continue
+            if stats.first_token_at is None:
+                stats.first_token_at = time.perf_counter()
+            stats.tokens += 1
+            yield chunk
+    finally:
+        stats.finished = time.perf_counter()
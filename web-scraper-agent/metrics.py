@@ -0,0 +1,196 @@
+import bisect
+import contextvars
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the latency histogram buckets, from cache hits to full map-reduce summaries
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Recent samples kept per histogram for p50/p95
+RESERVOIR_SIZE = 2048
+
+PREFIX = "cineai_"
+
+class Histogram:
+    """Prometheus-style cumulative buckets plus a window of recent samples for percentiles"""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=RESERVOIR_SIZE)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.recent.append(value)
+
+    def percentile(self, q):
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def summary(self):
+        return {"count": self.count, "sum": self.sum, "p50": self.percentile(0.5), "p95": self.percentile(0.95)}
+
+class Trace:
+    """Spans recorded while handling one request or job, in the order they finished"""
+
+    def __init__(self, name):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.started = time.perf_counter()
+        self.started_at = time.time()
+        self.seconds = None
+        self.spans = []
+        self.lock = threading.Lock()
+
+    def add(self, name, seconds, start=None):
+        offset = (start if start is not None else time.perf_counter() - seconds) - self.started
+        with self.lock:
+            self.spans.append({"name": name, "offset": offset, "seconds": seconds})
+
+    def finish(self):
+        if self.seconds is None:
+            self.seconds = time.perf_counter() - self.started
+
+    def as_dict(self):
+        with self.lock:
+            spans = list(self.spans)
+        return {
+            "id": self.id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "seconds": self.seconds,
+            "running": self.seconds is None,
+            "spans": spans
+        }
+
+class Registry:
+    """Process-wide counters, latency histograms and the most recent traces"""
+
+    def __init__(self, keep_traces=200):
+        self.counters = {}
+        self.histograms = {}
+        self.traces = OrderedDict()
+        self.keep_traces = keep_traces
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].observe(seconds)
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.traces.clear()
+
+    def start_trace(self, name):
+        trace = Trace(name)
+        with self.lock:
+            self.traces[trace.id] = trace
+            while len(self.traces) > self.keep_traces:
+                self.traces.popitem(last=False)
+        return trace
+
+    def get_trace(self, trace_id):
+        with self.lock:
+            return self.traces.get(trace_id)
+
+    def snapshot(self):
+        """Counters and p50/p95 per histogram, as plain JSON"""
+        with self.lock:
+            return {
+                "counters": [{"name": name, "labels": dict(labels), "value": value} for (name, labels), value in self.counters.items()],
+                "latency": [{"name": name, "labels": dict(labels), **histogram.summary()} for (name, labels), histogram in self.histograms.items()]
+            }
+
+    def render_prometheus(self):
+        """Text exposition format, scraped from the service's /metrics endpoint"""
+        def labels_text(labels, extra=()):
+            pairs = [f'{label}="{value}"' for label, value in (*labels, *extra)]
+            return "{" + ",".join(pairs) + "}" if pairs else ""
+
+        lines = []
+        with self.lock:
+            for name in sorted({name for name, _ in self.counters}):
+                lines.append(f"# TYPE {PREFIX}{name} counter")
+                for (counter, labels), value in self.counters.items():
+                    if counter == name:
+                        lines.append(f"{PREFIX}{name}{labels_text(labels)} {value}")
+            for name in sorted({name for name, _ in self.histograms}):
+                lines.append(f"# TYPE {PREFIX}{name} histogram")
+                for (histogram_name, labels), histogram in self.histograms.items():
+                    if histogram_name != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip((*BUCKETS, "+Inf"), histogram.counts):
+                        cumulative += count
+                        lines.append(f"{PREFIX}{name}_bucket{labels_text(labels, [('le', bound)])} {cumulative}")
+                    lines.append(f"{PREFIX}{name}_sum{labels_text(labels)} {histogram.sum}")
+                    lines.append(f"{PREFIX}{name}_count{labels_text(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+# Trace of the request or job running in this context, spans are added to it when set
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+def current_trace():
+    return _current_trace.get()
+
+def inc(name, value=1, **labels):
+    REGISTRY.inc(name, value, **labels)
+
+def record(stage, seconds, start=None, trace=None):
+    """Record a finished stage in the stage latency histogram and in the current (or given) trace"""
+    REGISTRY.observe("stage_seconds", seconds, stage=stage)
+    trace = trace or current_trace()
+    if trace is not None:
+        trace.add(stage, seconds, start)
+
+@contextmanager
+def span(stage):
+    """Time the enclosed block as one pipeline stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start, start)
+
+@contextmanager
+def use_trace(current):
+    """Add the spans of the enclosed block to an existing trace"""
+    token = _current_trace.set(current)
+    try:
+        yield current
+    finally:
+        _current_trace.reset(token)
+
+@contextmanager
+def trace(name):
+    """Collect the spans of the enclosed block (a request or a job) into a new trace"""
+    current = REGISTRY.start_trace(name)
+    try:
+        with use_trace(current):
+            yield current
+    finally:
+        current.finish()
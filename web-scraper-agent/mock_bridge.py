@@ -0,0 +1,122 @@
+import argparse
+import base64
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def _cid_digest(cid):
+    """sha2-256 digest inside a base32 CIDv1 string"""
+    raw = base64.b32decode(cid[1:].upper() + "=" * (-len(cid[1:]) % 8))
+    return raw[-32:]
+
+class MockBridgeState:
+    """What the mock bridge has received, shared by every request"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.shards = {}
+        self.uploads = {}
+        self.calls = {"bridge": 0, "store/add": 0, "upload/add": 0, "put": 0, "unauthorized": 0}
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.calls[name] += amount
+
+class MockBridgeHandler(BaseHTTPRequestHandler):
+    """Minimal Storacha HTTP bridge: store/add, upload/add and the presigned CAR PUT"""
+
+    state = None
+    latency = 0.0
+    authorization = None
+
+    def do_POST(self):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.authorization and self.headers.get("Authorization") != self.authorization:
+            self.state.count("unauthorized")
+            return self._send(401, {"error": "Unauthorized"})
+
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        self.state.count("bridge")
+        receipts = []
+        for capability, space, args in body["tasks"]:
+            self.state.count(capability)
+            if capability == "store/add":
+                cid = args["link"]["/"]
+                with self.state.lock:
+                    stored = cid in self.state.shards
+                if stored:
+                    out = {"ok": {"status": "done"}}
+                else:
+                    out = {"ok": {
+                        "status": "upload",
+                        "url": f"http://{self.headers['Host']}/put/{cid}",
+                        "headers": {"x-amz-checksum-sha256": base64.b64encode(_cid_digest(cid)).decode("ascii")}
+                    }}
+            elif capability == "upload/add":
+                with self.state.lock:
+                    missing = [shard["/"] for shard in args["shards"] if shard["/"] not in self.state.shards]
+                    if not missing:
+                        self.state.uploads[args["root"]["/"]] = [shard["/"] for shard in args["shards"]]
+                out = {"error": {"name": "ShardNotFound", "message": f"missing {missing}"}} if missing else {"ok": {"root": args["root"]}}
+            else:
+                out = {"error": {"name": "UnknownCapability", "message": capability}}
+            receipts.append({"p": {"out": out}})
+        self._send(200, receipts)
+
+    def do_PUT(self):
+        if self.latency:
+            time.sleep(self.latency)
+        cid = self.path.rsplit("/", 1)[-1]
+        data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.state.count("put")
+
+        # Same integrity check as the presigned S3 URL
+        checksum = base64.b64encode(hashlib.sha256(data).digest()).decode("ascii")
+        if checksum != self.headers.get("x-amz-checksum-sha256") or hashlib.sha256(data).digest() != _cid_digest(cid):
+            return self._send(400, {"error": "checksum mismatch"})
+        with self.state.lock:
+            self.state.shards[cid] = data
+        self._send(200, {})
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_mock_bridge(port=0, latency=0.0, authorization=None):
+    """Start the mock bridge in a background thread, returns (server, bridge_url, state)"""
+    state = MockBridgeState()
+    handler = type("ConfiguredMockBridgeHandler", (MockBridgeHandler,), {
+        "state": state,
+        "latency": latency,
+        "authorization": authorization
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/bridge", state
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local mock of the Storacha HTTP bridge")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before each response")
+    args = parser.parse_args()
+
+    server, bridge_url, state = start_mock_bridge(args.port, args.latency)
+    print(f"☁️ Mock bridge on {bridge_url} (set STORACHA_BRIDGE_URL={bridge_url})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"Calls: {state.calls}")
+
+if __name__ == "__main__":
+    main()
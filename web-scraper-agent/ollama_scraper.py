@@ -1,43 +1,62 @@
-import requests
-from bs4 import BeautifulSoup
+import time
 import streamlit as st
-from langchain_ollama import OllamaLLM
-import python_filmaffinity
+from http_client import get_http_client
+from llm_streaming import StreamStats, stream_with_metrics
+from llm_cache import SUMMARY_PROMPT_VERSION
+from review_scraper import FetchError, fetch_reviews, reviews_url
+from resources import get_filmaffinity, get_llm, get_llm_cache, get_summarizer, show_resource_timings
 
-# Initialize FilmAffinity
-fa = python_filmaffinity.FilmAffinity()
+RERUN_STARTED = time.perf_counter()
+
+# Initialize FilmAffinity (searches share the HTTP cache with the review scraper)
+fa = get_filmaffinity()
 
 # Load AI Model
-llm = OllamaLLM(model="stablelm2")  # Change to "mistral" or another model if necessary
+llm = get_llm()
+
+# Cache of summaries, so repeated requests skip the model
+llm_cache = get_llm_cache()
+
+# Map-reduce summarizer over the full set of reviews
+summarizer = get_summarizer()
 
 # Function to scrape the comments of a movie
 def scrape_reviews(url):
     try:
         st.write(f'\n 🗃️ Scraping website: {url}')
-        headers = {"User-Agent": "Mozilla/5.0"}
-        response = requests.get(url, headers=headers)
-
-        if response.status_code != 200:
-            return f"⚠️ Failed to fetch {url}"
-
-        # Extract the comments
-        soup = BeautifulSoup(response.text, "html.parser")
-        reviews = soup.find_all("td", class_="rev-text")
+        reviews = fetch_reviews(url)
 
         if not reviews:
             return "❌ No reviews found on this page."
 
-        # Extract the text of each comment
-        text = " ".join([review.a.get_text(strip=True) for review in reviews if review.a])
-
-        return text[:2000]  # Limit characters to avoid overloading the AI
+        # One review per line, the summarizer covers all of them within its token budget
+        return "\n".join(reviews)
+    except FetchError:
+        return f"⚠️ Failed to fetch {url}"
     except Exception as e:
         return f"❌ Error: {str(e)}"
 
-# Function to summarize content using AI
-def summarize_content(content):
+# Function to summarize content using AI, streaming tokens into the page
+def summarize_content(content, movie_id=None):
     st.write("✍️ Summarizing content...")
-    return llm.invoke(f"Summarize the following content:\n\n{content[:1000]}")  # Limit to 1000 characters
+    key = llm_cache.make_key(llm.model, SUMMARY_PROMPT_VERSION, content)
+    cached = llm_cache.get(key)
+    if cached is not None:
+        st.write(cached)
+        st.caption("⚡ Served from cache")
+        return cached
+
+    stats = StreamStats(llm.model)
+    summary = st.write_stream(stream_with_metrics(summarizer.summarize_stream(content), stats))
+    llm_cache.put(key, summary, [movie_id])
+    st.caption(stats.describe())
+    return summary
+
+# HTTP cache counters
+def show_cache_stats():
+    stats = get_http_client().cache_stats
+    st.sidebar.subheader("🗄️ HTTP Cache")
+    st.sidebar.write(f"Hits: {stats['hits']} | Revalidated: {stats['revalidated']} | Misses: {stats['misses']}")
 
 # UI Streamlit
 st.title("🤖 CineAI-Agents - Web Scraper")
@@ -65,7 +84,7 @@ if movie_title:
         # Button to summarize the comments of the selected movie
         if selected_movie and st.button("📄 Summarize Reviews"):
             # Build the Filmaffinity URL for the selected movie
-            movie_url = f"https://www.filmaffinity.com/es/pro-reviews.php?movie-id={selected_movie['id']}"
+            movie_url = reviews_url(selected_movie['id'])
 
             # Get movie reviews
             content = scrape_reviews(movie_url)
@@ -73,7 +92,12 @@ if movie_title:
             if "⚠️ Failed" in content or "❌ Error" in content or "❌ No reviews" in content:
                 st.write(content)
             else:
+                # Drop cached summaries for this movie if its reviews changed
+                llm_cache.track_content(selected_movie['id'], content)
+
                 # Summarize the comments
-                summary = summarize_content(content)
                 st.subheader(f"📄 Reviews Summary for {' '.join(dict.fromkeys(selected_movie['title'].split('\n')))}")
-                st.write(summary)
\ No newline at end of file
+                summary = summarize_content(content, selected_movie['id'])
+
+show_cache_stats()
+show_resource_timings(RERUN_STARTED)
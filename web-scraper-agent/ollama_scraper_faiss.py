@@ -1,213 +1,223 @@
-import requests, os
+import time
 import streamlit as st
-import python_filmaffinity
-import faiss
-import numpy as np
-from bs4 import BeautifulSoup
-from langchain_ollama import OllamaLLM
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain.text_splitter import CharacterTextSplitter
-from langchain.schema import Document
-import subprocess
-from datetime import datetime
-import uuid
-from storacha_utils import StorachaClient
-
-# Inicialización del cliente
-storacha = StorachaClient()
-
-# Initialize FilmAffinity
-fa = python_filmaffinity.FilmAffinity()
-
-# Load AI Model
-llm = OllamaLLM(model="stablelm2")  # Change to "mistral" or another model if necessary
-
-# Load HuggingFace Embeddings
-embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-
-# Load FAISS Vector Store
-index = faiss.IndexFlatL2(384) # Vector dimension for MiniLM
-vector_store = {}
-
-# Function to scrape the comments of a movie
-def scrape_reviews(url):
-    try:
-        st.write(f'\n 🗃️ Scraping website: {url}')
-        headers = {"User-Agent": "Mozilla/5.0"}
-        response = requests.get(url, headers=headers)
+from api_client import ApiClient, ApiError
+from llm_streaming import StreamStats, stream_with_metrics
 
-        if response.status_code != 200:
-            return f"⚠️ Failed to fetch {url}"
+RERUN_STARTED = time.perf_counter()
 
-        # Extract the comments
-        soup = BeautifulSoup(response.text, "html.parser")
-        reviews = soup.find_all("td", class_="rev-text")
+# Thin client: scraping, models, the FAISS index and Storacha live in the API service (python service.py),
+# long scrapes and uploads run there as background jobs while the page polls their status
+api = ApiClient()
 
-        if not reviews:
-            return "❌ No reviews found on this page."
+try:
+    service = api.health()
+except ApiError as e:
+    st.error(f"❌ {e}\n\nStart the service with `python service.py`")
+    st.stop()
 
-        # Extract the text of each comment
-        text = " ".join([review.a.get_text(strip=True) for review in reviews if review.a])
+# Function to show a title without the repeated original title
+def display_title(title):
+    return ' '.join(dict.fromkeys(title.split('\n')))
 
-        return text[:5000]  # Limit characters to avoid overloading the AI
-    except Exception as e:
-        return f"❌ Error: {str(e)}"
-    
-# Function to store data in FAISS
-def store_in_faiss(text, url):
-    global index, vector_store
-    st.write("📦 Storing data in FAISS...")
+# Function to show a streamed (or cached) LLM result from the service
+def write_llm_output(headers, tokens):
+    if headers.get("X-Cache") == "hit":
+        text = "".join(tokens)
+        st.write(text)
+        st.caption("⚡ Served from cache")
+        return text
 
-    # Split text into chunks
-    splitter = CharacterTextSplitter(chunk_size=500, chunk_overlap=100)
-    texts = splitter.split_text(text)
+    stats = StreamStats(service["model"])
+    text = st.write_stream(stream_with_metrics(tokens, stats))
 
-    # Embed each chunk
-    vectors = embeddings.embed_documents(texts)
-    vectors = np.array(vectors, dtype=np.float32)
+    # Keep the timings so slow models show up
+    st.caption(stats.describe())
+    st.session_state.setdefault("llm_metrics", []).append(stats.as_dict())
+    return text
 
-    # Store in FAISS
-    index.add(vectors)
-    filename = save_faiss_index(index)
-    vector_store[len(vector_store)] = (url, text)
+# Function to retrieve relevant chunks and answer questions
+def retrieve_and_answer(query, filters=None):
+    try:
+        headers, tokens = api.ask_stream(query, filters)
+        track_trace("ask", headers.get("X-Trace-Id"))
+        return write_llm_output(headers, tokens)
+    except ApiError as e:
+        st.error(f"❌ {e}")
+        return None
 
-    return "✅ Data stored in FAISS."
+# Function to summarize content using AI, the service then uploads it to Storacha in the background
+def summarize_and_upload(movie):
+    st.subheader(f"📄 Reviews Summary for {display_title(movie['title'])}")
+    try:
+        headers, tokens = api.summary_stream(movie['id'], movie_fields(movie))
+    except ApiError as e:
+        st.write(f"⚠️ {e}")
+        return None
 
-# Function to retrieve relevant chunks and answer questions
-def retrieve_and_answer(query):
-    global index, vector_store
-
-    # Convert query into embedding
-    query_vector = np.array(embeddings.embed_query(query), dtype=np.float32).reshape(1, -1)
-
-    # Search FAISS for similar vectors
-    D, I = index.search(query_vector, k=2) # Return 2 most similar vectors
-
-    context = ""
-    for idx in I[0]:
-        if idx in vector_store:
-            context += " ".join(vector_store[idx][1]) + "\n\n"
-
-    if not context:
-        return "🤖 No relevant information found."
-    
-    #Ask AI to generate an answer
-    return llm.invoke(f"Based on the following context, answer the question:\n\n{context}\n\nQuestion: {query}\nAnswer:")
-
-# Function to summarize content using AI
-def summarize_and_upload(content, movie_id, movie_title):
-    """Combined function that summarizes and uploads to Storacha"""
-    with st.spinner("✍️ Generating summary..."):
-        summary = llm.invoke(f"Summarize the following content:\n\n{content[:1000]}")
-    
-    st.subheader(f"📄 Reviews Summary for {' '.join(dict.fromkeys(movie_title.split('\n')))}")
-    st.write(summary)
-    
-    # Automatic upload to Storacha
-    with st.spinner("☁️ Uploading to Storacha..."):
-        # Configure if it is the first time
-        if not storacha.ready:
-            if not storacha.setup():
-                st.error("Error configuring Storacha")
-                return summary
-        
-        # Upload the summary
-        result = storacha.upload_text(summary, movie_title)
-        
-        if result["status"] == "success":
-            st.success("✅ Review uploaded successfully!")
-            st.code(f"CID: {result['cid']}", language="text")
-            st.markdown(f"🔗 [Ver en IPFS Gateway](https://{result['cid']}.ipfs.w3s.link)")
-        else:
-            st.error(f"❌ Error: {result['message']}")
-    
+    track_trace("summary", headers.get("X-Trace-Id"))
+    summary = write_llm_output(headers, tokens)
+    track_job("summary", headers["X-Upload-Job"])
+    st.info("☁️ Summary queued for upload to Storacha")
     return summary
 
-# Function to save FAISS index to a file
-def save_faiss_index(index, filename="faiss_index.idx"):
-    faiss.write_index(index, filename)
-    return filename
+# Function to store the reviews in FAISS, as a background job of the service
+def store_in_faiss(movie):
+    try:
+        job = api.ingest(movie['id'], movie_fields(movie))
+    except ApiError as e:
+        st.error(f"❌ {e}")
+        return
+    track_job("faiss_ingest", job["id"])
+    st.write("📦 Storing data in FAISS in the background...")
+
+# Function to keep the fields stored with the movie's chunks (for filtered questions)
+def movie_fields(movie):
+    return {"title": movie['title'], "year": movie['year'], "country": movie['country']}
+
+# Function to remember a background job so its result is shown on a later rerun
+def track_job(kind, job_id):
+    st.session_state.setdefault("pending_jobs", []).append((kind, job_id))
+
+# Function to remember the trace of the latest request of each kind for the debug panel
+def track_trace(kind, trace_id):
+    if trace_id:
+        st.session_state.setdefault("traces", {})[kind] = trace_id
+
+# Per-stage breakdown of the latest requests, as measured by the service
+def show_debug_panel():
+    traces = st.session_state.get("traces")
+    if not traces:
+        return
+    with st.sidebar.expander("🐞 Last request breakdown"):
+        for kind, trace_id in traces.items():
+            try:
+                trace = api.trace(trace_id)
+            except ApiError:
+                continue
+            total = f"{trace['seconds']:.3f}s" if trace["seconds"] is not None else "running"
+            st.write(f"**{kind}** · {trace['name']} · {total}")
+            spans = sorted(trace["spans"], key=lambda span: span["offset"])
+            if spans:
+                st.dataframe(
+                    [{"stage": span["name"], "start ms": round(1000 * span["offset"], 1), "ms": round(1000 * span["seconds"], 1)} for span in spans],
+                    hide_index=True
+                )
+
+# Function to show finished background jobs
+def show_pending_jobs():
+    pending = st.session_state.get("pending_jobs", [])
+    if not pending:
+        return
+    st.sidebar.subheader("⚙️ Background Jobs")
+    remaining = []
+    for kind, job_id in pending:
+        try:
+            job = api.job(job_id)
+        except ApiError as e:
+            st.sidebar.error(f"❌ {kind}: {e}")
+            continue
+        if job["status"] in ("queued", "running"):
+            remaining.append((kind, job_id))
+            continue
+        track_trace(kind, job["trace_id"])
+        if job["status"] == "failed":
+            st.sidebar.error(f"❌ {kind}: {job['error']}")
+            continue
+
+        result = job["result"]
+        if kind == "faiss_ingest":
+            st.sidebar.success(f"✅ {kind}: {result['chunks']} chunks")
+            # Indexing done, the changed chunks are now published as a snapshot segment
+            if "publish_job" in result:
+                remaining.append(("faiss_index", result["publish_job"]))
+            else:
+                st.sidebar.error(f"❌ faiss_index: {result['publish_error']}")
+        elif result["status"] == "success":
+            st.sidebar.success(f"✅ {kind}: {result['cid']}")
+            if kind == "faiss_index":
+                st.session_state.faiss_cid = result["cid"]
+                st.session_state.faiss_url = result["url"]
+        else:
+            st.sidebar.error(f"❌ {kind}: {result['message']}")
+    if remaining:
+        st.sidebar.write(f"⏳ {len(remaining)} job(s) in progress")
+        st.sidebar.button("🔄 Refresh")
+    st.session_state.pending_jobs = remaining
 
 # Function to upload FAISS index to Storacha
-def upload_faiss_to_storacha(filename="faiss_index.idx"):
-    """Uploads the FAISS index file to Storacha and returns the CID"""
+def upload_faiss_to_storacha():
+    """Publishes the changes since the last snapshot as a new segment and returns the manifest CID"""
     st.write("☁️ Uploading FAISS index to Storacha...")
-    
-    # Configure if it is the first time
-    if not storacha.ready:
-        if not storacha.setup():
-            st.error("Error configuring Storacha")
-            return None
-    
-    # Create a temporary file for upload
-    temp_filename = f"faiss_index_{uuid.uuid4().hex[:8]}.idx"
-    
-    # Make a copy with the unique name
     try:
-        import shutil
-        shutil.copy(filename, temp_filename)
-        
-        # Use the binary file upload method from StorachaClient
-        with open(temp_filename, 'rb') as f:
-            file_content = f.read()
-        
-        # Upload the binary data
-        result = storacha.upload_binary(file_content, "faiss_index")
-        
-        # Clean up temporary file
-        os.remove(temp_filename)
-        
-        if result["status"] == "success":
-            st.success("✅ FAISS index uploaded successfully!")
-            st.code(f"CID: {result['cid']}", language="text")
-            st.markdown(f"🔗 [Ver en IPFS Gateway](https://{result['cid']}.ipfs.w3s.link)")
-            return result
-        else:
-            st.error(f"❌ Error: {result['message']}")
-            return None
-            
-    except Exception as e:
-        st.error(f"❌ Error uploading FAISS index: {str(e)}")
-        # Clean up if file exists
-        if os.path.exists(temp_filename):
-            os.remove(temp_filename)
+        # Only the new segment and the small manifest are uploaded
+        with st.spinner("Publishing snapshot..."):
+            job = api.wait(api.publish()["id"])
+        track_trace("faiss_index", job["trace_id"])
+    except ApiError as e:
+        st.error(f"❌ Error uploading FAISS index: {e}")
         return None
 
-# Function to download FAISS index from Storacha
-def download_faiss_from_storacha(cid, output_filename="faiss_index.idx"):
-    """Downloads a FAISS index from Storacha using its CID"""
-    st.write(f"📥 Downloading FAISS index from Storacha (CID: {cid})...")
-    
-    try:
-        # Download from IPFS gateway
-        response = requests.get(f"https://{cid}.ipfs.w3s.link")
-        
-        if response.status_code != 200:
-            st.error(f"❌ Failed to download FAISS index: HTTP {response.status_code}")
-            return False
-            
-        # Save to file
-        with open(output_filename, 'wb') as f:
-            f.write(response.content)
-            
-        st.success(f"✅ FAISS index downloaded successfully to {output_filename}")
-        return True
-        
-    except Exception as e:
-        st.error(f"❌ Error downloading FAISS index: {str(e)}")
-        return False
-
-# Function to load FAISS index from a file
-def load_faiss_index(filename="faiss_index.idx"):
+    result = job["result"]
+    if job["status"] == "failed" or result["status"] != "success":
+        st.error(f"❌ Error: {job['error'] or result['message']}")
+        return None
+
+    if result.get("unchanged"):
+        st.info("ℹ️ No changes since the last snapshot")
+    else:
+        st.success(f"✅ FAISS index uploaded successfully! ({result['segment_bytes'] // 1024} KiB segment, {result['segments']} segments)")
+    st.code(f"CID: {result['cid']}", language="text")
+    st.markdown(f"🔗 [Ver en IPFS Gateway]({result['url']})")
+    return result
+
+# Function to load a FAISS snapshot (or a whole index uploaded before snapshots existed) from Storacha
+def load_faiss_from_storacha(cid):
+    st.write(f"📥 Loading FAISS index from Storacha (CID: {cid})...")
     try:
-        loaded_index = faiss.read_index(filename)
-        st.success(f"✅ FAISS index loaded from {filename}")
-        return loaded_index
-    except Exception as e:
-        st.error(f"❌ Error loading FAISS index: {str(e)}")
+        # Downloaded by the service, checked against the CID and cached by CID
+        with st.spinner("Downloading..."):
+            job = api.wait(api.load_index(cid)["id"])
+        track_trace("faiss_load", job["trace_id"])
+    except ApiError as e:
+        st.error(f"❌ {e}")
         return None
 
+    if job["status"] == "failed":
+        st.error(f"❌ Error loading FAISS index: {job['error']}")
+        return None
+    result = job["result"]
+    st.success(f"✅ FAISS {'snapshot' if result['snapshot'] else 'index'} loaded ({result['chunks']} chunks)")
+    return result
+
+# Service startup costs and cache counters
+def show_service_stats():
+    try:
+        stats = api.stats()
+    except ApiError:
+        return
+    cache = stats["http_cache"]
+    st.sidebar.subheader("🗄️ HTTP Cache")
+    st.sidebar.write(f"Hits: {cache['hits']} | Revalidated: {cache['revalidated']} | Misses: {cache['misses']}")
+
+    stages = [row for row in stats["latency"] if row["name"] == "stage_seconds"]
+    if stages:
+        with st.sidebar.expander("⏱️ Stage latency"):
+            st.dataframe(
+                [{"stage": row["labels"]["stage"], "count": row["count"], "p50 ms": round(1000 * row["p50"], 1), "p95 ms": round(1000 * row["p95"], 1)} for row in stages],
+                hide_index=True
+            )
+
+    st.sidebar.subheader("🚀 Startup")
+    for name, seconds in stats["startup"].items():
+        st.sidebar.write(f"{name}: {seconds:.2f}s")
+    st.sidebar.caption(f"This rerun: {time.perf_counter() - RERUN_STARTED:.3f}s")
+    if st.sidebar.button("♻️ Reload models"):
+        try:
+            api.reload()
+            st.rerun()
+        except ApiError as e:
+            st.sidebar.write(f"⚠️ {e}")
+
 # UI Streamlit
 st.title("🤖 CineAI-Agents - Web Scraper")
 st.write("💫 Enter a movie title below and get a summary of the reviews!")
@@ -217,7 +227,12 @@ movie_title = st.text_input("🎬 Enter Title of the Audiovisual:")
 
 if movie_title:
     # Search for movies related to the title
-    peliculas = fa.search(title=movie_title)
+    try:
+        peliculas = api.search(movie_title)
+        track_trace("search", api.last_trace_id)
+    except ApiError as e:
+        st.error(f"❌ {e}")
+        peliculas = []
 
     if not peliculas:
         st.write("❌ No movies found with that title.")
@@ -227,38 +242,19 @@ if movie_title:
         selected_movie = None
 
         for i, pelicula in enumerate(peliculas):
-            if st.checkbox(f"[{pelicula['year']}] {' '.join(dict.fromkeys(pelicula['title'].split('\n')))} | {pelicula['country']} | ID: {pelicula['id']}", key=f"movie_{i}"):
+            if st.checkbox(f"[{pelicula['year']}] {display_title(pelicula['title'])} | {pelicula['country']} | ID: {pelicula['id']}", key=f"movie_{i}"):
                 selected_movie = pelicula
 
+        # Remembered so questions can be restricted to this movie
+        if selected_movie:
+            st.session_state.selected_movie = selected_movie
+
         # Button to summarize the comments of the selected movie
         if selected_movie and st.button("📄 Summarize Reviews"):
-            # Build the Filmaffinity URL for the selected movie
-            movie_url = f"https://www.filmaffinity.com/es/pro-reviews.php?movie-id={selected_movie['id']}"
-
-            # Get movie reviews
-            content = scrape_reviews(movie_url)
-
-            if "⚠️ Failed" in content or "❌ Error" in content or "❌ No reviews" in content:
-                st.write(content)
-            else:
-                # Combined process: summarize + upload to Storacha
-                summary = summarize_and_upload(
-                    content,
-                    selected_movie['id'],
-                    selected_movie['title']
-                )
-                
-                # Store in FAISS
-                store_message = store_in_faiss(content, movie_url)
-                st.write(store_message)
-                
-                # Upload FAISS index to Storacha
-                faiss_result = upload_faiss_to_storacha()
-                
-                # Store the CID in session state for later use
-                if faiss_result and faiss_result["status"] == "success":
-                    st.session_state.faiss_cid = faiss_result["cid"]
-                    st.session_state.faiss_url = faiss_result["url"]
+            # Combined process: summarize + upload to Storacha
+            if summarize_and_upload(selected_movie) is not None:
+                # Store in FAISS, then publish the new chunks to Storacha, both in the background
+                store_in_faiss(selected_movie)
 
 # FAISS Management section
 st.subheader("FAISS Index Management")
@@ -266,7 +262,7 @@ st.subheader("FAISS Index Management")
 # Upload FAISS to Storacha
 if st.button("💾 Upload FAISS Index to Storacha"):
     faiss_result = upload_faiss_to_storacha()
-    if faiss_result and faiss_result["status"] == "success":
+    if faiss_result:
         st.session_state.faiss_cid = faiss_result["cid"]
         st.session_state.faiss_url = faiss_result["url"]
 
@@ -275,15 +271,18 @@ st.write("📥 Download FAISS Index from Storacha")
 faiss_cid = st.text_input("Enter FAISS CID:", value=st.session_state.get("faiss_cid", ""))
 
 if faiss_cid and st.button("Download and Load FAISS Index"):
-    if download_faiss_from_storacha(faiss_cid):
-        loaded_index = load_faiss_index()
-        if loaded_index is not None:
-            index = loaded_index
-            st.success("✅ FAISS index loaded successfully!")
+    load_faiss_from_storacha(faiss_cid)
 
 # Ask a question
 st.write("🤔 Ask a question about the reviews:")
 query = st.text_input("❓ Enter your question:")
+filters = None
+selected = st.session_state.get("selected_movie")
+if selected and st.checkbox(f"🎯 Only search reviews of {display_title(selected['title'])}", value=True):
+    filters = {"movie_id": str(selected["id"])}
 if query:
-    answer = retrieve_and_answer(query)
-    st.write(answer)
\ No newline at end of file
+    answer = retrieve_and_answer(query, filters=filters)
+
+show_pending_jobs()
+show_debug_panel()
+show_service_stats()
@@ -0,0 +1,247 @@
+import argparse
+import inspect
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+import metrics
+from resources import EMBEDDING_MODEL
+
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "onnx_model")
+ONNX_QUANTIZED = os.getenv("ONNX_QUANTIZED", "1") != "0"
+# 0 lets ONNX Runtime use one thread per physical core
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))
+ONNX_MAX_BATCH = int(os.getenv("ONNX_MAX_BATCH", "64"))
+ONNX_LINGER_MS = float(os.getenv("ONNX_LINGER_MS", "5"))
+
+# sentence-transformers truncates all-MiniLM-L6-v2 inputs at 256 word pieces, the same limit keeps vectors compatible
+MAX_SEQ_LENGTH = 256
+
+FP32_FILE = "model.onnx"
+INT8_FILE = "model_int8.onnx"
+# int8 vectors share the FAISS index with PyTorch ones, so every one of them has to stay at least this close to the
+# fp32 vector (the fp32 export matches PyTorch) for the int8 model to be used
+INT8_MIN_COSINE = 0.99
+
+# Review-like texts the int8 model is checked on when it loads, the last one is longer than MAX_SEQ_LENGTH
+CHECK_TEXTS = (
+    "Una película de una ambición formal poco habitual.",
+    "El guion se pierde en su segunda mitad, pero las interpretaciones sostienen el conjunto.",
+    "Almodóvar vuelve a sus obsesiones con una mirada más serena y melancólica que nunca.",
+    "Fotografía espléndida y una banda sonora que subraya cada emoción sin caer en el exceso.",
+    "Un thriller eficaz, tenso y sin concesiones, aunque previsible en su desenlace.",
+    "Aburrida.",
+    " ".join([
+        "Un drama familiar que avanza con paciencia, deteniéndose en los silencios y en los gestos mínimos de sus "
+        "personajes, hasta construir un retrato conmovedor sobre la memoria, la culpa y el paso del tiempo."
+    ] * 8),
+)
+
+def export_model(model_name=EMBEDDING_MODEL, output_dir=ONNX_MODEL_DIR, quantize=True):
+    """Export the transformer under the sentence-transformers model to ONNX, fused for ONNX Runtime's BERT kernels,
+    plus an int8 copy with dynamically quantised weights. Needs torch and transformers (installed with
+    langchain_huggingface) and onnx"""
+    import torch
+    from onnxruntime.transformers.optimizer import optimize_model
+    from transformers import AutoModel, AutoTokenizer
+
+    class HiddenStates(torch.nn.Module):
+        """The transformer with plain tensor inputs and output, which the exporter can trace"""
+
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids).last_hidden_state
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    # Eager attention exports the graph the ONNX Runtime optimizer recognises and fuses into its Attention kernel
+    transformer = AutoModel.from_pretrained(model_name, attn_implementation="eager").eval()
+    model = HiddenStates(transformer)
+    # Writes tokenizer.json, loaded by the tokenizers library at inference time
+    tokenizer.save_pretrained(output_dir)
+
+    sample = tokenizer(["Una película de una ambición formal poco habitual."], return_tensors="pt")
+    names = ["input_ids", "attention_mask", "token_type_ids"]
+    fp32_path = os.path.join(output_dir, FP32_FILE)
+    traced_path = os.path.join(output_dir, "model_traced.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in names),
+            traced_path,
+            input_names=names,
+            output_names=["last_hidden_state"],
+            dynamic_axes={name: {0: "batch", 1: "sequence"} for name in names + ["last_hidden_state"]},
+            opset_version=14,
+            # Newer torch defaults to the dynamo exporter, which needs onnxscript; the TorchScript one does not
+            **({"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {})
+        )
+
+    # Attention, GELU and layer norms fused: the fp32 vectors stay the same, CPU inference gets faster
+    config = transformer.config
+    optimize_model(traced_path, model_type="bert", num_heads=config.num_attention_heads,
+                   hidden_size=config.hidden_size).save_model_to_file(fp32_path)
+    os.remove(traced_path)
+
+    if quantize:
+        import onnx
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        # The feed-forward output projections read GELU activations with outliers that per-tensor int8
+        # activations cannot represent, they stay fp32. Per-channel weights keep the other projections close
+        feed_forward_outputs = [
+            node.name for node in onnx.load(fp32_path).graph.node
+            if node.op_type == "MatMul" and re.search(r"layer\.\d+/output/dense/MatMul$", node.name)
+        ]
+        quantize_dynamic(
+            fp32_path,
+            os.path.join(output_dir, INT8_FILE),
+            weight_type=QuantType.QInt8,
+            per_channel=True,
+            op_types_to_quantize=["MatMul", "Attention"],
+            nodes_to_exclude=feed_forward_outputs,
+            # Shape inference cannot type the outputs of the fused (com.microsoft) kernels
+            extra_options={"DefaultTensorType": onnx.TensorProto.FLOAT}
+        )
+    return output_dir
+
+class EmbeddingBatcher:
+    """Background encoder: texts submitted close together, also by concurrent callers, go through the model as one batch"""
+
+    def __init__(self, encode, max_batch_size=ONNX_MAX_BATCH, linger=ONNX_LINGER_MS / 1000):
+        self.encode = encode
+        self.max_batch_size = max_batch_size
+        self.linger = linger
+        self.items = queue.Queue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, text):
+        future = Future()
+        self.items.put((text, future))
+        return future
+
+    def embed(self, texts):
+        """Vectors of texts as a (len(texts), dimension) array, blocking until their batches ran"""
+        # Queued longest first, as sentence-transformers does, so each batch pads its texts to similar lengths
+        futures = {i: self.submit(texts[i]) for i in sorted(range(len(texts)), key=lambda i: -len(texts[i]))}
+        return np.vstack([futures[i].result() for i in range(len(texts))])
+
+    def pending(self):
+        return self.items.qsize()
+
+    def _run(self):
+        while True:
+            batch = [self.items.get()]
+            # Texts already queued join at once, then wait briefly for other callers
+            deadline = time.monotonic() + self.linger
+            try:
+                while len(batch) < self.max_batch_size:
+                    batch.append(self.items.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                pass
+
+            try:
+                vectors = self.encode([text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            metrics.inc("embedding_batches_total")
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+class OnnxEmbeddings:
+    """all-MiniLM-L6-v2 run by ONNX Runtime on the CPU (int8 weights by default), a drop-in for HuggingFaceEmbeddings.
+    Mean pooling and L2 normalisation reproduce the sentence-transformers pipeline. The int8 model is refused with
+    a ValueError unless its vectors of CHECK_TEXTS are within INT8_MIN_COSINE of the fp32 ones"""
+
+    def __init__(self, model_dir=ONNX_MODEL_DIR, quantized=ONNX_QUANTIZED, threads=ONNX_THREADS,
+                 max_batch_size=ONNX_MAX_BATCH, linger=ONNX_LINGER_MS / 1000):
+        from tokenizers import Tokenizer
+
+        path = os.path.join(model_dir, INT8_FILE if quantized else FP32_FILE)
+        self.session = self._session(path, threads)
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        self.model_path = path
+        self.quantized = quantized
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(MAX_SEQ_LENGTH)
+        # Padded to the longest text of each batch
+        self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id("[PAD]") or 0, pad_token="[PAD]")
+
+        self.check_cosine = None
+        if quantized:
+            fp32_vectors = self.encode(CHECK_TEXTS, self._session(os.path.join(model_dir, FP32_FILE), threads))
+            self.check_cosine = float((fp32_vectors * self.encode(CHECK_TEXTS)).sum(axis=1).min())
+            if self.check_cosine < INT8_MIN_COSINE:
+                raise ValueError(f"{path} is too far from the fp32 model (cosine {self.check_cosine:.4f}, needs "
+                                 f"{INT8_MIN_COSINE}), export it again or set ONNX_QUANTIZED=0")
+
+        self.batcher = EmbeddingBatcher(self.encode, max_batch_size, linger)
+
+    @staticmethod
+    def _session(path, threads):
+        import onnxruntime
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{path} not found, export the model first with: python onnx_embeddings.py "
+                                    f"--output {os.path.dirname(path) or '.'}")
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        # One graph runs at a time (the batcher), parallelism comes from the intra-op threads
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        return onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+    def encode(self, texts, session=None):
+        """Run one batch through the model (or another session of it), returns unit vectors as a float32 array"""
+        encodings = self.tokenizer.encode_batch(list(texts))
+        inputs = {
+            "input_ids": np.array([encoding.ids for encoding in encodings], dtype=np.int64),
+            "attention_mask": np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64),
+            "token_type_ids": np.array([encoding.type_ids for encoding in encodings], dtype=np.int64)
+        }
+        hidden = (session or self.session).run(None, {name: value for name, value in inputs.items() if name in self.input_names})[0]
+
+        mask = inputs["attention_mask"][:, :, None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return (pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)).astype(np.float32)
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        return self.batcher.embed(texts).tolist()
+
+    def embed_query(self, text):
+        return self.batcher.embed([text])[0].tolist()
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the embedding model to ONNX (fp32 and int8) for EMBEDDING_BACKEND=onnx")
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--output", default=ONNX_MODEL_DIR, help="Directory for the ONNX files and tokenizer")
+    parser.add_argument("--no-quantize", dest="quantize", action="store_false", help="Only write the fp32 model")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    export_model(args.model, args.output, args.quantize)
+    sizes = ", ".join(
+        f"{name} {os.path.getsize(os.path.join(args.output, name)) / (1024 * 1024):.1f} MB"
+        for name in (FP32_FILE, INT8_FILE) if os.path.exists(os.path.join(args.output, name))
+    )
+    print(f"✅ Exported {args.model} to {args.output} in {time.perf_counter() - start:.1f}s ({sizes})")
+    if args.quantize:
+        try:
+            cosine = OnnxEmbeddings(args.output, quantized=True).check_cosine
+            print(f"✅ int8 model within cosine {cosine:.4f} of fp32 (needs {INT8_MIN_COSINE})")
+        except ValueError as e:
+            print(f"❌ {e}")
+
+if __name__ == "__main__":
+    main()
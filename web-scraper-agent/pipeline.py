@@ -0,0 +1,185 @@
+import time
+import numpy as np
+import metrics
+from chunking import split_into_chunks
+from index_factory import read_index
+from ipfs_download import ContentNotFound, download
+from llm_cache import SUMMARY_PROMPT_VERSION, ANSWER_PROMPT_VERSION
+from llm_streaming import StreamStats, stream_with_metrics
+from qa import NO_CONTEXT_ANSWER, answer_many, answer_prompt
+from review_scraper import fetch_reviews, reviews_url
+from resources import (
+    STARTUP_TIMINGS, get_embeddings, get_filmaffinity, get_llm, get_llm_cache, get_publisher, get_retriever,
+    get_storacha, get_store, get_summarizer
+)
+
+# Scrape → summarise → index → answer, without any UI: shared by the API service and the CLIs
+
+# Name of the index file inside the directory a whole-index upload was wrapped in
+INDEX_FILENAME = "faiss_index.idx"
+
+class NoReviews(Exception):
+    """The movie has no reviews to summarise or index"""
+
+def search_movies(title):
+    with metrics.span("filmaffinity_search"):
+        return get_filmaffinity().search(title=title)
+
+def scrape_reviews(movie_id):
+    """Reviews page URL and newline separated review text, raising FetchError or NoReviews"""
+    url = reviews_url(movie_id)
+    with metrics.span("scrape_reviews"):
+        reviews = fetch_reviews(url)
+    if not reviews:
+        raise NoReviews(f"No reviews found for movie {movie_id}")
+    content = "\n".join(reviews)
+
+    # Drop cached summaries and answers for this movie if its reviews changed
+    get_llm_cache().track_content(movie_id, content)
+    return url, content
+
+def ingest(movie_id, movie=None):
+    """Scrape a movie's reviews and replace its chunks in the FAISS index.
+    movie (title, year, country) is stored so questions can be filtered by it"""
+    url, content = scrape_reviews(movie_id)
+    store = get_store()
+    if movie:
+        store.set_movie(movie_id, movie.get("title"), movie.get("year"), movie.get("country"))
+
+    with metrics.span("split_chunks"):
+        chunks = split_into_chunks(content, url, movie_id)
+    with metrics.span("embed_documents"):
+        vectors = np.array(get_embeddings().embed_documents([chunk["text"] for chunk in chunks]), dtype=np.float32)
+    metrics.inc("chunks_embedded_total", len(chunks))
+
+    # Held across the three steps so concurrent ingests never save a half replaced movie
+    with metrics.span("faiss_store"), store.lock:
+        store.remove_url(url)
+        store.add_chunks(chunks, vectors)
+        store.save()
+
+    return {"movie_id": movie_id, "url": url, "reviews": content.count("\n") + 1, "chunks": len(chunks)}
+
+def cached_stream(key, make_stream, movie_ids, stats=None):
+    """(cache hit, iterator of text): the cached result in one piece, or the model's tokens, cached once complete"""
+    llm_cache = get_llm_cache()
+    cached = llm_cache.get(key)
+    if cached is not None:
+        return True, iter([cached])
+
+    # Tokens may be pulled from other threads, the spans go to the trace of the caller
+    trace = metrics.current_trace()
+    stats = stats or StreamStats(get_llm().model)
+
+    def stream():
+        parts = []
+        for token in stream_with_metrics(make_stream(), stats):
+            parts.append(token)
+            yield token
+        llm_cache.put(key, "".join(parts), movie_ids)
+        if stats.time_to_first_token is not None:
+            metrics.record("llm_first_token", stats.time_to_first_token, stats.started, trace)
+        metrics.record("llm_stream", stats.total_seconds, stats.started, trace)
+        metrics.inc("llm_tokens_total", stats.tokens)
+
+    return False, stream()
+
+def summary_key(content):
+    return get_llm_cache().make_key(get_llm().model, SUMMARY_PROMPT_VERSION, content)
+
+def summarize(movie_id, content):
+    with metrics.span("summarize"):
+        return get_llm_cache().get_or_compute(summary_key(content), lambda: get_summarizer().summarize(content), [movie_id])
+
+def summarize_stream(movie_id, content, stats=None):
+    return cached_stream(summary_key(content), lambda: get_summarizer().summarize_stream(content), [movie_id], stats)
+
+def _storacha():
+    storacha = get_storacha()
+    # Configure if it is the first time
+    if not storacha.ready and not storacha.setup():
+        raise RuntimeError("Error configuring Storacha")
+    return storacha
+
+def upload_summary(summary, title):
+    """Queue a summary for upload to Storacha, returns a Future of the upload result"""
+    return _storacha().enqueue_text(summary, title)
+
+def publish_async():
+    """Publish the chunks changed since the last snapshot in the background, returns a Future of the result"""
+    _storacha()
+    return get_publisher().publish_async()
+
+def publish():
+    _storacha()
+    with metrics.span("publish_snapshot"):
+        return get_publisher().publish()
+
+def _answer_prompt(query, filters, k):
+    # Dense (FAISS) and keyword (BM25) matches fused by rank, optionally reranked,
+    # restricted to chunks matching filters (movie_id, year, country, url) when given
+    timings = {}
+    start = time.perf_counter()
+    with metrics.span("retrieve"):
+        chunks = get_retriever().retrieve(query, k=k, timings=timings, filters=filters)
+    # The retriever's stages run one after the other, in the order they were timed
+    for stage, seconds in timings.items():
+        metrics.record(f"retrieve_{stage}", seconds, start)
+        start += seconds
+    prompt = answer_prompt(query, chunks)
+    key = get_llm_cache().make_key(get_llm().model, ANSWER_PROMPT_VERSION, prompt) if prompt else None
+    return chunks, prompt, key
+
+def ask(query, filters=None, k=None):
+    chunks, prompt, key = _answer_prompt(query, filters, k)
+    if prompt is None:
+        return {"query": query, "answer": NO_CONTEXT_ANSWER, "chunks": []}
+    llm = get_llm()
+
+    def invoke():
+        with metrics.span("llm_invoke"):
+            return llm.invoke(prompt)
+
+    answer = get_llm_cache().get_or_compute(key, invoke, [chunk["movie_id"] for chunk in chunks])
+    return {"query": query, "answer": answer, "chunks": chunks}
+
+def ask_stream(query, filters=None, k=None, stats=None):
+    """(chunks, cache hit, iterator of answer text)"""
+    chunks, prompt, key = _answer_prompt(query, filters, k)
+    if prompt is None:
+        return [], True, iter([NO_CONTEXT_ANSWER])
+    llm = get_llm()
+    hit, stream = cached_stream(key, lambda: llm.stream(prompt), [chunk["movie_id"] for chunk in chunks], stats)
+    return chunks, hit, stream
+
+def ask_many(queries, filters=None, k=None, max_workers=4):
+    with metrics.span("ask_many"):
+        return answer_many(get_llm(), get_llm_cache(), get_retriever(), queries, filters, max_workers, k)
+
+def load_index(cid, filename=INDEX_FILENAME):
+    """Load a published snapshot (manifest of index segments), or a whole index file uploaded before snapshots existed
+    (the file named filename in the directory the upload was wrapped in)"""
+    try:
+        with metrics.span("load_snapshot"):
+            return {"cid": cid, "snapshot": True, "chunks": get_publisher().load(cid)}
+    except ContentNotFound:
+        pass
+
+    # Streamed to disk, checked against the CID and memory-mapped (FAISS_MMAP) from the download cache
+    with metrics.span("download_index"):
+        path = download(cid, filename=filename)
+    store = get_store()
+    index = read_index(path, mmap=store.mmap)
+    # Only swapped in under the store lock once its chunks are known to be in the sidecar
+    return {"cid": cid, "snapshot": False, "chunks": store.replace_index(index, path if store.mmap else None)}
+
+def stats():
+    """Cold start costs and cache counters, without building resources that were never requested"""
+    from http_client import get_http_client
+    result = {"startup": dict(STARTUP_TIMINGS), "http_cache": dict(get_http_client().cache_stats)}
+    if "llm_cache" in STARTUP_TIMINGS:
+        result["llm_cache"] = get_llm_cache().stats()
+    if "faiss_store" in STARTUP_TIMINGS:
+        result["chunks"] = len(get_store())
+    result["latency"] = metrics.REGISTRY.snapshot()["latency"]
+    return result
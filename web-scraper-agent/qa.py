@@ -0,0 +1,32 @@
+from concurrent.futures import ThreadPoolExecutor
+from llm_cache import ANSWER_PROMPT_VERSION
+
+ANSWER_PROMPT = "Based on the following context, answer the question:\n\n{context}\n\nQuestion: {query}\nAnswer:"
+NO_CONTEXT_ANSWER = "🤖 No relevant information found."
+
+def answer_prompt(query, chunks):
+    """Prompt for a question over retrieved chunks, None when nothing was found"""
+    context = "\n\n".join(chunk["text"] for chunk in chunks)
+    if not context:
+        return None
+    return ANSWER_PROMPT.format(context=context, query=query)
+
+def answer_many(llm, llm_cache, retriever, queries, filters=None, max_workers=4, k=None):
+    """Answer many questions: batched retrieval, then LLM calls fanned out over a bounded pool
+    (cached answers skip the model). Returns one dict per question with its answer and chunks"""
+    contexts = retriever.retrieve_batch(queries, k=k, filters=filters)
+
+    def answer(query, chunks):
+        prompt = answer_prompt(query, chunks)
+        if prompt is None:
+            return NO_CONTEXT_ANSWER
+        key = llm_cache.make_key(llm.model, ANSWER_PROMPT_VERSION, prompt)
+        return llm_cache.get_or_compute(key, lambda: llm.invoke(prompt), [chunk["movie_id"] for chunk in chunks])
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        answers = list(pool.map(answer, queries, contexts))
+
+    return [
+        {"query": query, "answer": text, "chunks": chunks}
+        for query, text, chunks in zip(queries, answers, contexts)
+    ]
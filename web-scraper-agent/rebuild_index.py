@@ -0,0 +1,36 @@
+import argparse
+from faiss_store import FaissDocumentStore
+from index_factory import INDEX_KINDS, bytes_per_vector, index_kind
+
+# Rebuild (or migrate) an existing faiss_index.idx as another index kind, keeping chunk ids and metadata
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the FAISS index as another kind")
+    parser.add_argument("--index", default="faiss_index.idx", help="Path to the FAISS index")
+    parser.add_argument("--kind", choices=list(INDEX_KINDS), required=True, help="Target index kind")
+    parser.add_argument("--nlist", type=int, help="IVF: number of inverted lists")
+    parser.add_argument("--pq-m", type=int, help="IVF-PQ: number of sub-quantizers")
+    parser.add_argument("--pq-bits", type=int, help="IVF-PQ: bits per sub-quantizer code")
+    parser.add_argument("--hnsw-m", type=int, help="HNSW: neighbours per node")
+    parser.add_argument("--ef-construction", type=int, help="HNSW: build-time beam width")
+    parser.add_argument("--pca-dim", type=int, help="Scalar quantizers: reduce vectors to this many dimensions first")
+    args = parser.parse_args()
+
+    store = FaissDocumentStore(args.index)
+    if not store.load():
+        raise SystemExit(f"❌ {args.index} is missing or has no chunk ids to migrate")
+
+    params = {
+        "nlist": args.nlist,
+        "pq_m": args.pq_m,
+        "pq_bits": args.pq_bits,
+        "hnsw_m": args.hnsw_m,
+        "ef_construction": args.ef_construction,
+        "pca_dim": args.pca_dim
+    }
+    source_kind = index_kind(store.index)
+    store.rebuild(args.kind, **{key: value for key, value in params.items() if value is not None})
+    store.save()
+    print(f"✅ Rebuilt {args.index}: {source_kind} -> {args.kind} ({len(store)} vectors, {bytes_per_vector(store.index)} bytes each)")
+
+if __name__ == "__main__":
+    main()
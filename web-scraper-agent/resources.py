@@ -0,0 +1,149 @@
+import os
+import threading
+import time
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+LLM_MODEL = os.getenv("OLLAMA_MODEL", "stablelm2")  # Change to "mistral" or another model if necessary
+
+# Seconds spent building each resource the first time it was requested in this process
+STARTUP_TIMINGS = {}
+
+# Resources built so far, shared by every Streamlit session and by the API service workers
+_RESOURCES = {}
+_RESOURCES_LOCK = threading.RLock()
+
+def _timed(name, build):
+    # Reentrant lock: some builders ask for other resources, concurrent first requests build only once
+    with _RESOURCES_LOCK:
+        if name not in _RESOURCES:
+            start = time.perf_counter()
+            _RESOURCES[name] = build()
+            STARTUP_TIMINGS[name] = time.perf_counter() - start
+        return _RESOURCES[name]
+
+# Builders, usable outside Streamlit (e.g. by the bulk ingestion CLI)
+def build_llm():
+    from langchain_ollama import OllamaLLM
+    return OllamaLLM(model=LLM_MODEL)
+
+def build_embeddings(batch_size=32):
+    """Embeddings behind a disk cache so repeated chunks and questions skip the model. EMBEDDING_BACKEND=onnx runs
+    the exported (int8) model with ONNX Runtime instead of PyTorch, batched by ONNX_MAX_BATCH rather than batch_size"""
+    from embedding_cache import EmbeddingCache, CachedEmbeddings
+    if os.getenv("EMBEDDING_BACKEND", "huggingface") == "onnx":
+        from onnx_embeddings import OnnxEmbeddings
+        embeddings = OnnxEmbeddings()
+        # Vectors of the int8 model only approximate the PyTorch ones, so they are cached apart
+        model_name = f"{EMBEDDING_MODEL}:onnx{'-int8' if embeddings.quantized else ''}"
+    else:
+        from langchain_huggingface import HuggingFaceEmbeddings
+        embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL, encode_kwargs={"batch_size": batch_size})
+        model_name = EMBEDDING_MODEL
+    return CachedEmbeddings(
+        embeddings,
+        EmbeddingCache("embedding_cache", dimension=384, max_entries=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))),
+        model_name
+    )
+
+def build_store(index_path="faiss_index.idx"):
+    """Chunk-level FAISS index + SQLite metadata sidecar, loaded from disk when present"""
+    from faiss_store import FaissDocumentStore
+    # FAISS_INDEX_KIND picks the ANN backend (flat, ivf_flat, ivf_pq, hnsw) or compact storage (sq_fp16, sq_int8, sq_4bit),
+    # the other knobs trade recall for latency or memory
+    store = FaissDocumentStore(
+        index_path,
+        dimension=384, # Vector dimension for MiniLM
+        index_kind=os.getenv("FAISS_INDEX_KIND", "flat"),
+        index_params={"pca_dim": int(os.getenv("FAISS_PCA_DIM", "0"))},
+        nprobe=int(os.getenv("FAISS_NPROBE", "16")),
+        ef_search=int(os.getenv("FAISS_EF_SEARCH", "64")),
+        mmap=os.getenv("FAISS_MMAP", "1") != "0"
+    )
+    store.load()
+    return store
+
+def build_retriever(store, embeddings):
+    """Hybrid dense + BM25 retriever, with a cross-encoder reranking stage when RERANKER_MODEL is set"""
+    from hybrid_retriever import CrossEncoderReranker, HybridRetriever
+    reranker_model = os.getenv("RERANKER_MODEL", "")
+    return HybridRetriever(
+        store,
+        embeddings,
+        k=int(os.getenv("RETRIEVAL_K", "4")),
+        candidates=int(os.getenv("RETRIEVAL_CANDIDATES", "20")),
+        dense_weight=float(os.getenv("RETRIEVAL_DENSE_WEIGHT", "1.0")),
+        sparse_weight=float(os.getenv("RETRIEVAL_SPARSE_WEIGHT", "1.0")),
+        reranker=CrossEncoderReranker(reranker_model) if reranker_model else None
+    )
+
+def build_llm_cache():
+    from llm_cache import LLMCache
+    return LLMCache(
+        "llm_cache.db",
+        ttl=int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600))),
+        max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+    )
+
+def build_summarizer(llm):
+    from summarizer import MapReduceSummarizer
+    return MapReduceSummarizer(
+        llm,
+        chunk_tokens=int(os.getenv("SUMMARY_CHUNK_TOKENS", "1500")),
+        token_budget=int(os.getenv("SUMMARY_TOKEN_BUDGET", "12000")),
+        max_workers=int(os.getenv("SUMMARY_WORKERS", "4"))
+    )
+
+# Process-wide singletons kept across Streamlit reruns and API requests, built on first use
+def get_storacha():
+    from storacha_utils import StorachaClient
+    return _timed("storacha", StorachaClient)
+
+def get_publisher():
+    from index_snapshots import SnapshotPublisher
+    return _timed("publisher", lambda: SnapshotPublisher(get_store(), get_storacha()))
+
+def get_filmaffinity():
+    from review_scraper import filmaffinity_client
+    return _timed("filmaffinity", filmaffinity_client)
+
+def get_llm():
+    return _timed("llm", build_llm)
+
+def get_embeddings():
+    return _timed("embeddings", build_embeddings)
+
+def get_store():
+    return _timed("faiss_store", build_store)
+
+def get_retriever():
+    return _timed("retriever", lambda: build_retriever(get_store(), get_embeddings()))
+
+def get_llm_cache():
+    return _timed("llm_cache", build_llm_cache)
+
+def get_summarizer():
+    return _timed("summarizer", lambda: build_summarizer(get_llm()))
+
+def provide(name, resource):
+    """Use an already built resource instead of building it (e.g. stub models in the offline benchmarks)"""
+    with _RESOURCES_LOCK:
+        _RESOURCES[name] = resource
+
+def release_resources():
+    """Drop every cached resource (e.g. after changing models), the next request rebuilds them"""
+    with _RESOURCES_LOCK:
+        if "faiss_store" in _RESOURCES:
+            _RESOURCES["faiss_store"].save()
+        _RESOURCES.clear()
+        STARTUP_TIMINGS.clear()
+
+def show_resource_timings(rerun_started):
+    """Sidebar breakdown of cold start costs and of the current rerun"""
+    import streamlit as st
+    st.sidebar.subheader("🚀 Startup")
+    for name, seconds in STARTUP_TIMINGS.items():
+        st.sidebar.write(f"{name}: {seconds:.2f}s")
+    st.sidebar.caption(f"This rerun: {time.perf_counter() - rerun_started:.3f}s")
+    if st.sidebar.button("♻️ Reload models"):
+        release_resources()
+        st.rerun()
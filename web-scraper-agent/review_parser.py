@@ -0,0 +1,124 @@
+from bs4 import BeautifulSoup
+
+# Optional fast parsers, BeautifulSoup is used when neither is installed
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:
+    try:
+        from selectolax.parser import HTMLParser
+    except ImportError:
+        HTMLParser = None
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+RATINGS = {"pos": "positive", "neu": "neutral", "neg": "negative"}
+
+def available_engines():
+    """Parser engines usable in this environment, fastest first"""
+    engines = []
+    if HTMLParser is not None:
+        engines.append("selectolax")
+    if lxml is not None:
+        engines.append("lxml")
+    engines.append("bs4")
+    return engines
+
+def review_table(html):
+    """Cut the page down to the table holding the reviews so the rest of the DOM is never built"""
+    first = html.find("rev-text")
+    if first == -1:
+        return None
+    start = html.rfind("<table", 0, first)
+    end = html.find("</table>", html.rfind("rev-text"))
+    if start == -1 or end == -1:
+        return None
+    return html[start:end + len("</table>")]
+
+def _rating(classes, title):
+    for name in classes.split():
+        if name in RATINGS:
+            return RATINGS[name]
+    return title.lower() if title else None
+
+def _clean(text):
+    return " ".join(text.split()) if text else None
+
+def _parse_selectolax(html):
+    reviews = []
+    for cell in HTMLParser(html).css("td.rev-text"):
+        link = cell.css_first("a")
+        if link is None:
+            continue
+        row = cell.parent
+        author = row.css_first(".author") if row else None
+        source = row.css_first(".source") if row else None
+        rating = row.css_first(".rev-eval i") if row else None
+        reviews.append({
+            "text": _clean(link.text()),
+            "url": link.attributes.get("href"),
+            "critic": _clean(author.text()) if author else None,
+            "outlet": _clean(source.text()) if source else None,
+            "rating": _rating(rating.attributes.get("class") or "", rating.attributes.get("title") or "") if rating else None
+        })
+    return reviews
+
+def _parse_lxml(html):
+    reviews = []
+    root = lxml.html.fromstring(html)
+    for cell in root.xpath('//td[contains(concat(" ", normalize-space(@class), " "), " rev-text ")]'):
+        links = cell.xpath(".//a")
+        if not links:
+            continue
+        row = cell.getparent()
+        author = row.xpath('.//*[contains(concat(" ", normalize-space(@class), " "), " author ")]')
+        source = row.xpath('.//*[contains(concat(" ", normalize-space(@class), " "), " source ")]')
+        rating = row.xpath('.//td[contains(@class, "rev-eval")]//i')
+        reviews.append({
+            "text": _clean(links[0].text_content()),
+            "url": links[0].get("href"),
+            "critic": _clean(author[0].text_content()) if author else None,
+            "outlet": _clean(source[0].text_content()) if source else None,
+            "rating": _rating(rating[0].get("class", ""), rating[0].get("title", "")) if rating else None
+        })
+    return reviews
+
+def _parse_bs4(html):
+    reviews = []
+    soup = BeautifulSoup(html, "html.parser")
+    for cell in soup.find_all("td", class_="rev-text"):
+        if not cell.a:
+            continue
+        row = cell.parent
+        author = row.find(class_="author") if row else None
+        source = row.find(class_="source") if row else None
+        rating_cell = row.find("td", class_="rev-eval") if row else None
+        rating = rating_cell.find("i") if rating_cell else None
+        reviews.append({
+            "text": _clean(cell.a.get_text()),
+            "url": cell.a.get("href"),
+            "critic": _clean(author.get_text()) if author else None,
+            "outlet": _clean(source.get_text()) if source else None,
+            "rating": _rating(" ".join(rating.get("class", [])), rating.get("title", "")) if rating else None
+        })
+    return reviews
+
+PARSERS = {"selectolax": _parse_selectolax, "lxml": _parse_lxml, "bs4": _parse_bs4}
+
+def parse_reviews(html, engine=None):
+    """Extract reviews (text, url, critic, outlet, rating) from a pro-reviews page"""
+    engine = engine or available_engines()[0]
+
+    if engine != "bs4":
+        # Fast path: parse only the review table, fall back to the full page if it cannot be isolated
+        fragment = review_table(html)
+        try:
+            reviews = PARSERS[engine](fragment or html)
+        except Exception:
+            reviews = []
+        if reviews:
+            return reviews
+
+    return _parse_bs4(html)
@@ -0,0 +1,34 @@
+import os
+import python_filmaffinity
+from http_client import get_http_client
+from review_parser import parse_reviews
+
+# Point FILMAFFINITY_BASE_URL at fixture_server.py to scrape offline
+BASE_URL = os.getenv("FILMAFFINITY_BASE_URL", "https://www.filmaffinity.com").rstrip("/")
+REVIEWS_URL = BASE_URL + "/es/pro-reviews.php?movie-id={movie_id}"
+
+class FetchError(Exception):
+    """Raised when a FilmAffinity page cannot be downloaded"""
+
+def reviews_url(movie_id):
+    """FilmAffinity professional reviews page for a movie"""
+    return REVIEWS_URL.format(movie_id=movie_id)
+
+def filmaffinity_client():
+    """FilmAffinity search client whose requests go through the shared HTTP cache"""
+    fa = python_filmaffinity.FilmAffinity()
+    fa.session = get_http_client().session
+    return fa
+
+def fetch_review_details(url, client=None):
+    """Download a reviews page and return each review with its critic, outlet and rating"""
+    response = (client or get_http_client()).get(url)
+
+    if response.status_code != 200:
+        raise FetchError(f"Failed to fetch {url}: HTTP {response.status_code}")
+
+    return parse_reviews(response.text)
+
+def fetch_reviews(url, client=None):
+    """Download a reviews page and return the text of each review, raising on HTTP errors"""
+    return [review["text"] for review in fetch_review_details(url, client) if review["text"]]
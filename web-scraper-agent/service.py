@@ -0,0 +1,240 @@
+import os
+from concurrent.futures import Future
+from fastapi import FastAPI, HTTPException
+from fastapi import Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+import metrics
+import pipeline
+from jobs import JobQueue, QueueFull
+from resources import LLM_MODEL, release_resources
+from review_scraper import FetchError
+
+SERVICE_HOST = os.getenv("SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.getenv("SERVICE_PORT", "8000"))
+
+# Scrapes, summaries and index loads run on a bounded pool, further requests wait in the queue up to a limit
+jobs = JobQueue(
+    max_workers=int(os.getenv("SERVICE_WORKERS", "2")),
+    max_pending=int(os.getenv("SERVICE_MAX_PENDING", "64"))
+)
+
+app = FastAPI(title="CineAI-Agents", description="Scrape, summarise and ask questions about FilmAffinity reviews")
+
+class Movie(BaseModel):
+    title: str | None = None
+    year: int | str | None = None
+    country: str | None = None
+
+class Filters(BaseModel):
+    movie_id: str | None = None
+    year: int | str | None = None
+    country: str | None = None
+    url: str | None = None
+    k: int | None = None
+
+    def filters(self):
+        fields = self.model_dump(include={"movie_id", "year", "country", "url"})
+        return {name: value for name, value in fields.items() if value is not None} or None
+
+class Question(Filters):
+    query: str
+    stream: bool = False
+
+class Questions(Filters):
+    queries: list[str]
+
+class Snapshot(BaseModel):
+    cid: str
+    # Only used for whole-index uploads made before snapshots existed
+    filename: str = pipeline.INDEX_FILENAME
+
+def _submit(kind, key, fn):
+    try:
+        return jobs.submit(kind, key, fn).as_dict()
+    except QueueFull as e:
+        raise HTTPException(503, str(e))
+
+async def _scrape(movie_id):
+    try:
+        return await run_in_threadpool(pipeline.scrape_reviews, movie_id)
+    except pipeline.NoReviews as e:
+        raise HTTPException(404, str(e))
+    except FetchError as e:
+        raise HTTPException(502, str(e))
+
+def _follow(result, kind, start):
+    """Track the background upload started by start() as its own job, recording its id (or why it could not start) in result"""
+    try:
+        result[f"{kind}_job"] = jobs.track(kind, start()).id
+    except Exception as e:
+        result[f"{kind}_error"] = str(e)
+    return result
+
+def _complete_with(job_future, start):
+    """Complete job_future with the result of the Future returned by start()"""
+    def copy(done):
+        try:
+            job_future.set_result(done.result())
+        except Exception as e:
+            job_future.set_exception(e)
+    try:
+        start().add_done_callback(copy)
+    except Exception as e:
+        job_future.set_exception(e)
+
+def _stream(tokens, on_complete=None, on_abort=None):
+    """Text response that calls on_complete with the whole text once every token was sent"""
+    def body():
+        parts = []
+        try:
+            for token in tokens:
+                parts.append(token)
+                yield token
+        except BaseException:
+            if on_abort:
+                on_abort()
+            raise
+        if on_complete:
+            on_complete("".join(parts))
+    return body()
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Collect the spans of each request into a trace (id in the X-Trace-Id header) and time it per route.
+    Streamed responses are timed until their last chunk is sent"""
+    trace = metrics.REGISTRY.start_trace(f"{request.method} {request.url.path}")
+    with metrics.use_trace(trace):
+        response = await call_next(request)
+
+    # Routes (e.g. /jobs/{job_id}) rather than paths, so job ids do not become label values
+    route = request.scope.get("route")
+    path = route.path if route else "unmatched"
+    trace.name = f"{request.method} {path}"
+    response.headers["X-Trace-Id"] = trace.id
+
+    def finished():
+        trace.finish()
+        metrics.REGISTRY.observe("request_seconds", trace.seconds, method=request.method, route=path)
+        metrics.inc("requests_total", method=request.method, route=path, status=response.status_code)
+
+    body = response.body_iterator
+
+    async def timed_body():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            finished()
+
+    response.body_iterator = timed_body()
+    return response
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "model": LLM_MODEL, "jobs": jobs.stats()}
+
+@app.get("/search")
+async def search(title: str):
+    return {"movies": await run_in_threadpool(pipeline.search_movies, title)}
+
+@app.post("/ingest/{movie_id}", status_code=202)
+async def ingest(movie_id: str, movie: Movie | None = None):
+    """Scrape and index a movie in the background, concurrent requests for the same movie share one job"""
+    def run():
+        result = pipeline.ingest(movie_id, movie.model_dump() if movie else None)
+        # The changed chunks are published as a new snapshot segment, followed as its own job
+        return _follow(result, "publish", pipeline.publish_async)
+
+    return _submit("ingest", f"ingest:{movie_id}", run)
+
+@app.post("/summary/{movie_id}", status_code=202)
+async def summary(movie_id: str, movie: Movie | None = None, stream: bool = False):
+    """Summarise a movie's reviews and upload the summary to Storacha.
+    Runs as a job, or with ?stream=true returns the summary as it is generated"""
+    title = movie.title if movie and movie.title else str(movie_id)
+
+    if not stream:
+        def run():
+            _, content = pipeline.scrape_reviews(movie_id)
+            text = pipeline.summarize(movie_id, content)
+            return _follow({"movie_id": movie_id, "summary": text}, "upload", lambda: pipeline.upload_summary(text, title))
+
+        return _submit("summary", f"summary:{movie_id}", run)
+
+    _, content = await _scrape(movie_id)
+    hit, tokens = await run_in_threadpool(pipeline.summarize_stream, movie_id, content)
+
+    # The upload job exists before the summary does, so its id can be sent in the headers
+    upload = Future()
+    upload_job = jobs.track("upload", upload)
+    body = _stream(
+        tokens,
+        on_complete=lambda text: _complete_with(upload, lambda: pipeline.upload_summary(text, title)),
+        on_abort=lambda: upload.set_exception(RuntimeError("Summary stream interrupted"))
+    )
+    headers = {"X-Cache": "hit" if hit else "miss", "X-Upload-Job": upload_job.id}
+    return StreamingResponse(body, media_type="text/plain; charset=utf-8", headers=headers)
+
+@app.post("/ask")
+async def ask(question: Question):
+    """Answer a question from the indexed reviews, restricted to movie_id, year, country or url when given"""
+    if not question.stream:
+        return await run_in_threadpool(pipeline.ask, question.query, question.filters(), question.k)
+
+    chunks, hit, tokens = await run_in_threadpool(pipeline.ask_stream, question.query, question.filters(), question.k)
+    headers = {"X-Cache": "hit" if hit else "miss", "X-Chunks": ",".join(str(chunk["id"]) for chunk in chunks)}
+    return StreamingResponse(_stream(tokens), media_type="text/plain; charset=utf-8", headers=headers)
+
+@app.post("/ask/batch")
+async def ask_batch(questions: Questions):
+    return {"answers": await run_in_threadpool(pipeline.ask_many, questions.queries, questions.filters(), questions.k)}
+
+@app.get("/jobs/{job_id}")
+async def job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(404, f"Unknown job {job_id}")
+    return job.as_dict()
+
+@app.post("/index/publish", status_code=202)
+async def publish():
+    """Upload the changes since the last snapshot, returns a job whose result holds the manifest CID"""
+    return _submit("publish", "publish", pipeline.publish)
+
+@app.post("/index/load", status_code=202)
+async def load(snapshot: Snapshot):
+    return _submit("load", f"load:{snapshot.cid}/{snapshot.filename}", lambda: pipeline.load_index(snapshot.cid, snapshot.filename))
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Counters and latency histograms in the Prometheus text format"""
+    return PlainTextResponse(metrics.REGISTRY.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/traces/{trace_id}")
+async def trace(trace_id: str):
+    """Per-stage breakdown of a request or job (ids from X-Trace-Id or the job's trace_id)"""
+    trace = metrics.REGISTRY.get_trace(trace_id)
+    if trace is None:
+        raise HTTPException(404, f"Unknown trace {trace_id}")
+    return trace.as_dict()
+
+@app.get("/stats")
+async def stats():
+    return {**await run_in_threadpool(pipeline.stats), "jobs": jobs.stats()}
+
+@app.post("/reload")
+async def reload():
+    """Drop every loaded model and index, the next request rebuilds them. Refused while jobs may be using them"""
+    if not await run_in_threadpool(jobs.run_when_idle, release_resources):
+        raise HTTPException(409, "Jobs are queued or running, reload once they have finished")
+    return {"status": "ok"}
+
+def main():
+    import uvicorn
+    # A single process: the models, FAISS index and job queue are shared by every request
+    uvicorn.run(app, host=SERVICE_HOST, port=SERVICE_PORT)
+
+if __name__ == "__main__":
+    main()
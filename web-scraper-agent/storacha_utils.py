@@ -1,3 +1,4 @@
+import contextvars
 import os
 import subprocess
 import requests
@@ -6,25 +7,61 @@ from datetime import datetime, timedelta
 import shutil
 import uuid
 import tempfile
+import threading
+import time
+import queue
+from concurrent.futures import Future, ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+import car_utils
+import metrics
+
+# Bridge tokens are cached here (per space) until shortly before they expire
+TOKEN_CACHE_PATH = os.getenv("STORACHA_TOKEN_CACHE", "storacha_tokens.json")
+TOKEN_LIFETIME = timedelta(hours=24)
+TOKEN_REFRESH_MARGIN = int(os.getenv("STORACHA_TOKEN_REFRESH_MARGIN", "3600"))  # seconds before expiry
 
 class StorachaClient:
-    def __init__(self, space_did="did:key:z6MkpdA1czti9srpmB63VxmdKT3iwE1Ty75JsBNSbPfwhV36"):
+    def __init__(self, space_did="did:key:z6MkpdA1czti9srpmB63VxmdKT3iwE1Ty75JsBNSbPfwhV36", native_car=None,
+                 api_url=None, auth_headers=None, max_parallel_puts=None, pool_size=8,
+                 token_cache_path=TOKEN_CACHE_PATH, refresh_margin=TOKEN_REFRESH_MARGIN):
         self.ready = False
-        self.api_url = "https://up.storacha.network/bridge"
+        # CARs are packed in-process (checked by benchmarks/car_reference.py), STORACHA_NATIVE_CAR=0 packs them
+        # with the ipfs-car CLI
+        if native_car is None:
+            native_car = os.getenv("STORACHA_NATIVE_CAR", "1") != "0"
+        self.native_car = native_car
+        # STORACHA_BRIDGE_URL points the client at another bridge, e.g. mock_bridge.py
+        self.api_url = api_url or os.getenv("STORACHA_BRIDGE_URL", "https://up.storacha.network/bridge")
         self.space_did = space_did
-        self.auth_headers = None
+        self.auth_headers = auth_headers
+        self.auth_expires_at = None
+        self.token_cache_path = token_cache_path
+        self.refresh_margin = refresh_margin
+        self.refresh_timer = None
+        self.max_parallel_puts = max_parallel_puts or int(os.getenv("STORACHA_PARALLEL_PUTS", "4"))
+        self.upload_queue = None
+        self.lock = threading.Lock()
+
+        # Keep-alive connections shared by bridge calls and CAR PUTs
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
         
         # Configure executable paths
         self.w3_path = self._find_executable('w3')
         self.ipfs_car_path = self._find_executable('ipfs-car')
         
-        if not self.w3_path:
+        if not self.w3_path and auth_headers is None:
             raise Exception("w3 CLI not found. Install with: npm install -g @web3-storage/w3cli")
-        if not self.ipfs_car_path:
+        if not self.ipfs_car_path and not self.native_car:
             raise Exception("ipfs-car not found. Install with: npm install -g ipfs-car")
 
-        # Generate authentication headers
-        self._generate_auth_headers()
+        # Reuse cached authentication headers, running the w3 CLI only when they are missing or about to expire
+        if auth_headers is None:
+            if not self._load_cached_headers():
+                self._generate_auth_headers()
+            self._schedule_refresh()
         self.ready = True
 
     def _find_executable(self, name):
@@ -39,7 +76,7 @@ class StorachaClient:
     def _generate_auth_headers(self):
         """Generate authentication headers for HTTP Bridge"""
         try:
-            expiration = int((datetime.now() + timedelta(hours=24)).timestamp())
+            expiration = int((datetime.now() + TOKEN_LIFETIME).timestamp())
             
             cmd = [
                 self.w3_path,
@@ -51,13 +88,15 @@ class StorachaClient:
                 "--expiration", str(expiration)
             ]
             
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                shell=True,
-                check=True
-            )
+            # A shell is only needed to run the .cmd shims on Windows
+            with metrics.span("storacha_auth"):
+                result = subprocess.run(
+                    cmd,
+                    capture_output=True,
+                    text=True,
+                    shell=os.name == "nt",
+                    check=True
+                )
             
             headers = {}
             for line in result.stdout.splitlines():
@@ -70,291 +109,303 @@ class StorachaClient:
                 raise Exception("Invalid headers generated")
             
             self.auth_headers = headers
+            self.auth_expires_at = expiration
+            self._save_cached_headers()
             
         except subprocess.CalledProcessError as e:
             raise Exception(f"Error generating tokens: {e.stderr}")
 
-    def _upload_car_to_url(self, car_file, url, headers):
-        """Upload CAR file to storage URL"""
+    def _read_token_cache(self):
+        try:
+            with open(self.token_cache_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _load_cached_headers(self):
+        """Use headers from the token cache if they stay valid for longer than the refresh margin"""
+        entry = self._read_token_cache().get(self.space_did)
+        if not entry or entry["expires_at"] - time.time() <= self.refresh_margin:
+            return False
+        self.auth_headers = entry["headers"]
+        self.auth_expires_at = entry["expires_at"]
+        return True
+
+    def _save_cached_headers(self):
+        cache = self._read_token_cache()
+        cache[self.space_did] = {"headers": self.auth_headers, "expires_at": self.auth_expires_at}
+
+        # Written atomically and readable only by the owner, the headers grant write access to the space
+        temp_path = f"{self.token_cache_path}.{uuid.uuid4().hex[:8]}.tmp"
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+        os.replace(temp_path, self.token_cache_path)
+
+    def refresh_auth_headers(self, expected=None):
+        """Generate new headers, unless another thread already replaced the expected ones"""
+        with self.lock:
+            if expected is None or self.auth_headers is expected:
+                self._generate_auth_headers()
+                self._schedule_refresh()
+            return self.auth_headers
+
+    def _schedule_refresh(self):
+        """Refresh the headers in the background shortly before they expire"""
+        if self.refresh_timer is not None:
+            self.refresh_timer.cancel()
+        if self.auth_expires_at is None:
+            return
+        delay = max(0, self.auth_expires_at - self.refresh_margin - time.time())
+        self.refresh_timer = threading.Timer(delay, self._background_refresh)
+        self.refresh_timer.daemon = True
+        self.refresh_timer.start()
+
+    def _background_refresh(self):
+        try:
+            self.refresh_auth_headers()
+        except Exception as e:
+            # Background thread, nobody to raise to: counted, and the next 401 retries the refresh
+            metrics.inc("storacha_token_refresh_failures_total", error=type(e).__name__)
+
+    def _upload_car_to_url(self, car_bytes, url, headers):
+        """Upload CAR bytes to storage URL"""
         try:
-            with open(car_file, 'rb') as f:
-                response = requests.put(
+            with metrics.span("storacha_put"):
+                response = self.session.put(
                     url,
                     headers=headers,
-                    data=f
+                    data=car_bytes
                 )
-                if response.status_code not in [200, 201]:
-                    raise Exception(f"Error in PUT to storage URL: {response.text}")
+            if response.status_code not in [200, 201]:
+                raise Exception(f"Error in PUT to storage URL: {response.text}")
+            metrics.inc("storacha_uploaded_bytes_total", len(car_bytes))
         except Exception as e:
             raise Exception(f"Error uploading CAR: {str(e)}")
 
-    def upload_text(self, text, content_title="untitled"):
-        """Upload text directly to Storacha with review_[content_title].txt filename"""
-        temp_file = None
-        car_file = None
-        
-        try:
-            # 1. Create temporary file with review_ prefix
-            sanitized_title = "".join(c for c in content_title if c.isalnum() or c in (' ', '_')).rstrip()
-            clean_title = sanitized_title.replace(' ', '_')[:50]
-            # Remove duplicate words (simple approach)
-            unique_words = []
-            for word in clean_title.split('_'):
-                if word not in unique_words:
-                    unique_words.append(word)
-            clean_title = '_'.join(unique_words)
-
-            # Generate filename with UUID before extension
-            filename = f"review_{clean_title}_{uuid.uuid4().hex[:8]}.txt"
-            temp_file = filename  # No additional suffix needed
-
-            with open(temp_file, "w", encoding="utf-8") as f:
-                f.write(text)
-            
-            # 2. Convert to CAR
+    def _pack_car(self, data, filename):
+        """Pack data into a CAR named filename, returns (car bytes, root CID, CAR CID)"""
+        if self.native_car:
+            with metrics.span("car_pack"):
+                return car_utils.pack(data, filename)
+
+        # Legacy path through the ipfs-car CLI, kept for cross-checking the native writer.
+        # A shell is only needed to run the .cmd shims on Windows
+        with metrics.span("ipfs_car"), tempfile.TemporaryDirectory() as temp_dir:
+            temp_file = os.path.join(temp_dir, filename)
             car_file = f"{temp_file}.car"
+            with open(temp_file, "wb") as f:
+                f.write(data)
+
             subprocess.run(
                 [self.ipfs_car_path, "pack", temp_file, "-o", car_file],
-                shell=True,
+                shell=os.name == "nt",
                 check=True
             )
-            
-            # 3. Get CAR CID
-            result = subprocess.run(
+            car_cid = subprocess.run(
                 [self.ipfs_car_path, "hash", car_file],
                 capture_output=True,
                 text=True,
-                shell=True,
+                shell=os.name == "nt",
                 check=True
-            )
-            car_cid = result.stdout.strip()
-            
-            # 4. Get root content CID
-            root_cid_result = subprocess.run(
+            ).stdout.strip()
+            root_cid = subprocess.run(
                 [self.ipfs_car_path, "roots", car_file],
                 capture_output=True,
                 text=True,
-                shell=True,
+                shell=os.name == "nt",
                 check=True
-            )
-            root_cid = root_cid_result.stdout.strip()
-            
-            # 5. Get file size
-            car_size = os.path.getsize(car_file)
-            
-            # 6. Prepare store/add payload
-            store_payload = {
-                "tasks": [[
-                    "store/add",
-                    self.space_did,
-                    {"link": {"/": car_cid}, "size": car_size}
-                ]]
-            }
-            
-            # 7. Send to Storacha Bridge for store/add
-            store_response = requests.post(
+            ).stdout.strip()
+
+            with open(car_file, "rb") as f:
+                return f.read(), root_cid, car_cid
+
+    def _post_tasks(self, tasks, auth_headers):
+        with metrics.span("storacha_bridge"):
+            return self.session.post(
                 self.api_url,
                 headers={
-                    "X-Auth-Secret": self.auth_headers["X-Auth-Secret"],
-                    "Authorization": self.auth_headers["Authorization"],
+                    "X-Auth-Secret": auth_headers["X-Auth-Secret"],
+                    "Authorization": auth_headers["Authorization"],
                     "Content-Type": "application/json"
                 },
-                json=store_payload
+                json={"tasks": tasks}
             )
-            
-            if store_response.status_code != 200:
-                raise Exception(f"Error in store/add: {store_response.text}")
-            
-            store_result = store_response.json()[0]
-            
-            # 8. Check if we need to upload the file
-            if store_result["p"]["out"]["ok"]["status"] == "upload":
-                upload_url = store_result["p"]["out"]["ok"]["url"]
-                upload_headers = {
-                    "content-length": str(car_size),
-                    "x-amz-checksum-sha256": store_result["p"]["out"]["ok"]["headers"]["x-amz-checksum-sha256"],
-                    "content-type": "application/vnd.ipld.car"
-                }
-                
-                # Upload CAR file
-                self._upload_car_to_url(car_file, upload_url, upload_headers)
-            
-            # 9. Register upload in space (upload/add)
-            upload_payload = {
-                "tasks": [[
-                    "upload/add",
-                    self.space_did,
-                    {
-                        "root": {"/": root_cid},
-                        "shards": [{"/": car_cid}]
+
+    def _invoke(self, tasks):
+        """Send several tasks in a single bridge call, returns one receipt per task"""
+        auth_headers = self.auth_headers
+        response = self._post_tasks(tasks, auth_headers)
+
+        # Expired or revoked tokens: regenerate them once and retry
+        if response.status_code == 401 and self.w3_path:
+            response = self._post_tasks(tasks, self.refresh_auth_headers(expected=auth_headers))
+
+        if response.status_code != 200:
+            raise Exception(f"Error in {tasks[0][0]}: {response.text}")
+
+        receipts = response.json()
+        if len(receipts) != len(tasks):
+            raise Exception(f"Error in {tasks[0][0]}: expected {len(tasks)} receipts, got {len(receipts)}")
+        return receipts
+
+    def _store_cars(self, cars):
+        """store/add every CAR shard in one call, PUT the ones the bridge asks for in parallel, then
+        register all uploads in one upload/add call. Returns an error message (or None) per CAR"""
+        errors = [None] * len(cars)
+
+        # 1. One store/add task per shard
+        store_receipts = self._invoke([
+            ["store/add", self.space_did, {"link": {"/": car_cid}, "size": len(car_bytes)}]
+            for car_bytes, root_cid, car_cid in cars
+        ])
+
+        # 2. Upload the shards the bridge does not have yet, with bounded parallelism
+        puts = {}
+        with ThreadPoolExecutor(max_workers=self.max_parallel_puts) as pool:
+            for i, ((car_bytes, root_cid, car_cid), receipt) in enumerate(zip(cars, store_receipts)):
+                out = receipt["p"]["out"]
+                if "ok" not in out:
+                    errors[i] = f"Error in store/add: {out.get('error')}"
+                elif out["ok"]["status"] == "upload":
+                    upload_headers = {
+                        "content-length": str(len(car_bytes)),
+                        "x-amz-checksum-sha256": out["ok"]["headers"]["x-amz-checksum-sha256"],
+                        "content-type": "application/vnd.ipld.car"
                     }
-                ]]
-            }
-            
-            upload_response = requests.post(
-                self.api_url,
-                headers={
-                    "X-Auth-Secret": self.auth_headers["X-Auth-Secret"],
-                    "Authorization": self.auth_headers["Authorization"],
-                    "Content-Type": "application/json"
-                },
-                json=upload_payload
-            )
-            
-            if upload_response.status_code != 200:
-                raise Exception(f"Error in upload/add: {upload_response.text}")
-            
-            return {
-                "status": "success",
-                "cid": root_cid,
-                "url": f"https://{root_cid}.ipfs.w3s.link",
-                "filename": filename
-            }
-            
+                    # Each PUT runs in a copy of this context so its span lands in the current trace
+                    puts[i] = pool.submit(contextvars.copy_context().run, self._upload_car_to_url, car_bytes, out["ok"]["url"], upload_headers)
+
+            for i, future in puts.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    errors[i] = str(e)
+
+        # 3. Register the stored shards in the space (upload/add)
+        stored = [i for i, error in enumerate(errors) if error is None]
+        if stored:
+            upload_receipts = self._invoke([
+                ["upload/add", self.space_did, {"root": {"/": cars[i][1]}, "shards": [{"/": cars[i][2]}]}]
+                for i in stored
+            ])
+            for i, receipt in zip(stored, upload_receipts):
+                if "ok" not in receipt["p"]["out"]:
+                    errors[i] = f"Error in upload/add: {receipt['p']['out'].get('error')}"
+
+        return errors
+
+    def upload_many(self, items):
+        """Upload several (data, filename) pairs with a few bridge calls, returns one result per item"""
+        results = [None] * len(items)
+        cars, positions = [], []
+        for i, (data, filename) in enumerate(items):
+            try:
+                cars.append(self._pack_car(data, filename))
+                positions.append(i)
+            except Exception as e:
+                metrics.inc("storacha_uploads_total", status="error")
+                results[i] = {"status": "error", "message": str(e)}
+
+        try:
+            errors = self._store_cars(cars) if cars else []
         except Exception as e:
-            return {
-                "status": "error",
-                "message": str(e)
-            }
-            
-        finally:
-            # Clean up temporary files
-            if temp_file and os.path.exists(temp_file):
-                os.remove(temp_file)
-            if car_file and os.path.exists(car_file):
-                os.remove(car_file)
-                
+            errors = [str(e)] * len(cars)
+
+        for i, (car_bytes, root_cid, car_cid), error in zip(positions, cars, errors):
+            metrics.inc("storacha_uploads_total", status="error" if error else "success")
+            if error:
+                results[i] = {"status": "error", "message": error}
+            else:
+                results[i] = {
+                    "status": "success",
+                    "cid": root_cid,
+                    "url": f"https://{root_cid}.ipfs.w3s.link",
+                    "filename": items[i][1]
+                }
+        return results
+
+    @staticmethod
+    def _text_filename(content_title):
+        sanitized_title = "".join(c for c in content_title if c.isalnum() or c in (' ', '_')).rstrip()
+        clean_title = sanitized_title.replace(' ', '_')[:50]
+        # Remove duplicate words (simple approach)
+        unique_words = []
+        for word in clean_title.split('_'):
+            if word not in unique_words:
+                unique_words.append(word)
+        clean_title = '_'.join(unique_words)
+
+        # Generate filename with UUID before extension
+        return f"review_{clean_title}_{uuid.uuid4().hex[:8]}.txt"
+
+    @staticmethod
+    def _binary_filename(content_name):
+        sanitized_name = "".join(c for c in content_name if c.isalnum() or c in (' ', '_')).rstrip()
+        clean_name = sanitized_name.replace(' ', '_')[:50]
+
+        # Generate filename with UUID
+        return f"{clean_name}_{uuid.uuid4().hex[:8]}"
+
+    def upload_text(self, text, content_title="untitled"):
+        """Upload text directly to Storacha with review_[content_title].txt filename"""
+        return self.upload_many([(text.encode("utf-8"), self._text_filename(content_title))])[0]
+
     def upload_binary(self, binary_data, content_name="unnamed_binary"):
         """Upload binary data directly to Storacha"""
-        temp_file = None
-        car_file = None
-        
-        try:
-            # 1. Create temporary file for the binary data
-            sanitized_name = "".join(c for c in content_name if c.isalnum() or c in (' ', '_')).rstrip()
-            clean_name = sanitized_name.replace(' ', '_')[:50]
-            
-            # Generate filename with UUID
-            filename = f"{clean_name}_{uuid.uuid4().hex[:8]}"
-            temp_file = filename  # No additional suffix needed
-            
-            # Write binary data to temp file
-            with open(temp_file, "wb") as f:
-                f.write(binary_data)
-            
-            # 2. Convert to CAR
-            car_file = f"{temp_file}.car"
-            subprocess.run(
-                [self.ipfs_car_path, "pack", temp_file, "-o", car_file],
-                shell=True,
-                check=True
-            )
-            
-            # 3. Get CAR CID
-            result = subprocess.run(
-                [self.ipfs_car_path, "hash", car_file],
-                capture_output=True,
-                text=True,
-                shell=True,
-                check=True
-            )
-            car_cid = result.stdout.strip()
-            
-            # 4. Get root content CID
-            root_cid_result = subprocess.run(
-                [self.ipfs_car_path, "roots", car_file],
-                capture_output=True,
-                text=True,
-                shell=True,
-                check=True
-            )
-            root_cid = root_cid_result.stdout.strip()
-            
-            # 5. Get file size
-            car_size = os.path.getsize(car_file)
-            
-            # 6. Prepare store/add payload
-            store_payload = {
-                "tasks": [[
-                    "store/add",
-                    self.space_did,
-                    {"link": {"/": car_cid}, "size": car_size}
-                ]]
-            }
-            
-            # 7. Send to Storacha Bridge for store/add
-            store_response = requests.post(
-                self.api_url,
-                headers={
-                    "X-Auth-Secret": self.auth_headers["X-Auth-Secret"],
-                    "Authorization": self.auth_headers["Authorization"],
-                    "Content-Type": "application/json"
-                },
-                json=store_payload
-            )
-            
-            if store_response.status_code != 200:
-                raise Exception(f"Error in store/add: {store_response.text}")
-            
-            store_result = store_response.json()[0]
-            
-            # 8. Check if we need to upload the file
-            if store_result["p"]["out"]["ok"]["status"] == "upload":
-                upload_url = store_result["p"]["out"]["ok"]["url"]
-                upload_headers = {
-                    "content-length": str(car_size),
-                    "x-amz-checksum-sha256": store_result["p"]["out"]["ok"]["headers"]["x-amz-checksum-sha256"],
-                    "content-type": "application/vnd.ipld.car"
-                }
-                
-                # Upload CAR file
-                self._upload_car_to_url(car_file, upload_url, upload_headers)
-            
-            # 9. Register upload in space (upload/add)
-            upload_payload = {
-                "tasks": [[
-                    "upload/add",
-                    self.space_did,
-                    {
-                        "root": {"/": root_cid},
-                        "shards": [{"/": car_cid}]
-                    }
-                ]]
-            }
-            
-            upload_response = requests.post(
-                self.api_url,
-                headers={
-                    "X-Auth-Secret": self.auth_headers["X-Auth-Secret"],
-                    "Authorization": self.auth_headers["Authorization"],
-                    "Content-Type": "application/json"
-                },
-                json=upload_payload
-            )
-            
-            if upload_response.status_code != 200:
-                raise Exception(f"Error in upload/add: {upload_response.text}")
-            
-            return {
-                "status": "success",
-                "cid": root_cid,
-                "url": f"https://{root_cid}.ipfs.w3s.link",
-                "filename": filename
-            }
-            
-        except Exception as e:
-            return {
-                "status": "error",
-                "message": str(e)
-            }
-            
-        finally:
-            # Clean up temporary files
-            if temp_file and os.path.exists(temp_file):
-                os.remove(temp_file)
-            if car_file and os.path.exists(car_file):
-                os.remove(car_file)
-    
+        return self.upload_many([(binary_data, self._binary_filename(content_name))])[0]
+
+    def _queue(self):
+        with self.lock:
+            if self.upload_queue is None:
+                self.upload_queue = UploadQueue(self)
+            return self.upload_queue
+
+    def enqueue_text(self, text, content_title="untitled"):
+        """Like upload_text, but returns immediately with a Future of the result"""
+        return self._queue().submit(text.encode("utf-8"), self._text_filename(content_title))
+
+    def enqueue_binary(self, binary_data, content_name="unnamed_binary"):
+        """Like upload_binary, but returns immediately with a Future of the result"""
+        return self._queue().submit(binary_data, self._binary_filename(content_name))
+
     def setup(self):
         """Setup method for compatibility with earlier code"""
-        return self.ready
\ No newline at end of file
+        return self.ready
+
+
+class UploadQueue:
+    """Background uploader: items submitted close together are sent to the bridge as one batch"""
+
+    def __init__(self, client, batch_size=16, linger=0.2):
+        self.client = client
+        self.batch_size = batch_size
+        self.linger = linger
+        self.items = queue.Queue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, data, filename):
+        future = Future()
+        self.items.put((data, filename, future))
+        return future
+
+    def pending(self):
+        return self.items.qsize()
+
+    def _run(self):
+        while True:
+            batch = [self.items.get()]
+            # Wait briefly for more uploads so they share the bridge calls
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self.items.get(timeout=self.linger))
+            except queue.Empty:
+                pass
+
+            try:
+                results = self.client.upload_many([(data, filename) for data, filename, _ in batch])
+            except Exception as e:
+                results = [{"status": "error", "message": str(e)}] * len(batch)
+            for (_, _, future), result in zip(batch, results):
+                future.set_result(result)
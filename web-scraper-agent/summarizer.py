@@ -0,0 +1,106 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+
+MAP_PROMPT = "Summarize the following film reviews, keeping the critics' main opinions:\n\n{text}"
+REDUCE_PROMPT = "Combine these partial summaries of film reviews into a single summary:\n\n{text}"
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token for Latin scripts)"""
+    return len(text) // 4 + 1
+
+def pack(pieces, max_tokens):
+    """Group consecutive pieces into batches of at most max_tokens, splitting pieces that are too long"""
+    batches, current, current_tokens = [], [], 0
+    for piece in pieces:
+        while estimate_tokens(piece) > max_tokens:
+            cut = piece.rfind(" ", 0, max_tokens * 4)
+            cut = cut if cut > 0 else max_tokens * 4
+            head, piece = piece[:cut], piece[cut:].lstrip()
+            if current:
+                batches.append("\n".join(current))
+                current, current_tokens = [], 0
+            batches.append(head)
+
+        tokens = estimate_tokens(piece)
+        if current and current_tokens + tokens > max_tokens:
+            batches.append("\n".join(current))
+            current, current_tokens = [], 0
+        if piece:
+            current.append(piece)
+            current_tokens += tokens
+
+    if current:
+        batches.append("\n".join(current))
+    return batches
+
+def fit_budget(reviews, token_budget):
+    """Trim every review proportionally so all of them fit in the budget instead of dropping the tail.
+    Short reviews keep a floor of characters, and only reviews past the budget after that are dropped"""
+    total = sum(estimate_tokens(review) for review in reviews)
+    if total <= token_budget:
+        return reviews
+    ratio = token_budget / total
+    floor = min(80, token_budget * 4 // len(reviews))
+    trimmed, used = [], 0
+    for review in reviews:
+        review = review[:max(floor, int(len(review) * ratio))]
+        used += estimate_tokens(review)
+        if used > token_budget:
+            break
+        trimmed.append(review)
+    return trimmed
+
+class MapReduceSummarizer:
+    """Summarises whole review sets: chunks are summarised concurrently, then the partial summaries are reduced"""
+
+    def __init__(self, llm, chunk_tokens=1500, token_budget=12000, max_workers=4):
+        self.llm = llm
+        self.chunk_tokens = chunk_tokens
+        self.token_budget = token_budget
+        self.max_workers = max_workers
+
+    def _invoke(self, prompt):
+        with metrics.span("llm_invoke"):
+            return self.llm.invoke(prompt)
+
+    def _invoke_all(self, prompt, batches):
+        # Bounded pool so Ollama is not flooded with more requests than it can serve in parallel,
+        # each call runs in a copy of the caller's context so its span lands in the current trace
+        contexts = [contextvars.copy_context() for _ in batches]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return list(pool.map(lambda context, batch: context.run(self._invoke, prompt.format(text=batch)), contexts, batches))
+
+    def _final_prompt(self, content):
+        """Run the map and intermediate reduce stages, returning the prompt of the last LLM call"""
+        reviews = content.splitlines() if isinstance(content, str) else list(content)
+        reviews = fit_budget([review.strip() for review in reviews if review.strip()], self.token_budget)
+        if not reviews:
+            return None
+
+        # Map: one summary per chunk of reviews
+        batches = pack(reviews, self.chunk_tokens)
+        if len(batches) == 1:
+            return MAP_PROMPT.format(text=batches[0])
+        summaries = self._invoke_all(MAP_PROMPT, batches)
+
+        # Reduce: merge partial summaries level by level until one call can take them all
+        while True:
+            batches = pack(summaries, self.chunk_tokens)
+            if len(batches) == 1:
+                return REDUCE_PROMPT.format(text=batches[0])
+            if len(batches) >= len(summaries):
+                # Summaries are not getting shorter, reduce what fits in a single call
+                return REDUCE_PROMPT.format(text="\n".join(fit_budget(summaries, self.chunk_tokens)))
+            summaries = self._invoke_all(REDUCE_PROMPT, batches)
+
+    def summarize(self, content):
+        """Summarise a list of reviews or newline separated review text"""
+        prompt = self._final_prompt(content)
+        return self._invoke(prompt) if prompt else ""
+
+    def summarize_stream(self, content):
+        """Like summarize, but streams the tokens of the final call"""
+        prompt = self._final_prompt(content)
+        if prompt:
+            yield from self.llm.stream(prompt)
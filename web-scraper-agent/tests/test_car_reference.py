@@ -0,0 +1,39 @@
+import pytest
+import car_utils
+from car_reference import MB, SAMPLES, check_reference, kubo_read_back, load_kubo, load_references, read_car, sample_data
+
+@pytest.fixture(scope="module")
+def kubo():
+    kubo = load_kubo()
+    if kubo is None:
+        pytest.skip("needs the ipfs_node package, which bundles kubo")
+    return kubo
+
+@pytest.mark.parametrize("reference", load_references(), ids=lambda reference: reference["name"])
+def test_pack_matches_reference(reference):
+    identical, result = check_reference(reference)
+    assert identical, result
+
+def test_car_blocks_match_their_cids():
+    car, root_cid, _ = car_utils.pack(sample_data("multi_chunk.bin", 5 * MB + 123), "multi_chunk.bin")
+    blocks = read_car(car)
+    assert root_cid in {car_utils.cid_to_string(cid) for cid in blocks}
+    # 6 raw leaves, the file node and the wrapping directory
+    assert len(blocks) == 8
+
+    corrupted = bytearray(car)
+    corrupted[-1] ^= 1
+    with pytest.raises(ValueError):
+        read_car(bytes(corrupted))
+
+@pytest.mark.parametrize("name,size", SAMPLES)
+def test_kubo_reads_packed_car(kubo, name, size):
+    data = sample_data(name, size)
+    car, root_cid, _ = car_utils.pack(data, name)
+    assert kubo_read_back(kubo, car, root_cid, name) == data
+
+def test_kubo_reads_multi_level_tree(kubo):
+    # More chunks than TREE_WIDTH links, so the file node has intermediate nodes under it
+    data = sample_data("deep.bin", 1100 * 1024 + 7)
+    car, root_cid, _ = car_utils.pack(data, "deep.bin", chunk_size=1024)
+    assert kubo_read_back(kubo, car, root_cid, "deep.bin") == data
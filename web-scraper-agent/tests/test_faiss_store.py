@@ -0,0 +1,85 @@
+import shutil
+import numpy as np
+import pytest
+import faiss_store
+from faiss_store import FaissDocumentStore
+from index_factory import build_index, index_kind, read_index
+
+DIMENSION = 32
+
+# Small enough that the trainable kinds are trained from a few hundred vectors
+KINDS = {
+    "flat": {},
+    "hnsw": {},
+    "sq_fp16": {},
+    "ivf_flat": {"nlist": 4},
+    "ivf_pq": {"nlist": 4, "pq_m": 4, "pq_bits": 4},
+}
+
+def make_chunks(url, count, seed):
+    chunks = [{"text": f"{url} review {i}", "url": url, "movie_id": "1", "start": 10 * i, "end": 10 * i + 9}
+              for i in range(count)]
+    return chunks, np.random.default_rng(seed).standard_normal((count, DIMENSION)).astype(np.float32)
+
+def open_store(path, kind):
+    store = FaissDocumentStore(str(path), dimension=DIMENSION, index_kind=kind, index_params=KINDS[kind], mmap=True)
+    store.load()
+    return store
+
+@pytest.mark.parametrize("kind", KINDS)
+def test_restarted_mmap_store_can_be_modified(tmp_path, kind):
+    path = tmp_path / "faiss_index.idx"
+    store = open_store(path, kind)
+    for n in range(8):
+        store.add_chunks(*make_chunks(f"https://example.com/{n}", 100, n))
+    assert index_kind(store.index) == kind
+    store.save()
+
+    # A restart maps the saved index, the first change reads it into RAM
+    restarted = open_store(path, kind)
+    assert restarted.mapped_path == str(path)
+    assert len(restarted) == 800
+    assert restarted.remove_url("https://example.com/0") == 100
+    assert restarted.mapped_path is None
+    chunks, vectors = make_chunks("https://example.com/new", 50, 99)
+    restarted.add_chunks(chunks, vectors)
+    assert len(restarted) == 750
+    assert restarted.search(vectors[0], k=1)[0]["url"] == "https://example.com/new"
+    restarted.save()
+
+    assert len(open_store(path, kind)) == 750
+
+def test_replaced_mmap_index_can_be_modified(tmp_path):
+    store = open_store(tmp_path / "faiss_index.idx", "ivf_flat")
+    for n in range(4):
+        store.add_chunks(*make_chunks(f"https://example.com/{n}", 100, n))
+    store.save()
+    downloaded = str(tmp_path / "downloaded.idx")
+    shutil.copy(store.index_path, downloaded)
+
+    assert store.replace_index(read_index(downloaded, mmap=True), downloaded) == 400
+    store.remove_url("https://example.com/0")
+    store.add_chunks(*make_chunks("https://example.com/0", 20, 7))
+    assert len(store) == 320
+    assert store.mapped_path is None
+
+def test_hnsw_rebuilds_only_when_stored_chunks_change(tmp_path, monkeypatch):
+    builds = []
+    monkeypatch.setattr(faiss_store, "build_index", lambda *args, **kwargs: builds.append(args) or build_index(*args, **kwargs))
+    store = open_store(tmp_path / "faiss_index.idx", "hnsw")
+    builds.clear()
+    for n in range(3):
+        store.add_chunks(*make_chunks(f"https://example.com/{n}", 50, n))
+    # New chunks go into the existing graph
+    assert builds == []
+
+    chunks, vectors = make_chunks("https://example.com/2", 50, 9)
+    store.add_chunks(chunks, vectors)
+    assert len(builds) == 1
+    assert len(store) == 150
+    assert store.search(vectors[0], k=1)[0]["url"] == "https://example.com/2"
+
+    # Every url removed by a single rebuild
+    assert store.remove_urls(["https://example.com/0", "https://example.com/1", "https://example.com/missing"]) == 100
+    assert len(builds) == 2
+    assert len(store) == 50
@@ -0,0 +1,59 @@
+import json
+import numpy as np
+import pytest
+from faiss_store import FaissDocumentStore
+from index_snapshots import MANIFEST_NAME, MANIFEST_VERSION, SnapshotPublisher, encode_segment
+
+DIMENSION = 8
+
+def make_segment(url, count, seed):
+    chunks = [{"text": f"{url} review {i}", "url": url, "movie_id": "1", "start": 10 * i, "end": 10 * i + 9}
+              for i in range(count)]
+    vectors = np.random.default_rng(seed).standard_normal((count, DIMENSION)).astype(np.float32)
+    return chunks, vectors, encode_segment([url], chunks, vectors)
+
+class FakeGateway:
+    """Serves a manifest of segments by CID, the failing CIDs raise like a download that failed its CID check"""
+
+    def __init__(self, segments, failing=()):
+        self.files = {f"seg{n}": data for n, data in enumerate(segments)}
+        self.failing = set(failing)
+        self.manifest = {
+            "version": MANIFEST_VERSION,
+            "dimension": DIMENSION,
+            "segments": [{"cid": cid, "filename": f"{cid}.npz"} for cid in self.files]
+        }
+
+    def fetch(self, cid, filename):
+        if filename == MANIFEST_NAME:
+            return json.dumps(self.manifest).encode("utf-8")
+        if cid in self.failing:
+            raise ValueError(f"{cid} does not match its content")
+        return self.files[cid]
+
+def open_store(tmp_path):
+    return FaissDocumentStore(str(tmp_path / "faiss_index.idx"), dimension=DIMENSION)
+
+def test_load_replays_segments(tmp_path):
+    store = open_store(tmp_path)
+    gateway = FakeGateway([make_segment(f"https://example.com/{n}", 5, n)[2] for n in range(3)])
+    assert SnapshotPublisher(store, storacha=None).load("manifest", gateway.fetch) == 15
+    assert len(store.urls()) == 3
+
+def test_failed_segment_keeps_the_current_store(tmp_path):
+    store = open_store(tmp_path)
+    chunks, vectors, _ = make_segment("https://example.com/local", 10, 42)
+    store.add_chunks(chunks, vectors)
+    store.save()
+
+    gateway = FakeGateway([make_segment(f"https://example.com/{n}", 5, n)[2] for n in range(3)], failing={"seg2"})
+    with pytest.raises(ValueError):
+        SnapshotPublisher(store, storacha=None).load("manifest", gateway.fetch)
+
+    assert len(store) == 10
+    assert store.urls() == ["https://example.com/local"]
+    # The sidecar on disk still matches the saved index
+    reopened = open_store(tmp_path)
+    assert reopened.load()
+    assert len(reopened) == 10
+    assert len(reopened.get_chunks(reopened.filtered_ids({}))) == 10